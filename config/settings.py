@@ -2,19 +2,19 @@
 Configuraciones globales para el proyecto ETL web MAC
 """
 import os
+import functools
 from pathlib import Path
 
 # Rutas de directorios
-ROOT_DIR = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ROOT_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = ROOT_DIR / "data"
 PDF_DIR = DATA_DIR / "pdfs"
 OUTPUT_DIR = DATA_DIR / "output"
 PICKLES_DIR = DATA_DIR / "pickles"
-
-# Asegurar que existen los directorios necesarios
-os.makedirs(PDF_DIR, exist_ok=True)
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-os.makedirs(PICKLES_DIR, exist_ok=True)
+EMBED_CACHE_PATH = DATA_DIR / "embed_cache.sqlite3"
+RESPONSE_CACHE_PATH = DATA_DIR / "response_cache.sqlite3"
+EXTRACTION_CACHE_PATH = DATA_DIR / "extraction_cache.sqlite3"
+PIPELINE_LOCK_PATH = DATA_DIR / ".pipeline.lock"
 
 # URLs y recursos externos
 BASE_URL = "https://mac.acatlan.unam.mx/escolares/temarios/1644/"
@@ -22,17 +22,82 @@ BASE_URL = "https://mac.acatlan.unam.mx/escolares/temarios/1644/"
 # Configuraciones del driver de Selenium
 HEADLESS_MODE = True
 BROWSER_TIMEOUT = 10  # Segundos
+DOWNLOAD_CONCURRENCY = 16  # Descargas de PDFs simultáneas
 
 # Modelos y configuración de IA
 DEFAULT_EMBEDDING_MODEL = "models/text-embedding-004"
 GEN_AI_MODEL = "gemini-1.5-flash"
+EMBEDDING_BATCH_SIZE = 100  # Máximo de textos por solicitud de embeddings (límite de Gemini)
+EMBEDDING_MAX_WORKERS = 8  # Solicitudes de embeddings concurrentes
+EMBED_CACHE_TTL = 30 * 86400  # Segundos que un embedding en caché se considera vigente
+
+# Servidor web
+WEB_THREADS = 32  # Hilos de waitress; cada uno atiende una petición mientras espera al LLM
+
+# Caché semántica de respuestas del chat web
+RESPONSE_CACHE_TTL = 7 * 86400  # Segundos que una respuesta en caché se considera vigente
+RESPONSE_CACHE_THRESHOLD = 0.92  # Similitud coseno mínima con una pregunta anterior para reutilizar su respuesta
+NEAR_DUPLICATE_CACHE_SIZE = 1024  # Preguntas recientes comparadas (mismas palabras salvo una errata) antes de calcular el embedding
+DATA_STATUS_TTL = 5  # Segundos que /api/status reutiliza la comprobación de si existen datos procesados
+
+# Columnas de los temarios que se usan para generar embeddings
+DEFAULT_TEXT_COLUMNS = (
+    "nombre_materia", "semestre_txt", "modalidad", "caracter",
+    "tipo", "etapa_formacion", "campo_conocimiento", "antecedente",
+    "subsecuente", "objetivo_general", "indice_tematico",
+    "referencias_basicas", "referencias_complementarias",
+    "sugerencias_didacticas", "sugerencias_evaluacion"
+)
 
 # Configuración de extracción de datos
 MAX_RETRIES = 2  # Reintentos para extracción de datos
+RETRY_BACKOFF_BASE = 0.5  # Segundos de la primera espera tras un error transitorio de Gemini (se duplica en cada reintento)
+RETRY_BACKOFF_MAX = 30  # Espera máxima en segundos entre reintentos
+PDF_WORKERS = os.cpu_count() or 1  # Procesos para extraer PDFs en paralelo
+PDF_BACKEND = "pymupdf"  # Lector de PDFs: "pymupdf" (si está instalado) o "pypdf2"
+GEMINI_WORKERS = 16  # Llamadas simultáneas a Gemini al extraer la información de los PDFs
+GEMINI_BATCH_SIZE = 4  # PDFs que se envían a Gemini en una misma solicitud de extracción
+PREFILL_NUMERIC_FIELDS = True  # Extraer con expresiones regulares las horas y créditos rotulados en el PDF, sin pedirlos a Gemini
+EXTRACTION_BATCH_SIZE = 256  # Registros por lote al guardar la extracción en streaming
+
+# Campos de cada temario extraído
+SYLLABUS_FIELDS = (
+    "nombre_materia", "clave", "semestre_num", "semestre_txt", "modalidad",
+    "caracter", "tipo", "horas_al_semestre", "horas_semana", "horas_teoricas",
+    "horas_practicas", "creditos", "etapa_formacion", "campo_conocimiento",
+    "antecedente", "subsecuente", "objetivo_general", "indice_tematico",
+    "contenido", "referencias_basicas", "referencias_complementarias",
+    "sugerencias_didacticas", "sugerencias_evaluacion", "archivo_origen", "error"
+)
+SYLLABUS_NUMERIC_FIELDS = (
+    "semestre_num", "horas_al_semestre", "horas_semana", "horas_teoricas", "horas_practicas", "creditos"
+)
+SYLLABUS_LIST_FIELDS = ("indice_tematico", "referencias_basicas", "referencias_complementarias")
+
+
+def ensure_dirs() -> None:
+    """
+    Asegura que existen los directorios de datos. Se invoca desde las fases del ETL
+    en lugar de al importar el módulo, para no pagar las llamadas al sistema en cada import.
+    """
+    os.makedirs(PDF_DIR, exist_ok=True)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    os.makedirs(PICKLES_DIR, exist_ok=True)
+
 
-# Cargar variables de entorno si es necesario
-try:
-    from dotenv import load_dotenv
-    load_dotenv()  # Cargar variables de entorno desde .env
-except ImportError:
-    print("dotenv no está instalado. No se cargarán variables desde .env") 
\ No newline at end of file
+@functools.lru_cache(maxsize=1)
+def load_env() -> bool:
+    """
+    Carga las variables de entorno desde .env una sola vez por proceso.
+    
+    Returns:
+        bool: True si se cargó el archivo .env, False si dotenv no está instalado
+    """
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()  # Cargar variables de entorno desde .env
+        return True
+    except ImportError:
+        print("dotenv no está instalado. No se cargarán variables desde .env")
+        return False
+ 
\ No newline at end of file
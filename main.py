@@ -8,30 +8,45 @@ Script principal para orquestar el proceso ETL completo:
 import os
 import sys
 import argparse
+import logging
 from typing import Dict, Any
 
-# Asegurar que se pueden importar los módulos del proyecto
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# La raíz del proyecto ya está en sys.path al ejecutar este script
 
 from config import settings
 from pipeline.extract import extract_data
 from pipeline.transform import transform_data
+from src.loaders.file_handler import get_binary_output
 # Importamos el módulo del chatbot
 from src.chatbot.cli import main as run_chatbot
 # Importamos para la interfaz web
 try:
-    from src.chatbot.web.app import app as web_app
+    from src.chatbot.web.app import run_server
     web_interface_available = True
 except ImportError:
     web_interface_available = False
 
 
+log = logging.getLogger("mac_gpt.etl")
+
+
+def _log_banner(title: str) -> None:
+    """
+    Registra un encabezado de fase del ETL
+    
+    Args:
+        title (str): Título de la fase
+    """
+    log.info("\n%s\n%s\n%s", "=" * 70, title.center(70), "=" * 70)
+
+
 def run_etl_pipeline(
     download_pdfs: bool = True,
     extract_pdf_content: bool = True,
     add_embeddings: bool = True,
     pdf_dir: str = None,
-    output_name: str = "plan_estudios_mac"
+    output_name: str = "plan_estudios_mac",
+    force: bool = False
 ) -> Dict[str, Any]:
     """
     Ejecuta el proceso ETL completo
@@ -42,6 +57,8 @@ def run_etl_pipeline(
         add_embeddings (bool): Si es True, agrega embeddings a los datos
         pdf_dir (str): Directorio donde se encuentran/guardarán los PDFs
         output_name (str): Nombre base para los archivos de salida
+        force (bool): Si es True, repite la extracción y transformación aunque
+                      las salidas estén actualizadas
         
     Returns:
         Dict[str, Any]: Resultados del proceso ETL
@@ -52,77 +69,76 @@ def run_etl_pipeline(
     }
     
     # Fase de extracción
-    print("\n" + "=" * 70)
-    print("FASE DE EXTRACCIÓN".center(70))
-    print("=" * 70)
+    _log_banner("FASE DE EXTRACCIÓN")
     
     extract_results = extract_data(
         download_pdfs=download_pdfs,
         extract_pdf_content=extract_pdf_content,
         pdf_dir=pdf_dir,
-        output_filename=output_name
+        output_filename=output_name,
+        force=force
     )
     results["extract"] = extract_results
     
     # Si no hay datos extraídos y no se realizó la extracción, terminar aquí
-    if not extract_results.get("data_extracted") and extract_pdf_content:
-        print("No se obtuvieron datos en la fase de extracción. ETL finalizado.")
+    if not extract_results.get("records_extracted") and extract_pdf_content:
+        log.warning("No se obtuvieron datos en la fase de extracción. ETL finalizado.")
         return results
     
     # Fase de transformación
-    print("\n" + "=" * 70)
-    print("FASE DE TRANSFORMACIÓN".center(70))
-    print("=" * 70)
+    _log_banner("FASE DE TRANSFORMACIÓN")
     
     # Determinar el archivo de entrada para la transformación
-    if extract_results.get("saved_files") and extract_results["saved_files"].get("pickle"):
-        input_file = extract_results["saved_files"]["pickle"]
+    if extract_results.get("saved_files") and get_binary_output(extract_results["saved_files"]):
+        input_file = get_binary_output(extract_results["saved_files"])
     elif extract_pdf_content:
-        print("No se encontró un archivo pickle para transformar. Fase de transformación omitida.")
+        log.warning("No se encontró un archivo Parquet/pickle para transformar. Fase de transformación omitida.")
         return results
     else:
-        # Si no se realizó extracción, buscar el archivo pickle por defecto
+        # Si no se realizó extracción, buscar el archivo Parquet (o pickle) por defecto
+        default_parquet = os.path.join(settings.PICKLES_DIR, f"{output_name}.parquet")
         default_pickle = os.path.join(settings.PICKLES_DIR, f"{output_name}.pkl")
-        if os.path.exists(default_pickle):
+        if os.path.exists(default_parquet):
+            input_file = default_parquet
+        elif os.path.exists(default_pickle):
             input_file = default_pickle
         else:
-            print(f"No se encontró el archivo {default_pickle}. Fase de transformación omitida.")
+            log.warning("No se encontró el archivo %s ni %s. Fase de transformación omitida.",
+                        default_parquet, default_pickle)
             return results
     
     transform_results = transform_data(
         input_file=input_file,
         add_embeddings=add_embeddings,
-        output_filename=f"{output_name}_processed"
+        output_filename=f"{output_name}_processed",
+        force=force
     )
     results["transform"] = transform_results
     
     # Resumen final
-    print("\n" + "=" * 70)
-    print("RESUMEN DEL PROCESO ETL".center(70))
-    print("=" * 70)
+    _log_banner("RESUMEN DEL PROCESO ETL")
     
     if download_pdfs and extract_results.get("pdfs_downloaded"):
-        total_pdfs = sum(len(files) for files in extract_results["pdfs_downloaded"].values())
-        print(f"PDFs descargados: {total_pdfs}")
+        log.info("PDFs descargados: %d", extract_results["pdfs_downloaded_count"])
     
-    if extract_pdf_content and extract_results.get("data_extracted"):
-        print(f"Registros extraídos: {len(extract_results['data_extracted'])}")
+    if extract_pdf_content and extract_results.get("records_extracted"):
+        log.info("Registros extraídos: %d", extract_results["records_extracted"])
     
     if transform_results and transform_results.get("data_transformed"):
-        print(f"Registros transformados: {transform_results['data_transformed']['records']}")
+        log.info("Registros transformados: %d", transform_results["data_transformed"]["records"])
         if "embeddings" in transform_results["data_transformed"]["columns"]:
-            print("Se agregaron embeddings a los datos")
+            log.info("Se agregaron embeddings a los datos")
     
-    print("\nArchivos generados:")
+    log.info("\nArchivos generados:")
     if extract_results.get("saved_files"):
         for fmt, path in extract_results["saved_files"].items():
-            print(f"  - Extracción ({fmt}): {path}")
+            log.info("  - Extracción (%s): %s", fmt, path)
     
     if transform_results and transform_results.get("saved_files"):
         for fmt, path in transform_results["saved_files"].items():
-            print(f"  - Transformación ({fmt}): {path}")
+            log.info("  - Transformación (%s): %s", fmt, path)
     
-    print("\n¡Proceso ETL completado exitosamente!")
+    log.info("\n¡Proceso ETL completado exitosamente!")
     return results
 
 
@@ -147,7 +163,7 @@ def run_web_interface(port=5000, debug=False):
         print(f"Accede a la interfaz en: http://localhost:{port}")
         print("Presiona Ctrl+C para detener el servidor.")
         
-        web_app.run(host='0.0.0.0', port=port, debug=debug)
+        run_server(port=port, debug=debug)
         return 0
     except KeyboardInterrupt:
         print("\nServidor web detenido por el usuario.")
@@ -176,6 +192,12 @@ def main():
     parser.add_argument('--output-name', type=str, default="plan_estudios_mac",
                        help='Nombre base para los archivos de salida (default: plan_estudios_mac)')
     
+    parser.add_argument('--force', action='store_true',
+                       help='Repetir la extracción y transformación aunque las salidas estén actualizadas')
+    
+    parser.add_argument('--quiet', action='store_true',
+                       help='Mostrar solo advertencias y errores del proceso ETL')
+    
     parser.add_argument('--chatbot', action='store_true',
                        help='Ejecutar el chatbot en lugar del proceso ETL')
     
@@ -189,6 +211,7 @@ def main():
                        help='Ejecutar el servidor web en modo de depuración')
     
     args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO, format="%(message)s")
     
     if args.web:
         # Ejecutar la interfaz web
@@ -206,7 +229,8 @@ def main():
             extract_pdf_content=not args.skip_extraction,
             add_embeddings=not args.skip_embeddings,
             pdf_dir=args.pdf_dir,
-            output_name=args.output_name
+            output_name=args.output_name,
+            force=args.force
         )
     return 0
 
@@ -4,22 +4,40 @@ Script para la fase de extracción del ETL
 import os
 import sys
 import argparse
+import logging
+from pathlib import Path
 from typing import List, Dict, Any, Optional
 
-# Agregar la ruta del proyecto al path para poder importar los módulos
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Agregar la ruta del proyecto al path solo si se ejecuta como script
+# (con 'python -m pipeline.xxx' o al importarlo como módulo ya es importable)
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 from config import settings
 from src.extractors.web_scraper import get_driver, download_pdfs_by_semester
-from src.extractors.pdf_extractor import process_all_pdfs
-from src.loaders.file_handler import save_extracted_data
+from src.extractors.pdf_extractor import process_all_pdfs, yield_records
+from src.loaders.file_handler import (
+    ARROW_AVAILABLE,
+    get_parquet_num_rows,
+    newest_mtime,
+    outputs_up_to_date,
+    save_extracted_data,
+    save_extracted_data_stream
+)
+
+log = logging.getLogger("mac_gpt.etl")
+
+_BANNER = "=" * 50
 
 
 def extract_data(
     download_pdfs: bool = True,
     extract_pdf_content: bool = True,
     pdf_dir: Optional[str] = None,
-    output_filename: str = "resultados_extraccion"
+    output_filename: str = "resultados_extraccion",
+    n_workers: Optional[int] = None,
+    stream: bool = True,
+    force: bool = False
 ) -> Dict[str, List[Dict[str, Any]]]:
     """
     Ejecuta el proceso completo de extracción:
@@ -31,42 +49,76 @@ def extract_data(
         extract_pdf_content (bool): Si es True, extrae información de los PDFs
         pdf_dir (Optional[str]): Directorio donde se encuentran los PDFs o donde se descargarán
         output_filename (str): Nombre base para los archivos de salida
+        n_workers (Optional[int]): Procesos para leer los PDFs en paralelo
+                                   (default: settings.PDF_WORKERS)
+        stream (bool): Si es True, los registros se guardan por lotes conforme se extraen
+                       y no se conservan en memoria ('data_extracted' queda en None)
+        force (bool): Si es True, extrae los PDFs aunque los archivos de salida ya estén
+                      actualizados respecto a ellos
         
     Returns:
         Dict[str, Any]: Resultados del proceso de extracción
     """
     results = {
         "pdfs_downloaded": None,
+        "pdfs_downloaded_count": 0,
         "data_extracted": None,
+        "records_extracted": 0,
         "saved_files": None
     }
     
+    settings.ensure_dirs()
+    
     # Usar el directorio de PDFs especificado o el predeterminado
     if pdf_dir is None:
         pdf_dir = settings.PDF_DIR
     
     # 1. Descargar PDFs si se solicita
     if download_pdfs:
-        print("=" * 50)
-        print("Iniciando descarga de PDFs...")
+        log.info(_BANNER)
+        log.info("Iniciando descarga de PDFs...")
         pdfs_info = download_pdfs_by_semester(save_dir=pdf_dir)
         results["pdfs_downloaded"] = pdfs_info
-        print(f"Descarga de PDFs completada. {sum(len(files) for files in pdfs_info.values())} archivos descargados.")
-        print("=" * 50)
-    
-    # 2. Extraer datos de los PDFs si se solicita
-    if extract_pdf_content:
-        print("=" * 50)
-        print("Iniciando extracción de datos de los PDFs...")
-        extracted_data = process_all_pdfs(pdf_dir=pdf_dir)
-        results["data_extracted"] = extracted_data
-        
-        # Guardar los resultados en diferentes formatos
-        saved_files = save_extracted_data(extracted_data, base_filename=output_filename)
+        results["pdfs_downloaded_count"] = sum(map(len, pdfs_info.values()))
+        log.info("Descarga de PDFs completada. %d archivos descargados.", results["pdfs_downloaded_count"])
+        log.info(_BANNER)
+    
+    # 2. Extraer datos de los PDFs si se solicita. Si no se descargaron PDFs nuevos y las
+    # salidas son más recientes que todos los PDFs, se reutilizan en lugar de re-extraer
+    existing_outputs = {
+        "json": os.path.join(settings.OUTPUT_DIR, f"{output_filename}.json"),
+        "csv": os.path.join(settings.OUTPUT_DIR, f"{output_filename}.csv"),
+        "parquet": os.path.join(settings.PICKLES_DIR, f"{output_filename}.parquet")
+    }
+    if (extract_pdf_content and not download_pdfs and not force and ARROW_AVAILABLE
+            and outputs_up_to_date(list(existing_outputs.values()), newest_mtime(pdf_dir, ".pdf"))):
+        log.info(_BANNER)
+        log.info("Los archivos de extracción están actualizados respecto a los PDFs. "
+                 "Se omite la extracción (usa force=True o --force para repetirla).")
+        results["records_extracted"] = get_parquet_num_rows(existing_outputs["parquet"])
+        results["saved_files"] = existing_outputs
+        log.info(_BANNER)
+    elif extract_pdf_content:
+        log.info(_BANNER)
+        log.info("Iniciando extracción de datos de los PDFs...")
+        if stream:
+            # Guardar los registros en diferentes formatos conforme se extraen
+            saved_files, n_records = save_extracted_data_stream(
+                yield_records(pdf_dir=pdf_dir, n_workers=n_workers),
+                base_filename=output_filename
+            )
+        else:
+            extracted_data = process_all_pdfs(pdf_dir=pdf_dir, n_workers=n_workers)
+            results["data_extracted"] = extracted_data
+            n_records = len(extracted_data)
+            
+            # Guardar los resultados en diferentes formatos
+            saved_files = save_extracted_data(extracted_data, base_filename=output_filename)
+        results["records_extracted"] = n_records
         results["saved_files"] = saved_files
         
-        print(f"Extracción de datos completada. {len(extracted_data)} registros procesados.")
-        print("=" * 50)
+        log.info("Extracción de datos completada. %d registros procesados.", n_records)
+        log.info(_BANNER)
     
     return results
 
@@ -87,30 +139,45 @@ def main():
     parser.add_argument('--output-name', type=str, default="resultados_extraccion",
                       help='Nombre base para los archivos de salida (default: resultados_extraccion)')
     
+    parser.add_argument('--workers', type=int, default=None,
+                      help=f'Procesos para leer los PDFs en paralelo (default: {settings.PDF_WORKERS})')
+    
+    parser.add_argument('--force', action='store_true',
+                      help='Extraer los PDFs aunque las salidas estén actualizadas')
+    
+    parser.add_argument('--no-stream', action='store_true',
+                      help='Acumular todos los registros en memoria antes de guardarlos')
+    
+    parser.add_argument('--quiet', action='store_true',
+                      help='Mostrar solo advertencias y errores')
+    
     args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO, format="%(message)s")
     
     # Ejecutar la extracción con los argumentos especificados
     results = extract_data(
         download_pdfs=not args.skip_download,
         extract_pdf_content=not args.skip_extraction,
         pdf_dir=args.pdf_dir,
-        output_filename=args.output_name
+        output_filename=args.output_name,
+        n_workers=args.workers,
+        stream=not args.no_stream,
+        force=args.force
     )
     
     # Mostrar resumen de resultados
     if results["pdfs_downloaded"]:
-        total_pdfs = sum(len(files) for files in results["pdfs_downloaded"].values())
-        print(f"Total PDFs descargados: {total_pdfs}")
+        log.info("Total PDFs descargados: %d", results["pdfs_downloaded_count"])
         
-    if results["data_extracted"]:
-        print(f"Total registros extraídos: {len(results['data_extracted'])}")
+    if results["records_extracted"]:
+        log.info("Total registros extraídos: %d", results["records_extracted"])
         
     if results["saved_files"]:
-        print("Archivos guardados:")
+        log.info("Archivos guardados:")
         for fmt, path in results["saved_files"].items():
-            print(f"  - {fmt.upper()}: {path}")
+            log.info("  - %s: %s", fmt.upper(), path)
     
-    print("Proceso de extracción completado exitosamente.")
+    log.info("Proceso de extracción completado exitosamente.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,43 @@
+"""
+Ejecución completa del pipeline ETL (extracción y transformación) en un proceso aparte.
+
+Vive en un módulo sin efectos secundarios al importarse, ya que el proceso hijo se crea
+con 'spawn' y debe importar el módulo de la función que ejecuta.
+"""
+from pipeline.extract import extract_data
+from pipeline.transform import transform_data
+from src.extractors.web_scraper import shutdown_driver
+from src.loaders.file_handler import get_binary_output
+
+
+def run_pipeline() -> None:
+    """
+    Ejecuta el pipeline ETL completo (extracción y transformación). Se invoca en un proceso
+    aparte para que el parseo de PDFs no compita con las peticiones web ni pueda tumbar el servidor.
+    """
+    try:
+        print("🚀 Iniciando pipeline ETL...")
+        
+        # Ejecutar extracción
+        extract_results = extract_data(
+            download_pdfs=True,
+            extract_pdf_content=True,
+            output_filename="plan_estudios_mac"
+        )
+        
+        # Ejecutar transformación si hay datos
+        if extract_results.get("saved_files") and get_binary_output(extract_results["saved_files"]):
+            transform_data(
+                input_file=get_binary_output(extract_results["saved_files"]),
+                add_embeddings=True,
+                output_filename="plan_estudios_mac_processed"
+            )
+        
+        print("✅ Pipeline ETL completado exitosamente")
+        
+    except Exception as e:
+        print(f"❌ Error en pipeline ETL: {e}")
+        raise SystemExit(1)
+    finally:
+        # Los procesos de multiprocessing no ejecutan los manejadores de atexit
+        shutdown_driver()
@@ -4,37 +4,121 @@ Script para la fase de transformación del ETL
 import os
 import sys
 import argparse
-from typing import Dict, List, Any, Optional, Tuple
+import json
+import logging
+from pathlib import Path
+from typing import Callable, Dict, List, Any, Optional, Tuple
+import numpy as np
 
-# Agregar la ruta del proyecto al path para poder importar los módulos
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Agregar la ruta del proyecto al path solo si se ejecuta como script
+# (con 'python -m pipeline.xxx' o al importarlo como módulo ya es importable)
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 from config import settings
-from src.transformers.embeddings import configure_gemini_api, add_embeddings_from_dict_rows
+from src.transformers.embeddings import configure_gemini_api, add_embeddings_from_dict_rows, embeddings_to_matrix
+from src.transformers.embed_cache import EmbedCache
 from src.loaders.file_handler import (
+    ARROW_AVAILABLE,
+    FEATHER_EXTENSIONS,
     load_dataframe_from_pickle,
     load_dataframe_from_csv,
+    load_dataframe_from_feather,
+    load_dataframe_from_parquet,
+    get_parquet_columns,
+    outputs_up_to_date,
     save_dataframe_to_pickle,
-    save_dataframe_to_csv
+    save_dataframe_to_csv,
+    save_dataframe_to_feather,
+    save_embeddings_to_npy
 )
 
+log = logging.getLogger("mac_gpt.etl")
 
-def load_data(input_file: str) -> Tuple[Any, str]:
+_BANNER = "=" * 50
+
+
+def _load_parquet(input_file: str, skip_columns: Optional[List[str]]) -> Any:
+    """
+    Carga un archivo Parquet leyendo del disco solo las columnas necesarias
+    
+    Args:
+        input_file (str): Ruta al archivo Parquet
+        skip_columns (Optional[List[str]]): Columnas que no se leen
+        
+    Returns:
+        Any: Datos cargados
+    """
+    columns = None
+    if skip_columns:
+        columns = [col for col in get_parquet_columns(input_file) if col not in skip_columns]
+    return load_dataframe_from_parquet(input_file, columns=columns)
+
+
+# Cargador y nombre de formato por extensión de archivo
+_LOADERS: Dict[str, Tuple[Callable[[str, Optional[List[str]]], Any], str]] = {
+    '.pkl': (lambda path, _: load_dataframe_from_pickle(path), 'pickle'),
+    '.csv': (lambda path, _: load_dataframe_from_csv(path), 'csv'),
+    '.parquet': (_load_parquet, 'parquet'),
+    **{ext: (lambda path, _: load_dataframe_from_feather(path), 'feather') for ext in FEATHER_EXTENSIONS}
+}
+
+
+def load_data(input_file: str, skip_columns: Optional[List[str]] = None) -> Tuple[Any, str]:
     """
     Carga datos desde un archivo, determinando automáticamente su formato
     
     Args:
         input_file (str): Ruta al archivo de entrada
+        skip_columns (Optional[List[str]]): Columnas que no es necesario leer. Solo se aplica
+                                            a Parquet, donde omitirlas evita leerlas del disco.
         
     Returns:
         Tuple[Any, str]: Datos cargados y el formato del archivo
     """
-    if input_file.lower().endswith('.pkl'):
-        return load_dataframe_from_pickle(input_file), 'pickle'
-    elif input_file.lower().endswith('.csv'):
-        return load_dataframe_from_csv(input_file), 'csv'
-    else:
-        raise ValueError(f"Formato de archivo no soportado: {input_file}. Use .pkl o .csv")
+    loader = _LOADERS.get(Path(input_file).suffix.lower())
+    if loader is None:
+        raise ValueError(f"Formato de archivo no soportado: {input_file}. Use .pkl, .csv, .parquet o .feather")
+    load_fn, input_format = loader
+    return load_fn(input_file, skip_columns), input_format
+
+
+def _transform_params(add_embeddings: bool, text_columns: Optional[List[str]], output_format: str) -> Dict[str, Any]:
+    """
+    Parámetros que determinan el contenido de las salidas de la transformación. Se guardan
+    junto a las salidas para no omitir una transformación hecha con otros parámetros.
+    
+    Args:
+        add_embeddings (bool): Si se agregan embeddings
+        text_columns (Optional[List[str]]): Columnas para los embeddings (None para las predeterminadas)
+        output_format (str): Formato de salida
+        
+    Returns:
+        Dict[str, Any]: Parámetros serializables a JSON
+    """
+    return {
+        "add_embeddings": add_embeddings,
+        "embedding_model": settings.DEFAULT_EMBEDDING_MODEL if add_embeddings else None,
+        "text_columns": list(text_columns if text_columns is not None else settings.DEFAULT_TEXT_COLUMNS),
+        "output_format": output_format
+    }
+
+
+def _read_transform_params(stamp_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Lee los parámetros guardados por la última transformación
+    
+    Args:
+        stamp_path (str): Ruta al archivo de parámetros
+        
+    Returns:
+        Optional[Dict[str, Any]]: Parámetros, o None si el archivo no existe o no se puede leer
+    """
+    try:
+        with open(stamp_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
 
 def transform_data(
@@ -42,7 +126,9 @@ def transform_data(
     add_embeddings: bool = True,
     text_columns: Optional[List[str]] = None,
     output_filename: Optional[str] = None,
-    output_format: str = 'both'
+    output_format: str = 'both',
+    copy: bool = False,
+    force: bool = False
 ) -> Dict[str, Any]:
     """
     Ejecuta el proceso de transformación:
@@ -58,60 +144,114 @@ def transform_data(
         output_filename (Optional[str]): Nombre base para el archivo de salida
                                         Si es None, usa el nombre del archivo de entrada
                                         con un sufijo '_transformed'
-        output_format (str): Formato de salida ('pickle', 'csv', 'both')
+        output_format (str): Formato de salida ('pickle', 'feather', 'csv', 'both').
+                             'both' guarda Feather (o pickle si pyarrow no está
+                             disponible) junto con CSV
+        copy (bool): Si es True, trabaja sobre una copia de los datos cargados. Por defecto
+                     se modifican en sitio, ya que el DataFrame cargado no se usa en otro lugar
+                     y copiarlo duplicaría el uso de memoria antes de agregar los embeddings
+        force (bool): Si es True, transforma los datos aunque los archivos de salida ya sean
+                      más recientes que el archivo de entrada y se hayan generado con los
+                      mismos parámetros
         
     Returns:
         Dict[str, Any]: Resultados del proceso de transformación
     """
+    settings.ensure_dirs()
+    
     results = {
         "data_loaded": None,
         "data_transformed": None,
         "saved_files": {}
     }
     
+    # Determinar nombre de archivo de salida
+    if output_filename is None:
+        base_name = os.path.basename(input_file)
+        name_parts = os.path.splitext(base_name)
+        output_filename = f"{name_parts[0]}_transformed"
+    
+    # Formatos a escribir. Feather es el formato binario preferido;
+    # pickle se mantiene como respaldo cuando pyarrow no está instalado.
+    output_format = output_format.lower()
+    write_feather = output_format == 'feather' or (output_format == 'both' and ARROW_AVAILABLE)
+    write_pickle = output_format == 'pickle' or (output_format == 'both' and not ARROW_AVAILABLE)
+    write_csv = output_format in ('csv', 'both')
+    
+    # Si las salidas son más recientes que el archivo de entrada y se generaron con los mismos
+    # parámetros (embeddings, modelo, columnas), no hay nada que hacer
+    expected_outputs = {}
+    if write_feather:
+        expected_outputs["feather"] = os.path.join(settings.PICKLES_DIR, f"{output_filename}.feather")
+    if write_pickle:
+        expected_outputs["pickle"] = os.path.join(settings.PICKLES_DIR, f"{output_filename}.pkl")
+    if write_csv:
+        expected_outputs["csv"] = os.path.join(settings.OUTPUT_DIR, f"{output_filename}.csv")
+    if add_embeddings:
+        expected_outputs["embeddings_npy"] = os.path.join(settings.PICKLES_DIR, f"{output_filename}_emb.npy")
+    stamp_path = os.path.join(settings.PICKLES_DIR, f"{output_filename}.transform.json")
+    params = _transform_params(add_embeddings, text_columns, output_format)
+    
+    input_mtime = os.path.getmtime(input_file) if os.path.exists(input_file) else None
+    if (not force and _read_transform_params(stamp_path) == params
+            and outputs_up_to_date(list(expected_outputs.values()), input_mtime)):
+        log.info(_BANNER)
+        log.info("Las salidas de la transformación están actualizadas respecto a %s. "
+                 "Se omite la transformación (usa force=True o --force para repetirla).", input_file)
+        results["saved_files"] = expected_outputs
+        log.info(_BANNER)
+        return results
+    
     # 1. Cargar los datos
-    print("=" * 50)
-    print(f"Cargando datos desde {input_file}...")
-    df, input_format = load_data(input_file)
+    log.info(_BANNER)
+    log.info("Cargando datos desde %s...", input_file)
+    # Si se van a regenerar los embeddings, no hace falta leer la columna existente
+    df, input_format = load_data(input_file, skip_columns=["embeddings"] if add_embeddings else None)
     results["data_loaded"] = {
         "file": input_file,
         "format": input_format,
         "records": len(df)
     }
-    print(f"Datos cargados: {len(df)} registros")
+    log.info("Datos cargados: %d registros", len(df))
     
     # Si no se especificaron columnas para embeddings, usar estas por defecto
     if text_columns is None:
-        text_columns = [
-            "nombre_materia", "semestre_txt", "modalidad", "caracter",
-            "tipo", "etapa_formacion", "campo_conocimiento", "antecedente",
-            "subsecuente", "objetivo_general", "indice_tematico",
-            "referencias_basicas", "referencias_complementarias",
-            "sugerencias_didacticas", "sugerencias_evaluacion"
-        ]
         # Asegurarse de que las columnas existan en el DataFrame
-        text_columns = [col for col in text_columns if col in df.columns]
+        available_columns = set(df.columns)
+        text_columns = [col for col in settings.DEFAULT_TEXT_COLUMNS if col in available_columns]
         
     # 2. Transformaciones
-    transformed_df = df.copy()
+    transformed_df = df.copy() if copy else df
     
     # 2.1 Generar embeddings si se solicita
+    embedding_matrix = None
     if add_embeddings:
-        print("=" * 50)
-        print("Configurando API de Gemini para embeddings...")
+        log.info(_BANNER)
+        log.info("Configurando API de Gemini para embeddings...")
         api_configured = configure_gemini_api()
         
         if api_configured:
-            print("Generando embeddings...")
-            transformed_df = add_embeddings_from_dict_rows(
-                df=transformed_df,
-                columns_for_dict=text_columns,
-                new_embedding_column_name="embeddings",
-                embedding_model_name=settings.DEFAULT_EMBEDDING_MODEL
-            )
-            print("Generación de embeddings completada.")
+            log.info("Generando embeddings...")
+            # El with cierra la conexión a la caché aunque falle la generación de embeddings
+            with EmbedCache(settings.EMBED_CACHE_PATH, ttl_seconds=settings.EMBED_CACHE_TTL) as embed_cache:
+                transformed_df = add_embeddings_from_dict_rows(
+                    df=transformed_df,
+                    columns_for_dict=text_columns,
+                    new_embedding_column_name="embeddings",
+                    embedding_model_name=settings.DEFAULT_EMBEDDING_MODEL,
+                    batch_size=settings.EMBEDDING_BATCH_SIZE,
+                    max_workers=settings.EMBEDDING_MAX_WORKERS,
+                    embed_cache=embed_cache
+                )
+            log.info("Generación de embeddings completada.")
+            
+            # Matriz contigua float32 (N, D) para consumidores que la cargan con mmap;
+            # 'embedding_row' indica la fila de la matriz correspondiente a cada registro
+            embedding_matrix = embeddings_to_matrix(transformed_df["embeddings"].tolist())
+            if embedding_matrix is not None:
+                transformed_df["embedding_row"] = np.arange(len(transformed_df))
         else:
-            print("No se pudo configurar la API de Gemini. No se generaron embeddings.")
+            log.warning("No se pudo configurar la API de Gemini. No se generaron embeddings.")
     
     results["data_transformed"] = {
         "records": len(transformed_df),
@@ -119,28 +259,37 @@ def transform_data(
     }
     
     # 3. Guardar resultados
-    print("=" * 50)
-    print("Guardando resultados...")
+    log.info(_BANNER)
+    log.info("Guardando resultados...")
     
-    # Determinar nombre de archivo de salida
-    if output_filename is None:
-        base_name = os.path.basename(input_file)
-        name_parts = os.path.splitext(base_name)
-        output_filename = f"{name_parts[0]}_transformed"
+    # Guardar en los formatos especificados
+    if write_feather:
+        feather_path = save_dataframe_to_feather(transformed_df, output_filename)
+        results["saved_files"]["feather"] = feather_path
     
-    # Guardar en el formato especificado
-    if output_format.lower() in ('pickle', 'both'):
+    if write_pickle:
         pickle_path = save_dataframe_to_pickle(transformed_df, output_filename)
         results["saved_files"]["pickle"] = pickle_path
     
-    if output_format.lower() in ('csv', 'both'):
-        csv_path = save_dataframe_to_csv(transformed_df, output_filename)
+    if write_csv:
+        # Los vectores de embeddings no son útiles en CSV y son la mayor parte de los bytes;
+        # quedan en el archivo binario y en la matriz .npy
+        csv_columns = [col for col in transformed_df.columns if col != "embeddings"]
+        csv_path = save_dataframe_to_csv(transformed_df, output_filename, columns=csv_columns)
         results["saved_files"]["csv"] = csv_path
     
-    print(f"Transformación completada. Resultados guardados en:")
+    if embedding_matrix is not None:
+        npy_path = save_embeddings_to_npy(embedding_matrix, f"{output_filename}_emb")
+        results["saved_files"]["embeddings_npy"] = npy_path
+    
+    # Registrar los parámetros solo tras guardar todas las salidas
+    with open(stamp_path, 'w', encoding='utf-8') as f:
+        json.dump(params, f, ensure_ascii=False, indent=2)
+    
+    log.info("Transformación completada. Resultados guardados en:")
     for fmt, path in results["saved_files"].items():
-        print(f"  - {fmt.upper()}: {path}")
-    print("=" * 50)
+        log.info("  - %s: %s", fmt.upper(), path)
+    log.info(_BANNER)
     
     return results
 
@@ -150,7 +299,7 @@ def main():
     parser = argparse.ArgumentParser(description='Ejecutar la fase de transformación del ETL')
     
     parser.add_argument('--input-file', type=str, required=True,
-                       help='Archivo de entrada con datos a transformar (.pkl o .csv)')
+                       help='Archivo de entrada con datos a transformar (.pkl, .csv, .parquet o .feather)')
     
     parser.add_argument('--no-embeddings', action='store_true',
                        help='No generar embeddings para los datos')
@@ -161,10 +310,17 @@ def main():
     parser.add_argument('--output-name', type=str, default=None,
                        help='Nombre base para el archivo de salida')
     
-    parser.add_argument('--output-format', type=str, choices=['pickle', 'csv', 'both'], default='both',
+    parser.add_argument('--output-format', type=str, choices=['pickle', 'feather', 'csv', 'both'], default='both',
                        help='Formato de salida (default: both)')
     
+    parser.add_argument('--force', action='store_true',
+                       help='Transformar los datos aunque las salidas estén actualizadas')
+    
+    parser.add_argument('--quiet', action='store_true',
+                       help='Mostrar solo advertencias y errores')
+    
     args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO, format="%(message)s")
     
     # Ejecutar la transformación con los argumentos especificados
     results = transform_data(
@@ -172,24 +328,29 @@ def main():
         add_embeddings=not args.no_embeddings,
         text_columns=args.text_columns,
         output_filename=args.output_name,
-        output_format=args.output_format
+        output_format=args.output_format,
+        force=args.force
     )
     
     # Mostrar resumen de resultados
-    print("\nResumen de transformación:")
-    print(f"Registros de entrada: {results['data_loaded']['records']}")
-    print(f"Registros transformados: {results['data_transformed']['records']}")
+    if results["data_transformed"] is None:
+        log.info("\nLas salidas ya estaban actualizadas; no se transformaron datos.")
+        return
+    
+    log.info("\nResumen de transformación:")
+    log.info("Registros de entrada: %d", results["data_loaded"]["records"])
+    log.info("Registros transformados: %d", results["data_transformed"]["records"])
     
     if args.no_embeddings:
-        print("No se generaron embeddings (desactivado por usuario)")
+        log.info("No se generaron embeddings (desactivado por usuario)")
     elif "embeddings" in results["data_transformed"]["columns"]:
-        print("Se generaron embeddings correctamente")
+        log.info("Se generaron embeddings correctamente")
     else:
-        print("No se pudieron generar embeddings")
+        log.warning("No se pudieron generar embeddings")
     
-    print("Archivos guardados:")
+    log.info("Archivos guardados:")
     for fmt, path in results["saved_files"].items():
-        print(f"  - {fmt.upper()}: {path}")
+        log.info("  - %s: %s", fmt.upper(), path)
 
 
 if __name__ == "__main__":
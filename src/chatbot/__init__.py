@@ -2,6 +2,15 @@
 Módulo de chatbot MAC-GPT para la Licenciatura en Matemáticas Aplicadas y Computación.
 """
 
-from src.chatbot.mac_gpt import ask_mac_gpt, configure_google_api
+from src.chatbot.mac_gpt import (
+    ask_mac_gpt, buscar_respuesta_en_cache, configure_google_api, es_pregunta_sin_contenido,
+    es_respuesta_del_llm, get_embedding_google, guardar_respuesta_en_cache, version_conocimiento
+)
+from src.chatbot.near_duplicate_cache import NearDuplicateCache
+from src.chatbot.response_cache import ResponseCache
 
-__all__ = ["ask_mac_gpt", "configure_google_api"] 
\ No newline at end of file
+__all__ = [
+    "ask_mac_gpt", "buscar_respuesta_en_cache", "configure_google_api", "es_pregunta_sin_contenido",
+    "es_respuesta_del_llm", "get_embedding_google", "guardar_respuesta_en_cache", "version_conocimiento",
+    "NearDuplicateCache", "ResponseCache"
+] 
\ No newline at end of file
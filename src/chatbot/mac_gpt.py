@@ -6,31 +6,83 @@ la API de Google Generative AI (Gemini) para responder preguntas sobre la
 Licenciatura en Matemáticas Aplicadas y Computación de la FES Acatlán, UNAM.
 """
 
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
 import os
 import pickle
 import re
+import threading
+import time
 import numpy as np
 import pandas as pd
-from typing import List, Dict, Optional, Any, Tuple
+from typing import List, Dict, FrozenSet, Optional, Any, Tuple
 
-# Attempt to import google.generativeai and scipy
+from config import settings
+from src.loaders.file_handler import load_dataframe_from_feather, outputs_up_to_date, save_dataframe_to_feather
+from src.transformers.embed_cache import EmbedCache
+
+# Attempt to import google.generativeai
 try:
     import google.generativeai as genai
 except ImportError:
     print("WARNING: google.generativeai library not found. Please install it: pip install google-generativeai")
     genai = None
 
+# blake3 es opcional; si no está instalado se usa blake2b de la biblioteca estándar
+try:
+    from blake3 import blake3 as _hash_function
+except ImportError:
+    _hash_function = hashlib.blake2b
+
+# faiss es opcional (pip install faiss-cpu); sin él la búsqueda de contextos se hace con NumPy
 try:
-    from scipy.spatial.distance import cosine as scipy_cosine_distance
-    from numpy.linalg import norm as np_linalg_norm
+    import faiss
 except ImportError:
-    print("WARNING: scipy library not found. Please install it: pip install scipy")
-    scipy_cosine_distance = None
-    np_linalg_norm = None
+    faiss = None
 
 # --- Global Variables & Configuration ---
 GOOGLE_API_KEY_CONFIGURED = False
 REPRESENTATIVE_TOPIC_EMBEDDINGS: Dict[str, np.ndarray] = {}
+# Embeddings de los temas apilados en una matriz (n_temas, d) float32 con filas normalizadas,
+# para comparar la pregunta contra todos los temas con un solo producto matriz-vector
+THEME_MATRIX: Optional[np.ndarray] = None
+THEME_KEYS: List[str] = []
+# Por ruta de archivo de conocimiento: mtime del archivo al cargarlo, DataFrame sin la columna
+# 'embeddings', matriz de embeddings normalizada (float32), posiciones de las filas con embedding
+# e índice faiss (si está instalado)
+_DF_CACHE: Dict[str, Tuple[float, pd.DataFrame, np.ndarray, np.ndarray, Any]] = {}
+# A partir de PREFILTER_MIN_ROWS documentos la búsqueda con faiss usa un índice HNSW aproximado.
+# Sin faiss siempre se calcula la similitud exacta con un producto matriz-vector float32 (BLAS):
+# una preselección con la matriz cuantizada a int8 resultó más lenta a todos los tamaños
+PREFILTER_MIN_ROWS = 2048
+HNSW_NEIGHBORS = 32
+HNSW_EF_SEARCH = 64
+# Calcular las similitudes con el kernel paralelo de numba (si está instalado) en lugar de BLAS
+USE_NUMBA_SIMILARITY = False
+# Respuestas ya generadas por hash de la pregunta normalizada, con el momento en que se guardaron;
+# al superar ANSWER_CACHE_MAX_ENTRIES se descarta la más antigua y las de más de ANSWER_CACHE_TTL
+# segundos se ignoran
+_ANSWER_CACHE: Dict[str, Tuple[float, str]] = {}
+_ANSWER_CACHE_LOCK = threading.Lock()
+ANSWER_CACHE_MAX_ENTRIES = 1024
+ANSWER_CACHE_TTL = settings.RESPONSE_CACHE_TTL
+# mtimes de los archivos de conocimiento con los que se generaron las respuestas en caché;
+# si cambian, las cachés de respuestas se vacían
+_KNOWLEDGE_VERSION: Optional[Tuple[Optional[float], ...]] = None
+# Caché semántica: buffer circular con los embeddings normalizados de las últimas
+# SEMANTIC_CACHE_SIZE preguntas respondidas y sus respuestas; una pregunta nueva cuya similitud
+# coseno con alguna de ellas sea al menos SEMANTIC_CACHE_THRESHOLD reutiliza esa respuesta
+SEMANTIC_CACHE_SIZE = 256
+SEMANTIC_CACHE_THRESHOLD = 0.92
+_SEMANTIC_CACHE_EMB: Optional[np.ndarray] = None
+_SEMANTIC_CACHE_ANS: List[str] = []
+# Workspace de cada respuesta del buffer: solo se reutilizan respuestas del mismo workspace
+_SEMANTIC_CACHE_WS: List[str] = []
+_SEMANTIC_CACHE_NEXT = 0
+# Protege el buffer, las respuestas y el índice de la caché semántica (el servidor web atiende con varios hilos)
+_SEMANTIC_CACHE_LOCK = threading.Lock()
 EMBEDDING_MODEL_NAME = "models/text-embedding-004"
 GENERATIVE_MODEL_NAME = "gemini-1.5-flash-latest" 
 
@@ -55,6 +107,35 @@ DESCRIPCIONES_TEMAS = {
     'profesores.pkl': "Información sobre el personal docente, catedráticos y académicos de la Licenciatura MAC: nombres de los profesores, sus áreas de conocimiento, especialización o interés, materias que imparten, datos de contacto como correo electrónico, y potencialmente un resumen de su currículum vitae, publicaciones o trayectoria."
 }
 
+# --- Palabras Clave por Tema ---
+# Si las palabras de la pregunta solo coinciden con un tema, se selecciona sin calcular similitudes;
+# si no coinciden con ninguno o con varios, se usa la clasificación por embeddings
+PALABRAS_CLAVE_TEMAS: Dict[str, FrozenSet[str]] = {
+    'acerca_de.pkl': frozenset({'misión', 'mision', 'visión', 'vision', 'contacto'}),
+    'convocatorias_eventos_avisos.pkl': frozenset({
+        'convocatoria', 'convocatorias', 'beca', 'becas', 'evento', 'eventos', 'aviso', 'avisos',
+        'conferencia', 'conferencias', 'seminario', 'seminarios', 'taller', 'talleres'
+    }),
+    'olap_plan_de_estudios.pkl': frozenset({
+        'materia', 'materias', 'asignatura', 'asignaturas', 'créditos', 'creditos',
+        'seriación', 'seriacion', 'optativa', 'optativas', 'temario', 'temarios'
+    }),
+    'perfiles.pkl': frozenset({'perfil', 'perfiles', 'ingreso', 'egreso', 'egresado', 'egresados', 'aspirante', 'aspirantes'}),
+    'profesores.pkl': frozenset({
+        'profesor', 'profesora', 'profesores', 'profesoras', 'docente', 'docentes',
+        'maestro', 'maestra', 'maestros', 'maestras', 'catedrático', 'catedráticos'
+    })
+}
+# Inicios de los mensajes de error o de aviso que ask_mac_gpt devuelve en lugar de una respuesta del LLM
+_PREFIJOS_SIN_RESPUESTA = (
+    "Error", "Respuesta bloqueada", "El modelo no generó", "No se pudo",
+    "MAC-GPT: Lo siento", "MAC-GPT: Parece"
+)
+# Preguntas de menos de MIN_PROMPT_LENGTH caracteres o sin letras ni números se rechazan sin llamar a la API
+MIN_PROMPT_LENGTH = 3
+_PATRON_SIN_CONTENIDO = re.compile(r'[\W_]+')
+_PATRON_PALABRAS = re.compile(r'\w+')
+
 # --- Prompt de Sistema para el LLM ---
 SISTEMA_PROMPT_MAC = """Eres MAC-GPT, un asistente virtual experto y amigable, dedicado a proporcionar información precisa y útil sobre la Licenciatura en Matemáticas Aplicadas y Computación (MAC) de la FES Acatlán, UNAM.
 
@@ -90,6 +171,29 @@ RESPUESTA DE MAC-GPT:
 # --- Variable global para la instancia del modelo LLM ---
 LLM_INSTANCE = None
 
+@functools.lru_cache(maxsize=1)
+def _configure_models(api_key: str) -> Any:
+    """
+    Configura el SDK con una clave y crea el modelo generativo. Se cachea por clave,
+    de modo que llamadas repetidas con la misma clave no vuelven a consultar la API.
+    Si falla lanza la excepción, por lo que los fallos no quedan en caché.
+    
+    Args:
+        api_key: Clave de API de Google.
+    
+    Returns:
+        genai.GenerativeModel: Instancia del modelo generativo.
+    """
+    genai.configure(api_key=api_key)
+    print(f"Attempting to access embedding model: {EMBEDDING_MODEL_NAME}")
+    genai.get_model(EMBEDDING_MODEL_NAME) 
+    print(f"Embedding model {EMBEDDING_MODEL_NAME} accessible.")
+    print(f"Attempting to initialize generative model: {GENERATIVE_MODEL_NAME}")
+    llm = genai.GenerativeModel(GENERATIVE_MODEL_NAME)
+    print(f"Generative model {GENERATIVE_MODEL_NAME} initialized successfully.")
+    print("Google API configured successfully for all required models.")
+    return llm
+
 def configure_google_api(api_key: Optional[str] = None) -> bool:
     """
     Configura la API de Google con la clave proporcionada.
@@ -102,30 +206,52 @@ def configure_google_api(api_key: Optional[str] = None) -> bool:
         bool: True si la configuración fue exitosa, False en caso contrario.
     """
     global GOOGLE_API_KEY_CONFIGURED, LLM_INSTANCE
-    if GOOGLE_API_KEY_CONFIGURED: return True
+    if GOOGLE_API_KEY_CONFIGURED and not api_key: return True
     if not genai:
         print("ERROR: google.generativeai library is not available.")
         return False
+    settings.load_env()
     actual_api_key = api_key or os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
     if not actual_api_key or actual_api_key == "YOUR_GOOGLE_API_KEY_HERE":
         print("ERROR: API key not provided, not in GEMINI_API_KEY/GOOGLE_API_KEY env var, or is a placeholder.")
         return False
     try:
-        genai.configure(api_key=actual_api_key)
-        print(f"Attempting to access embedding model: {EMBEDDING_MODEL_NAME}")
-        genai.get_model(EMBEDDING_MODEL_NAME) 
-        print(f"Embedding model {EMBEDDING_MODEL_NAME} accessible.")
-        print(f"Attempting to initialize generative model: {GENERATIVE_MODEL_NAME}")
-        LLM_INSTANCE = genai.GenerativeModel(GENERATIVE_MODEL_NAME)
-        print(f"Generative model {GENERATIVE_MODEL_NAME} initialized successfully.")
+        LLM_INSTANCE = _configure_models(actual_api_key)
         GOOGLE_API_KEY_CONFIGURED = True
-        print("Google API configured successfully for all required models.")
         return True
     except Exception as e:
         print(f"ERROR: Configuring Google API, accessing models, or initializing generative model: {e}")
         GOOGLE_API_KEY_CONFIGURED, LLM_INSTANCE = False, None
         return False
 
+@functools.lru_cache(maxsize=1)
+def _get_embed_cache() -> Optional[EmbedCache]:
+    """
+    Abre (una sola vez por proceso) la caché persistente de embeddings compartida con el ETL.
+    
+    Returns:
+        Optional[EmbedCache]: La caché, o None si no se pudo abrir.
+    """
+    try:
+        return EmbedCache(settings.EMBED_CACHE_PATH, ttl_seconds=settings.EMBED_CACHE_TTL)
+    except Exception as e:
+        print(f"WARNING: Could not open embedding cache at {settings.EMBED_CACHE_PATH}: {e}")
+        return None
+
+def _embedding_namespace(model_name: str, task_type: str) -> str:
+    """
+    Namespace de la caché de embeddings; es el mismo formato (modelo|tarea|dimensión) que usa el ETL,
+    así que los textos ya embebidos allí se reutilizan.
+    
+    Args:
+        model_name: Nombre del modelo de embedding.
+        task_type: Tipo de tarea ('RETRIEVAL_QUERY' o 'RETRIEVAL_DOCUMENT').
+        
+    Returns:
+        str: Namespace para EmbedCache.make_key.
+    """
+    return f"{model_name}|{task_type}|None"
+
 def get_embedding_google(text: str, task_type: str, model_name: str = EMBEDDING_MODEL_NAME) -> Optional[np.ndarray]:
     """
     Genera un embedding con la API de Google.
@@ -136,39 +262,330 @@ def get_embedding_google(text: str, task_type: str, model_name: str = EMBEDDING_
         model_name: Nombre del modelo de embedding a utilizar.
         
     Returns:
-        np.ndarray: El vector de embedding o None si hubo un error.
+        np.ndarray: El vector de embedding (float32) o None si hubo un error.
     """
     if not GOOGLE_API_KEY_CONFIGURED or not genai: print("API not configured for get_embedding_google"); return None
     if not text or not text.strip(): print("Empty text for get_embedding_google"); return None
+    embed_cache = _get_embed_cache()
+    cache_key = EmbedCache.make_key(text, _embedding_namespace(model_name, task_type))
+    if embed_cache is not None:
+        cached = embed_cache.get_many([cache_key]).get(cache_key)
+        if cached is not None: return cached
     try:
         response = genai.embed_content(model=model_name, content=text, task_type=task_type)
-        return np.array(response['embedding'])
+        embedding = np.asarray(response['embedding'], dtype=np.float32)
+        if embed_cache is not None: embed_cache.put_many({cache_key: embedding})
+        return embedding
     except Exception as e:
         print(f"ERROR generating embedding for text '{text[:50]}...': {e}"); return None
 
-def similitud_coseno_scipy(vec1: Any, vec2: Any) -> Optional[float]:
+def get_embeddings_google_batch(texts: List[str], task_type: str, model_name: str = EMBEDDING_MODEL_NAME) -> List[Optional[np.ndarray]]:
     """
-    Calcula la similitud del coseno entre dos vectores.
+    Genera embeddings para varios textos con una sola solicitud a la API de Google,
+    enviando únicamente los que no están en la caché persistente. Si la solicitud por lotes
+    falla, los textos se embeben con solicitudes individuales en paralelo.
     
     Args:
-        vec1: Primer vector (numpy array o lista).
-        vec2: Segundo vector (numpy array o lista).
+        texts: Textos para generar los embeddings.
+        task_type: Tipo de tarea ('RETRIEVAL_QUERY' o 'RETRIEVAL_DOCUMENT').
+        model_name: Nombre del modelo de embedding a utilizar.
         
     Returns:
-        float: Valor de similitud entre 0 y 1, o None si hubo un error.
+        list: Un vector de embedding por texto, en el mismo orden (None para los vacíos o si hubo un error).
     """
-    if scipy_cosine_distance is None or np_linalg_norm is None: return None
-    if not isinstance(vec1, (np.ndarray, list)) or not isinstance(vec2, (np.ndarray, list)): return None
+    if not GOOGLE_API_KEY_CONFIGURED or not genai: print("API not configured for get_embeddings_google_batch"); return [None] * len(texts)
+    embed_cache = _get_embed_cache()
+    namespace = _embedding_namespace(model_name, task_type)
+    keys = [EmbedCache.make_key(text or "", namespace) for text in texts]
+    found = embed_cache.get_many(keys) if embed_cache is not None else {}
+    missing = [i for i, key in enumerate(keys) if key not in found and texts[i] and texts[i].strip()]
+    if missing:
+        try:
+            response = genai.embed_content(model=model_name, content=[texts[i] for i in missing], task_type=task_type)
+            computed = {keys[i]: np.asarray(vector, dtype=np.float32) for i, vector in zip(missing, response['embedding'])}
+            if embed_cache is not None: embed_cache.put_many(computed)
+            found.update(computed)
+        except Exception as e:
+            # Si el SDK o el modelo no aceptan listas, las llamadas individuales se hacen en paralelo
+            print(f"WARNING: Batch embedding failed for {len(missing)} texts ({e}); falling back to parallel requests.")
+            with ThreadPoolExecutor(max_workers=min(len(missing), settings.EMBEDDING_MAX_WORKERS)) as executor:
+                vectors = list(executor.map(
+                    lambda i: get_embedding_google(texts[i], task_type=task_type, model_name=model_name), missing
+                ))
+            found.update({keys[i]: vector for i, vector in zip(missing, vectors) if vector is not None})
+    return [found.get(key) for key in keys]
+
+def _normalizar_consulta(embedding: Any) -> Optional[np.ndarray]:
+    """
+    Convierte un embedding a un vector float32 de norma 1.
+    
+    Args:
+        embedding: Vector (lista o array).
+        
+    Returns:
+        Optional[np.ndarray]: Vector normalizado, o None si no hay vector, está vacío o su norma es cero.
+    """
+    if embedding is None: return None
+    query = np.asarray(embedding, dtype=np.float32).ravel()
+    query_norm = np.linalg.norm(query)
+    if query.size == 0 or query_norm == 0: return None
+    return query / query_norm
+
+def similitud_coseno_fast(vec1_norm: np.ndarray, vec2_norm: np.ndarray) -> float:
+    """
+    Calcula la similitud del coseno entre dos vectores ya normalizados (norma 1),
+    que se reduce a su producto punto.
+    
+    Args:
+        vec1_norm: Primer vector normalizado.
+        vec2_norm: Segundo vector normalizado.
+        
+    Returns:
+        float: Valor de similitud entre -1 y 1.
+    """
+    return float(vec1_norm @ vec2_norm)
+
+def construir_matriz_embeddings(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Apila la columna 'embeddings' en una matriz float32 (N, d) con filas normalizadas,
+    de modo que la similitud coseno con una consulta normalizada sea un producto punto.
+    
+    Args:
+        df: DataFrame con una columna 'embeddings' (lista o array por fila).
+        
+    Returns:
+        tuple: (matriz normalizada, posiciones en df de las filas incluidas). Las filas sin
+               embedding válido o con una dimensión distinta a la de la primera se omiten.
+    """
+    emb_values = df['embeddings'].to_numpy()
+    lengths = np.fromiter(
+        (len(v) if isinstance(v, (list, np.ndarray)) else 0 for v in emb_values),
+        dtype=np.intp, count=len(emb_values)
+    )
+    valid = np.flatnonzero(lengths)
+    if valid.size == 0:
+        return np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=np.intp)
+    positions = np.flatnonzero(lengths == lengths[valid[0]])
+    matrix = np.vstack(emb_values[positions]).astype(np.float32, copy=False)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+    return matrix, positions
+
+@functools.lru_cache(maxsize=1)
+def _get_similitudes_numba() -> Optional[Any]:
+    """
+    Importa numba y compila el kernel paralelo de similitudes la primera vez que se usa,
+    para no pagar la importación de numba/LLVM al arrancar cuando USE_NUMBA_SIMILARITY está apagado.
+    
+    Returns:
+        Optional[Any]: Kernel (matriz, consulta) -> similitudes, o None si numba no está instalado.
+    """
+    # numba es opcional (pip install numba); sin él las similitudes se calculan con NumPy/BLAS
     try:
-        vec1_np = np.array(vec1, dtype=float)
-        vec2_np = np.array(vec2, dtype=float)
-    except ValueError: return None # Non-numeric data
-    if vec1_np.shape != vec2_np.shape or vec1_np.size == 0: return None
-    norm1, norm2 = np_linalg_norm(vec1_np), np_linalg_norm(vec2_np)
-    if norm1 == 0 and norm2 == 0: return 1.0
-    if norm1 == 0 or norm2 == 0: return 0.0
-    try: return float(1 - scipy_cosine_distance(vec1_np, vec2_np))
-    except Exception: return None
+        from numba import njit, prange
+    except ImportError:
+        return None
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _similitudes_numba(matrix, query):
+        out = np.empty(matrix.shape[0], dtype=np.float32)
+        for i in prange(matrix.shape[0]):
+            acc = np.float32(0.0)
+            for j in range(matrix.shape[1]):
+                acc += matrix[i, j] * query[j]
+            out[i] = acc
+        return out
+    return _similitudes_numba
+
+def similitudes_coseno(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+    Similitud coseno de una consulta normalizada contra todas las filas (normalizadas) de una matriz.
+    Usa el kernel paralelo de numba si USE_NUMBA_SIMILARITY está activo y numba está instalado;
+    en otro caso, un producto matriz-vector de NumPy.
+    
+    Args:
+        matrix: Matriz float32 (N, d) con filas normalizadas.
+        query: Consulta float32 (d,) normalizada.
+        
+    Returns:
+        np.ndarray: Vector (N,) de similitudes.
+    """
+    kernel = _get_similitudes_numba() if USE_NUMBA_SIMILARITY else None
+    if kernel is not None:
+        return kernel(np.ascontiguousarray(matrix), np.ascontiguousarray(query))
+    return matrix @ query
+
+def indices_top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Devuelve los índices de los k valores más altos ordenados de mayor a menor.
+    Usa np.argpartition (O(N)) y solo ordena los k seleccionados.
+    
+    Args:
+        scores: Vector de puntajes (por ejemplo, similitudes).
+        k: Número de índices a devolver (se recorta al tamaño de scores).
+        
+    Returns:
+        np.ndarray: Índices de los k mejores puntajes, en orden descendente.
+    """
+    k = min(k, scores.size)
+    if k <= 0: return np.empty(0, dtype=np.intp)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+def construir_indice_faiss(matrix: np.ndarray) -> Any:
+    """
+    Construye un índice faiss de producto interno sobre una matriz de embeddings normalizada,
+    equivalente a la similitud coseno. Es exacto (IndexFlatIP) salvo a partir de
+    PREFILTER_MIN_ROWS filas, donde se usa un grafo HNSW aproximado.
+    
+    Args:
+        matrix: Matriz float32 (N, d) con filas normalizadas.
+        
+    Returns:
+        Any: Índice faiss con las N filas agregadas, o None si faiss no está instalado o la matriz está vacía.
+    """
+    if faiss is None or matrix.size == 0: return None
+    dim = matrix.shape[1]
+    if matrix.shape[0] >= PREFILTER_MIN_ROWS:
+        index = faiss.IndexHNSWFlat(dim, HNSW_NEIGHBORS, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    else:
+        index = faiss.IndexFlatIP(dim)
+    index.add(np.ascontiguousarray(matrix, dtype=np.float32))
+    return index
+
+def _parsear_embedding_texto(texto: str) -> np.ndarray:
+    """
+    Convierte un embedding guardado como texto en CSV a un array float32 sin evaluar código.
+    Acepta tanto listas de Python ("[0.1, 0.2]") como arrays de NumPy ("[0.1 0.2]").
+    
+    Args:
+        texto: Representación textual del vector.
+        
+    Returns:
+        np.ndarray: Vector float32 (vacío si el texto no contiene números).
+    """
+    return np.fromstring(texto.strip().strip('[]').replace(',', ' '), sep=' ', dtype=np.float32)
+
+def _rutas_sidecar(file_path: str) -> Tuple[str, str]:
+    """
+    Rutas de la matriz de embeddings (.npy) y de los metadatos (.feather) migrados de un pickle.
+    La matriz usa el sufijo '_qemb' para no confundirse con el '_emb.npy' que escribe el ETL
+    (sin normalizar y con filas NaN).
+    
+    Args:
+        file_path: Ruta al archivo .pkl de conocimiento.
+        
+    Returns:
+        tuple: (ruta de la matriz .npy, ruta de los metadatos .feather)
+    """
+    base = os.path.splitext(file_path)[0]
+    return f"{base}_qemb.npy", f"{base}_meta.feather"
+
+def _escribir_sidecars(file_path: str, df: pd.DataFrame, emb_matrix: np.ndarray, emb_positions: np.ndarray) -> Tuple[str, str]:
+    """
+    Guarda la matriz de embeddings normalizada en .npy y el resto de columnas en Feather (Arrow IPC).
+    La columna 'embedding_row' de los metadatos indica la fila de la matriz de cada registro
+    (-1 si el registro no tiene embedding). Cada archivo se escribe con un nombre temporal y se
+    renombra al terminar, así otros hilos nunca leen un archivo a medio escribir.
+    
+    Args:
+        file_path: Ruta al archivo .pkl de conocimiento.
+        df: DataFrame sin la columna 'embeddings'.
+        emb_matrix: Matriz de embeddings normalizada.
+        emb_positions: Posiciones en df de las filas de la matriz.
+        
+    Returns:
+        tuple: (ruta de la matriz .npy, ruta de los metadatos .feather)
+    """
+    npy_path, meta_path = _rutas_sidecar(file_path)
+    embedding_row = np.full(len(df), -1, dtype=np.int64)
+    embedding_row[emb_positions] = np.arange(len(emb_positions))
+    sufijo_tmp = f".tmp-{os.getpid()}-{threading.get_ident()}"
+    npy_tmp, meta_tmp = npy_path + sufijo_tmp + ".npy", meta_path + sufijo_tmp + ".feather"
+    try:
+        with open(npy_tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(emb_matrix, dtype=np.float32))
+        save_dataframe_to_feather(
+            df.assign(embedding_row=embedding_row), os.path.basename(meta_tmp), os.path.dirname(meta_tmp) or "."
+        )
+        os.replace(npy_tmp, npy_path)
+        os.replace(meta_tmp, meta_path)
+    finally:
+        for tmp in (npy_tmp, meta_tmp):
+            if os.path.exists(tmp): os.remove(tmp)
+    return npy_path, meta_path
+
+def migrar_pickle_a_npy(file_path: str) -> Tuple[str, str]:
+    """
+    Migra un archivo de conocimiento .pkl (embeddings como objetos por fila) a una matriz
+    float32 (N, d) en .npy, que se carga con memory mapping, más los metadatos en Feather.
+    
+    Args:
+        file_path: Ruta al archivo .pkl de conocimiento.
+        
+    Returns:
+        tuple: (ruta de la matriz .npy, ruta de los metadatos .feather)
+    """
+    df = pd.read_pickle(file_path)
+    emb_matrix, emb_positions = construir_matriz_embeddings(df)
+    return _escribir_sidecars(file_path, df.drop(columns=["embeddings"]), emb_matrix, emb_positions)
+
+def _cargar_archivo_conocimiento(file_path: str, archivo_seleccionado: str) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """
+    Carga un archivo de conocimiento (pickle, o CSV como respaldo) y construye su matriz de embeddings.
+    
+    Args:
+        file_path: Ruta al archivo.
+        archivo_seleccionado: Nombre del archivo, para los mensajes de error.
+        
+    Returns:
+        tuple: (DataFrame sin la columna 'embeddings', matriz de embeddings normalizada,
+                posiciones de las filas con embedding)
+        
+    Raises:
+        ValueError: Si el archivo no se pudo cargar, está vacío o no tiene columna 'embeddings'.
+    """
+    # Preferir la versión migrada (matriz .npy y metadatos Feather, ambos con memory mapping) si está al día
+    npy_path, meta_path = _rutas_sidecar(file_path)
+    if outputs_up_to_date([npy_path, meta_path], os.path.getmtime(file_path)):
+        try:
+            meta_df = load_dataframe_from_feather(meta_path)
+            embedding_row = meta_df.pop("embedding_row").to_numpy()
+            # float32 contiguo para que el producto matriz-vector use sgemv (sin copia si el .npy ya lo es)
+            emb_matrix = np.ascontiguousarray(np.load(npy_path, mmap_mode="r"), dtype=np.float32)
+            return meta_df, emb_matrix, np.flatnonzero(embedding_row >= 0)
+        except Exception as e_sidecar:
+            print(f"  INFO: LLM: Failed to load migrated files for {archivo_seleccionado} ({e_sidecar}), loading PKL.")
+
+    df = pd.DataFrame() # Initialize
+    loaded_from_pickle = False
+    try:
+        df = pd.read_pickle(file_path)
+        loaded_from_pickle = True
+    except (pickle.UnpicklingError, TypeError, EOFError, AttributeError) as e_pkl: # Added AttributeError
+        print(f"  INFO: LLM: Failed to load {archivo_seleccionado} as PKL ({e_pkl}), attempting CSV.")
+        try:
+            df = pd.read_csv(file_path)
+            if "embeddings" in df.columns and isinstance(df["embeddings"].iloc[0], str):
+                print(f"  INFO: Converting string embeddings in {archivo_seleccionado} (CSV) to arrays.")
+                df["embeddings"] = [_parsear_embedding_texto(x) if isinstance(x, str) else x for x in df["embeddings"]]
+        except Exception as e_csv:
+            raise ValueError(f"Error al cargar el archivo {archivo_seleccionado} como CSV: {e_csv}")
+
+    if df.empty:
+        raise ValueError(f"Error: El archivo {archivo_seleccionado} está vacío o no se pudo cargar correctamente.")
+    if "embeddings" not in df.columns:
+        raise ValueError(f"Error: La columna 'embeddings' no se encuentra en el archivo {archivo_seleccionado}.")
+    emb_matrix, emb_positions = construir_matriz_embeddings(df)
+    # Los embeddings ya están en la matriz y nunca se envían al LLM
+    df = df.drop(columns=["embeddings"])
+    if loaded_from_pickle:
+        try:
+            _escribir_sidecars(file_path, df, emb_matrix, emb_positions)
+            print(f"  INFO: LLM: Migrated {archivo_seleccionado} to {os.path.basename(npy_path)} + {os.path.basename(meta_path)}.")
+        except Exception as e_migrate:
+            print(f"  INFO: LLM: Could not migrate {archivo_seleccionado} to .npy/.feather ({e_migrate}).")
+    return df, emb_matrix, emb_positions
 
 def cargar_y_precalcular_embeddings_temas() -> bool:
     """
@@ -177,7 +594,7 @@ def cargar_y_precalcular_embeddings_temas() -> bool:
     Returns:
         bool: True si la carga y precálculo fue exitoso, False en caso contrario.
     """
-    global REPRESENTATIVE_TOPIC_EMBEDDINGS
+    global REPRESENTATIVE_TOPIC_EMBEDDINGS, THEME_MATRIX, THEME_KEYS
     if not GOOGLE_API_KEY_CONFIGURED:
         print("ERROR: Google API not configured. Cannot generate theme description embeddings.")
         return False
@@ -187,16 +604,23 @@ def cargar_y_precalcular_embeddings_temas() -> bool:
 
     print(f"Generating and caching representative embeddings for {len(DESCRIPCIONES_TEMAS)} themes...")
     loaded_count = 0
-    for theme_file, description in DESCRIPCIONES_TEMAS.items():
+    pending_themes = []
+    for theme_file in DESCRIPCIONES_TEMAS:
         if theme_file in REPRESENTATIVE_TOPIC_EMBEDDINGS:
             print(f"  INFO: Representative embedding for {theme_file} already cached. Skipping generation.")
             loaded_count +=1
-            continue
-        
-        print(f"  Generating embedding for description of: {theme_file}")
-        # These descriptions act as the "document" representing the theme
-        theme_desc_embedding = get_embedding_google(description, task_type="RETRIEVAL_DOCUMENT")
-        
+        else:
+            pending_themes.append(theme_file)
+    
+    if pending_themes:
+        print(f"  Generating embeddings for {len(pending_themes)} theme descriptions in a single request")
+    # These descriptions act as the "document" representing the theme
+    theme_desc_embeddings = get_embeddings_google_batch(
+        [DESCRIPCIONES_TEMAS[theme_file] for theme_file in pending_themes], task_type="RETRIEVAL_DOCUMENT"
+    )
+    for theme_file, theme_desc_embedding in zip(pending_themes, theme_desc_embeddings):
+        # Se guardan normalizados, así la similitud coseno con una consulta normalizada es un producto punto
+        if theme_desc_embedding is not None: theme_desc_embedding = _normalizar_consulta(theme_desc_embedding)
         if theme_desc_embedding is not None:
             REPRESENTATIVE_TOPIC_EMBEDDINGS[theme_file] = theme_desc_embedding
             print(f"    Successfully generated and cached representative embedding for {theme_file}.")
@@ -205,12 +629,28 @@ def cargar_y_precalcular_embeddings_temas() -> bool:
             print(f"    ERROR: Failed to generate embedding for description of {theme_file}. Skipping theme.")
             
     if loaded_count > 0:
+        THEME_KEYS = list(REPRESENTATIVE_TOPIC_EMBEDDINGS.keys())
+        THEME_MATRIX = np.stack(list(REPRESENTATIVE_TOPIC_EMBEDDINGS.values()))
         print(f"Representative theme description embeddings generated/cached for {loaded_count}/{len(DESCRIPCIONES_TEMAS)} themes.")
         return True
     print("ERROR: No representative theme description embeddings were successfully generated or cached.")
     return False
 
-def seleccionar_fuente_de_datos_mac(user_prompt: str) -> Tuple[Optional[str], Optional[str]]:
+def enrutar_por_palabras_clave(user_prompt: str) -> Optional[str]:
+    """
+    Selecciona el tema de una pregunta por palabras clave, sin llamar a la API.
+    
+    Args:
+        user_prompt: Pregunta del usuario.
+        
+    Returns:
+        Optional[str]: Archivo del tema si las palabras de la pregunta coinciden con exactamente un tema, o None.
+    """
+    palabras = set(_PATRON_PALABRAS.findall(user_prompt.lower()))
+    coincidencias = [tema for tema, claves in PALABRAS_CLAVE_TEMAS.items() if not palabras.isdisjoint(claves)]
+    return coincidencias[0] if len(coincidencias) == 1 else None
+
+def seleccionar_fuente_de_datos_mac(user_prompt: str) -> Tuple[Optional[str], Optional[str], Optional[np.ndarray]]:
     """
     Identifica el archivo .pkl de tema más relevante para la pregunta del usuario
     comparando el embedding de la pregunta con los embeddings precalculados de los temas.
@@ -219,49 +659,76 @@ def seleccionar_fuente_de_datos_mac(user_prompt: str) -> Tuple[Optional[str], Op
         user_prompt: Pregunta del usuario.
         
     Returns:
-        tuple: (archivo_tema_seleccionado, pregunta_original_del_usuario)
+        tuple: (archivo_tema_seleccionado, pregunta_original_del_usuario, embedding_de_la_pregunta)
     """
-    if not GOOGLE_API_KEY_CONFIGURED: print("ERROR: API not configured for theme selection."); return None, user_prompt
-    if not REPRESENTATIVE_TOPIC_EMBEDDINGS: print("ERROR: Theme description embeddings not calculated."); return None, user_prompt
-    if not user_prompt or not user_prompt.strip(): print("WARNING: User prompt is empty."); return None, user_prompt
+    if not GOOGLE_API_KEY_CONFIGURED: print("ERROR: API not configured for theme selection."); return None, user_prompt, None
+    if THEME_MATRIX is None: print("ERROR: Theme description embeddings not calculated."); return None, user_prompt, None
+    if not user_prompt or not user_prompt.strip(): print("WARNING: User prompt is empty."); return None, user_prompt, None
 
     print(f"\nSelecting data source for prompt: '{user_prompt}'")
+    keyword_theme = enrutar_por_palabras_clave(user_prompt)
+    # El embedding se calcula una sola vez también con las palabras clave: lo reutilizan la caché
+    # semántica y la recuperación de contextos
     prompt_embedding = get_embedding_google(user_prompt, task_type="RETRIEVAL_QUERY")
-    if prompt_embedding is None: print("ERROR: Failed to embed user prompt."); return None, user_prompt
+    if keyword_theme in THEME_KEYS:
+        print(f"  -> Selected theme file based on keywords: {keyword_theme}")
+        return keyword_theme, user_prompt, prompt_embedding
+    if prompt_embedding is None: print("ERROR: Failed to embed user prompt."); return None, user_prompt, None
 
     selected_theme_file, max_similarity_topic = None, -2.0
     print("  Calculating similarities with theme description embeddings:")
-    for theme_file, desc_embedding in REPRESENTATIVE_TOPIC_EMBEDDINGS.items():
-        similarity = similitud_coseno_scipy(prompt_embedding, desc_embedding)
-        if similarity is not None:
+    query = _normalizar_consulta(prompt_embedding)
+    if query is None or query.shape != THEME_MATRIX.shape[1:]:
+        print("    WARNING: Could not calculate similarities for the prompt embedding.")
+    else:
+        similarities = THEME_MATRIX @ query
+        for theme_file, similarity in zip(THEME_KEYS, similarities):
             print(f"    vs {theme_file}: {similarity:.4f}")
-            if similarity > max_similarity_topic:
-                max_similarity_topic, selected_theme_file = similarity, theme_file
-        else:
-            print(f"    WARNING: Could not calculate similarity for theme {theme_file} with prompt.")
+        best = int(similarities.argmax())
+        selected_theme_file, max_similarity_topic = THEME_KEYS[best], float(similarities[best])
     
     if selected_theme_file:
         print(f"  -> Selected theme file based on description: {selected_theme_file} (Similarity: {max_similarity_topic:.4f})")
     else:
         print("ERROR: Could not classify prompt using theme descriptions.")
-    return selected_theme_file, user_prompt
+    return selected_theme_file, user_prompt, prompt_embedding
+
+def serializar_contextos(registros: List[Dict[str, Any]]) -> str:
+    """
+    Serializa los contextos recuperados como JSON compacto (sin espacios ni escapes de acentos)
+    para reducir los tokens enviados al LLM. Los campos vacíos (None, NaN o NaT) se omiten.
+    
+    Args:
+        registros: Filas del DataFrame de contexto como diccionarios.
+        
+    Returns:
+        str: Lista JSON de registros.
+    """
+    compactos = [
+        {k: v for k, v in registro.items() if not (pd.api.types.is_scalar(v) and pd.isna(v))}
+        for registro in registros
+    ]
+    return json.dumps(compactos, ensure_ascii=False, separators=(',', ':'), default=str)
 
 def generar_respuesta_con_llm(
     pregunta_usuario: str,
     archivo_seleccionado: Optional[str],
     directorio_pickles: str = DEFAULT_PICKLE_DIR,
-    top_n_contextos: int = 7
+    top_n_contextos: int = 7,
+    precomputed_query_embedding: Optional[np.ndarray] = None
 ) -> str:
     """
     Genera una respuesta final utilizando el LLM.
     Realiza su propia recuperación de contexto desde el archivo seleccionado 
-    y formatea el contexto como str(List[Dict]).
+    y formatea el contexto como una lista JSON compacta de registros.
     
     Args:
         pregunta_usuario: Pregunta del usuario.
         archivo_seleccionado: Archivo .pkl seleccionado para la recuperación de contexto.
         directorio_pickles: Directorio donde se encuentran los archivos .pkl.
         top_n_contextos: Número de contextos relevantes a recuperar.
+        precomputed_query_embedding: Embedding RETRIEVAL_QUERY de la pregunta ya calculado
+                                     (por ejemplo, durante la selección del tema); si es None se calcula aquí.
         
     Returns:
         str: Respuesta generada por el modelo.
@@ -276,7 +743,9 @@ def generar_respuesta_con_llm(
 
     if archivo_seleccionado: # Only retrieve context if a theme was successfully selected
         print(f"  LLM context retrieval from: {archivo_seleccionado}")
-        prompt_embedding_for_retrieval = get_embedding_google(pregunta_usuario, task_type="RETRIEVAL_QUERY")
+        prompt_embedding_for_retrieval = precomputed_query_embedding
+        if prompt_embedding_for_retrieval is None:
+            prompt_embedding_for_retrieval = get_embedding_google(pregunta_usuario, task_type="RETRIEVAL_QUERY")
         
         if prompt_embedding_for_retrieval is None:
             contexto_str = "Error al generar embedding de la pregunta para buscar contextos."
@@ -286,50 +755,39 @@ def generar_respuesta_con_llm(
                 if not os.path.exists(file_path):
                     return f"Error: El archivo de conocimiento '{archivo_seleccionado}' no fue encontrado en '{directorio_pickles}'."
                 
-                df = pd.DataFrame() # Initialize
-                try:
-                    df = pd.read_pickle(file_path)
-                except (pickle.UnpicklingError, TypeError, EOFError, AttributeError) as e_pkl: # Added AttributeError
-                    print(f"  INFO: LLM: Failed to load {archivo_seleccionado} as PKL ({e_pkl}), attempting CSV.")
+                # Reutilizar el archivo ya cargado mientras no se modifique en disco
+                file_mtime = os.path.getmtime(file_path)
+                cached_entry = _DF_CACHE.get(file_path)
+                if cached_entry is None or cached_entry[0] != file_mtime:
                     try:
-                        df = pd.read_csv(file_path)
-                        if "embeddings" in df.columns and isinstance(df["embeddings"].iloc[0], str):
-                            print(f"  INFO: Converting string embeddings in {archivo_seleccionado} (CSV) to arrays.")
-                            df["embeddings"] = df["embeddings"].apply(lambda x: np.array(eval(x)) if isinstance(x, str) else x)
-                    except Exception as e_csv:
-                        return f"Error al cargar el archivo {archivo_seleccionado} como CSV: {e_csv}"
-
-                if df.empty:
-                    return f"Error: El archivo {archivo_seleccionado} está vacío o no se pudo cargar correctamente."
-                if "embeddings" not in df.columns:
-                    return f"Error: La columna 'embeddings' no se encuentra en el archivo {archivo_seleccionado}."
+                        df, emb_matrix, emb_positions = _cargar_archivo_conocimiento(file_path, archivo_seleccionado)
+                    except ValueError as e_load:
+                        return str(e_load)
+                    faiss_index = construir_indice_faiss(emb_matrix)
+                    cached_entry = (file_mtime, df, emb_matrix, emb_positions, faiss_index)
+                    _DF_CACHE[file_path] = cached_entry
+                _, df, emb_matrix, emb_positions, faiss_index = cached_entry
                 
-                similarities = []
-                for idx, row_emb_item in enumerate(df['embeddings']):
-                    # Ensure row_emb_item is a valid vector (list or ndarray) before processing
-                    if isinstance(row_emb_item, (list, np.ndarray)):
-                        doc_emb_np = np.array(row_emb_item)
-                        if doc_emb_np.size > 0:
-                            sim = similitud_coseno_scipy(prompt_embedding_for_retrieval, doc_emb_np)
-                            if sim is not None: similarities.append((sim, df.index[idx]))
-                    # else: print(f"    Skipping invalid embedding type at index {idx} in {archivo_seleccionado}")
-
-                if not similarities:
+                query = _normalizar_consulta(prompt_embedding_for_retrieval)
+                if emb_matrix.size == 0 or query is None or query.shape != emb_matrix.shape[1:]:
                     print(f"    No valid document similarities calculated within {archivo_seleccionado}.")
                     # contexto_str remains the default "no info found"
                 else:
-                    similarities.sort(key=lambda x: x[0], reverse=True)
-                    top_indices = [idx for _, idx in similarities[:top_n_contextos]]
-                    
-                    top_contexts_df = df.loc[top_indices].copy()
-                    if 'embeddings' in top_contexts_df.columns:
-                        top_contexts_df.drop(columns=["embeddings"], inplace=True)
+                    if faiss_index is not None:
+                        # faiss devuelve los k vecinos ya ordenados por similitud (-1 si no hay suficientes)
+                        _, found = faiss_index.search(query.reshape(1, -1), min(top_n_contextos, emb_matrix.shape[0]))
+                        top = found[0][found[0] >= 0]
+                    else:
+                        # Similitud coseno contra todos los documentos con un solo producto matriz-vector
+                        similarities = similitudes_coseno(emb_matrix, query)
+                        top = indices_top_k(similarities, top_n_contextos)
                     
-                    top_contexts_list_of_dicts = top_contexts_df.to_dict(orient="records")
+                    # El DataFrame en caché ya no tiene la columna 'embeddings'; se convierte el corte directamente
+                    top_contexts_list_of_dicts = df.iloc[emb_positions[top]].to_dict(orient="records")
                     
                     if top_contexts_list_of_dicts:
-                        contexto_str = str(top_contexts_list_of_dicts) 
-                        print(f"    Context for LLM (string of list of dicts, top {len(top_contexts_list_of_dicts)} from {archivo_seleccionado}): {contexto_str[:250]}...")
+                        contexto_str = serializar_contextos(top_contexts_list_of_dicts)
+                        print(f"    Context for LLM (JSON list of records, top {len(top_contexts_list_of_dicts)} from {archivo_seleccionado}): {contexto_str[:250]}...")
                     else:
                         print(f"    No contexts found in {archivo_seleccionado} after similarity ranking.")
                         # contexto_str remains default
@@ -354,18 +812,241 @@ def generar_respuesta_con_llm(
         print(f"ERROR generando respuesta con LLM: {e}")
         return f"Error al generar respuesta: {str(e)}"
 
-def ask_mac_gpt(prompt: str, directorio_pickles: str = DEFAULT_PICKLE_DIR) -> str:
+def buscar_respuesta_semantica(
+    prompt_embedding: Any, threshold: float = SEMANTIC_CACHE_THRESHOLD, workspace: str = "default"
+) -> Optional[str]:
+    """
+    Busca en la caché semántica una respuesta a una pregunta parecida a la actual.
+    
+    Args:
+        prompt_embedding: Embedding de la pregunta actual (RETRIEVAL_QUERY).
+        threshold: Similitud coseno mínima para reutilizar una respuesta.
+        workspace: Espacio de nombres de la caché.
+        
+    Returns:
+        Optional[str]: Respuesta guardada de la pregunta más parecida, o None si ninguna supera el umbral.
+    """
+    query = _normalizar_consulta(prompt_embedding)
+    if query is None: return None
+    with _SEMANTIC_CACHE_LOCK:
+        if _SEMANTIC_CACHE_EMB is None or not _SEMANTIC_CACHE_ANS: return None
+        if query.shape != _SEMANTIC_CACHE_EMB.shape[1:]: return None
+        similarities = _SEMANTIC_CACHE_EMB[:len(_SEMANTIC_CACHE_ANS)] @ query
+        similarities[np.asarray(_SEMANTIC_CACHE_WS) != workspace] = -np.inf
+        best = int(similarities.argmax())
+        if similarities[best] < threshold: return None
+        answer = _SEMANTIC_CACHE_ANS[best]
+    print(f"  -> Answer served from semantic cache (Similarity: {similarities[best]:.4f}).")
+    return answer
+
+def guardar_respuesta_semantica(prompt_embedding: Any, answer: str, workspace: str = "default") -> None:
+    """
+    Agrega una pregunta respondida a la caché semántica, reemplazando la más antigua
+    cuando el buffer está lleno.
+    
+    Args:
+        prompt_embedding: Embedding de la pregunta (RETRIEVAL_QUERY).
+        answer: Respuesta final entregada al usuario.
+        workspace: Espacio de nombres de la caché.
+    """
+    global _SEMANTIC_CACHE_EMB, _SEMANTIC_CACHE_ANS, _SEMANTIC_CACHE_WS, _SEMANTIC_CACHE_NEXT
+    query = _normalizar_consulta(prompt_embedding)
+    if query is None: return
+    with _SEMANTIC_CACHE_LOCK:
+        if _SEMANTIC_CACHE_EMB is None or _SEMANTIC_CACHE_EMB.shape[1:] != query.shape:
+            _SEMANTIC_CACHE_EMB = np.zeros((SEMANTIC_CACHE_SIZE, query.size), dtype=np.float32)
+            _SEMANTIC_CACHE_ANS, _SEMANTIC_CACHE_WS, _SEMANTIC_CACHE_NEXT = [], [], 0
+        _SEMANTIC_CACHE_EMB[_SEMANTIC_CACHE_NEXT] = query
+        if len(_SEMANTIC_CACHE_ANS) < SEMANTIC_CACHE_SIZE:
+            _SEMANTIC_CACHE_ANS.append(answer)
+            _SEMANTIC_CACHE_WS.append(workspace)
+        else:
+            _SEMANTIC_CACHE_ANS[_SEMANTIC_CACHE_NEXT] = answer
+            _SEMANTIC_CACHE_WS[_SEMANTIC_CACHE_NEXT] = workspace
+        _SEMANTIC_CACHE_NEXT = (_SEMANTIC_CACHE_NEXT + 1) % SEMANTIC_CACHE_SIZE
+
+def es_respuesta_del_llm(answer: str) -> bool:
+    """
+    Indica si un texto devuelto por ask_mac_gpt es una respuesta generada por el LLM
+    (y no un mensaje de error o de aviso), es decir, si vale la pena guardarlo en caché.
+    
+    Args:
+        answer: Texto devuelto por ask_mac_gpt o generar_respuesta_con_llm.
+        
+    Returns:
+        bool: True si es una respuesta del LLM.
+    """
+    return bool(answer) and not answer.startswith(_PREFIJOS_SIN_RESPUESTA)
+
+def _clave_respuesta(prompt: str, workspace: str = "default") -> str:
+    """
+    Calcula la clave de la caché de respuestas para una pregunta dentro de un workspace,
+    ignorando mayúsculas y espacios al inicio y al final.
+    
+    Args:
+        prompt: Pregunta del usuario.
+        workspace: Espacio de nombres de la caché.
+        
+    Returns:
+        str: Digest hexadecimal del workspace y la pregunta normalizada.
+    """
+    return _hash_function((workspace + "\x00" + prompt.strip().lower()).encode("utf-8")).hexdigest()
+
+def _buscar_respuesta_exacta(answer_key: str) -> Optional[str]:
+    """
+    Busca una respuesta vigente en la caché por hash de pregunta.
+    
+    Args:
+        answer_key: Clave devuelta por _clave_respuesta.
+        
+    Returns:
+        Optional[str]: Respuesta guardada, o None si no existe o expiró.
+    """
+    with _ANSWER_CACHE_LOCK:
+        entry = _ANSWER_CACHE.get(answer_key)
+        if entry is None: return None
+        if ANSWER_CACHE_TTL and entry[0] < time.time() - ANSWER_CACHE_TTL:
+            del _ANSWER_CACHE[answer_key]
+            return None
+        return entry[1]
+
+def _guardar_respuesta_exacta(answer_key: str, answer: str) -> None:
+    """
+    Guarda una respuesta en la caché por hash de pregunta, descartando la más antigua
+    cuando se alcanza ANSWER_CACHE_MAX_ENTRIES.
+    
+    Args:
+        answer_key: Clave devuelta por _clave_respuesta.
+        answer: Respuesta final entregada al usuario.
+    """
+    with _ANSWER_CACHE_LOCK:
+        if answer_key not in _ANSWER_CACHE and len(_ANSWER_CACHE) >= ANSWER_CACHE_MAX_ENTRIES:
+            _ANSWER_CACHE.pop(next(iter(_ANSWER_CACHE)))
+        _ANSWER_CACHE[answer_key] = (time.time(), answer)
+
+def es_pregunta_sin_contenido(prompt: str) -> bool:
+    """
+    Indica si un mensaje es demasiado corto o no tiene letras ni números ("?", "ok"),
+    en cuyo caso se responde sin consultar cachés ni llamar a la API.
+    
+    Args:
+        prompt: Mensaje del usuario.
+        
+    Returns:
+        bool: True si no hay una pregunta que procesar.
+    """
+    prompt_limpio = (prompt or "").strip()
+    return len(prompt_limpio) < MIN_PROMPT_LENGTH or bool(_PATRON_SIN_CONTENIDO.fullmatch(prompt_limpio))
+
+def buscar_respuesta_en_cache(
+    prompt: str,
+    workspace: str = "default",
+    directorio_pickles: str = DEFAULT_PICKLE_DIR
+) -> Optional[str]:
+    """
+    Busca en la caché exacta de ask_mac_gpt la respuesta a una pregunta, sin llamar a la API
+    (la caché se vacía antes si cambiaron los archivos de conocimiento).
+    
+    Args:
+        prompt: Pregunta del usuario.
+        workspace: Espacio de nombres de la caché.
+        directorio_pickles: Directorio donde se encuentran los archivos .pkl.
+        
+    Returns:
+        Optional[str]: Respuesta guardada, o None si no existe o expiró.
+    """
+    _invalidar_respuestas_si_cambio_conocimiento(directorio_pickles)
+    return _buscar_respuesta_exacta(_clave_respuesta(prompt, workspace))
+
+def guardar_respuesta_en_cache(prompt: str, answer: str, workspace: str = "default") -> None:
+    """
+    Guarda en la caché exacta de ask_mac_gpt una respuesta obtenida por otra vía
+    (por ejemplo, de la caché semántica del chat web).
+    
+    Args:
+        prompt: Pregunta del usuario.
+        answer: Respuesta entregada al usuario.
+        workspace: Espacio de nombres de la caché.
+    """
+    _guardar_respuesta_exacta(_clave_respuesta(prompt, workspace), answer)
+
+def _mtimes_conocimiento(directorio_pickles: str) -> Tuple[Optional[float], ...]:
+    """
+    mtimes de los archivos de conocimiento (None para los que no existen).
+    
+    Args:
+        directorio_pickles: Directorio donde se encuentran los archivos .pkl.
+        
+    Returns:
+        Tuple[Optional[float], ...]: mtime de cada archivo de THEME_FILES.
+    """
+    return tuple(
+        os.path.getmtime(path) if os.path.exists(path) else None
+        for path in (os.path.join(directorio_pickles, theme_file) for theme_file in THEME_FILES)
+    )
+
+def version_conocimiento(directorio_pickles: str = DEFAULT_PICKLE_DIR) -> str:
+    """
+    Identificador de la versión actual de los archivos de conocimiento, para que las cachés
+    de respuestas fuera de este módulo (las del chat web) separen sus entradas por versión
+    y no sirvan respuestas generadas con datos anteriores al último pipeline.
+    
+    Args:
+        directorio_pickles: Directorio donde se encuentran los archivos .pkl.
+        
+    Returns:
+        str: Digest hexadecimal de los mtimes de los archivos de conocimiento.
+    """
+    return _hash_function(repr(_mtimes_conocimiento(directorio_pickles)).encode("utf-8")).hexdigest()[:16]
+
+def _invalidar_respuestas_si_cambio_conocimiento(directorio_pickles: str) -> None:
+    """
+    Vacía las cachés de respuestas (exacta y semántica) si algún archivo de conocimiento
+    se modificó desde la última pregunta.
+    
+    Args:
+        directorio_pickles: Directorio donde se encuentran los archivos .pkl.
+    """
+    global _KNOWLEDGE_VERSION, _SEMANTIC_CACHE_EMB, _SEMANTIC_CACHE_ANS, _SEMANTIC_CACHE_WS, _SEMANTIC_CACHE_NEXT
+    version = _mtimes_conocimiento(directorio_pickles)
+    with _ANSWER_CACHE_LOCK:
+        if version == _KNOWLEDGE_VERSION: return
+        if _KNOWLEDGE_VERSION is not None:
+            print("  INFO: Knowledge files changed; clearing cached answers.")
+        _KNOWLEDGE_VERSION = version
+        _ANSWER_CACHE.clear()
+    with _SEMANTIC_CACHE_LOCK:
+        _SEMANTIC_CACHE_EMB, _SEMANTIC_CACHE_ANS, _SEMANTIC_CACHE_WS, _SEMANTIC_CACHE_NEXT = None, [], [], 0
+
+def ask_mac_gpt(
+    prompt: str,
+    directorio_pickles: str = DEFAULT_PICKLE_DIR,
+    use_cache: bool = True,
+    workspace: str = "default"
+) -> str:
     """
     Función principal para interactuar con MAC-GPT.
     
     Args:
         prompt: Pregunta del usuario.
         directorio_pickles: Directorio donde se encuentran los archivos .pkl.
+        use_cache: Si es False, no se consultan ni se actualizan las cachés de respuestas
+                   (se fuerza una respuesta nueva del LLM).
+        workspace: Espacio de nombres de las cachés de respuestas.
         
     Returns:
         str: Respuesta generada por el chatbot.
     """
     print("--- MAC Q&A - Full RAG Pipeline (Theme Description Based Classification) ---")
+    if es_pregunta_sin_contenido(prompt):
+        return "MAC-GPT: Parece que no hubo una pregunta para procesar."
+    _invalidar_respuestas_si_cambio_conocimiento(directorio_pickles)
+    answer_key = _clave_respuesta(prompt or "", workspace)
+    cached_answer = _buscar_respuesta_exacta(answer_key) if use_cache else None
+    if cached_answer is not None:
+        print("  -> Answer served from cache.")
+        return cached_answer
+
     api_key_env = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
     
     if not api_key_env or api_key_env == "YOUR_GOOGLE_API_KEY_HERE": # Check common placeholder
@@ -381,9 +1062,14 @@ def ask_mac_gpt(prompt: str, directorio_pickles: str = DEFAULT_PICKLE_DIR) -> st
     if themes_loaded and GOOGLE_API_KEY_CONFIGURED and REPRESENTATIVE_TOPIC_EMBEDDINGS:
         print("\n--- Starting Q&A Session ---")
         
-        selected_file, original_prompt = seleccionar_fuente_de_datos_mac(user_prompt=prompt)
+        selected_file, original_prompt, prompt_embedding = seleccionar_fuente_de_datos_mac(user_prompt=prompt)
+        semantic_answer = buscar_respuesta_semantica(prompt_embedding, workspace=workspace) if use_cache else None
+        if semantic_answer is not None:
+            _guardar_respuesta_exacta(answer_key, semantic_answer)
+            return semantic_answer
 
         final_answer = "No se pudo generar una respuesta."
+        answer_generated = False
         if original_prompt:
             if selected_file:
                 print(f"\n[Debug Info] Original Prompt: {original_prompt}")
@@ -394,8 +1080,10 @@ def ask_mac_gpt(prompt: str, directorio_pickles: str = DEFAULT_PICKLE_DIR) -> st
                     pregunta_usuario=original_prompt,
                     archivo_seleccionado=selected_file,
                     directorio_pickles=directorio_pickles,
-                    top_n_contextos=8
+                    top_n_contextos=8,
+                    precomputed_query_embedding=prompt_embedding
                 )
+                answer_generated = es_respuesta_del_llm(final_answer)
             else:
                 final_answer = "MAC-GPT: Lo siento, no pude identificar una categoría de conocimiento específica para tu pregunta. ¿Podrías reformularla?"
         else:
@@ -409,6 +1097,10 @@ def ask_mac_gpt(prompt: str, directorio_pickles: str = DEFAULT_PICKLE_DIR) -> st
         if "RESPUESTA DE MAC-GPT:" in final_answer:
             final_answer = final_answer.split("RESPUESTA DE MAC-GPT:")[-1].strip()
         
+        # Solo se guardan respuestas del LLM; los errores deben reintentarse en la siguiente pregunta
+        if answer_generated and use_cache:
+            _guardar_respuesta_exacta(answer_key, final_answer)
+            guardar_respuesta_semantica(prompt_embedding, final_answer, workspace)
         return final_answer
             
     else:
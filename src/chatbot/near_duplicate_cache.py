@@ -0,0 +1,134 @@
+"""
+Caché en memoria de preguntas casi duplicadas.
+
+Detecta preguntas que solo difieren de una ya respondida en mayúsculas, acentos, signos de
+puntuación o una errata ("¿Qué es MAC?" / "que es mac") sin pedir el embedding a la API.
+Dos preguntas coinciden si, ya normalizadas, tienen las mismas palabras en el mismo orden
+salvo a lo sumo una edición dentro de una palabra. No se usa SimHash: sobre trigramas de
+preguntas tan cortas, una sola errata cambia más bits que los que separan preguntas distintas
+("bases de datos" / "redes de datos").
+"""
+import re
+import threading
+import unicodedata
+from collections import deque
+from typing import Optional, Tuple
+
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_NON_WORD_RE = re.compile(r'[^\w\s]+')
+_DIGITS_RE = re.compile(r'\d')
+# Longitud mínima de la palabra en la que se acepta una errata: en palabras cortas una sola
+# edición suele cambiar el sentido ("de" / "la", "mac" / "mat")
+MIN_TYPO_TOKEN_LENGTH = 4
+
+
+def normalize_question(message: str) -> str:
+    """
+    Normaliza una pregunta: minúsculas, sin acentos ni signos de puntuación y con los espacios colapsados.
+
+    Args:
+        message (str): Pregunta original
+
+    Returns:
+        str: Pregunta normalizada
+    """
+    text = unicodedata.normalize('NFKD', message.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _WHITESPACE_RE.sub(' ', _NON_WORD_RE.sub(' ', text)).strip()
+
+
+def _one_edit_apart(a: str, b: str) -> bool:
+    """
+    Indica si dos palabras distintas están a una edición (inserción, borrado, sustitución
+    o transposición de dos letras contiguas) de distancia.
+    """
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    start = 0
+    while start < len(a) and a[start] == b[start]:
+        start += 1
+    if len(a) < len(b):
+        return a[start:] == b[start + 1:]
+    if a[start + 1:] == b[start + 1:]:
+        return True
+    return (start + 1 < len(a) and a[start] == b[start + 1] and a[start + 1] == b[start]
+            and a[start + 2:] == b[start + 2:])
+
+
+def same_question(tokens: Tuple[str, ...], other: Tuple[str, ...]) -> bool:
+    """
+    Indica si dos preguntas normalizadas tienen las mismas palabras en el mismo orden, salvo
+    a lo sumo una errata (una edición) en una palabra larga y sin números ("semestre 1" y
+    "semestre 2" no son la misma pregunta, ni "tesis" y "tesina").
+
+    Args:
+        tokens (Tuple[str, ...]): Palabras de una pregunta normalizada
+        other (Tuple[str, ...]): Palabras de la otra pregunta normalizada
+
+    Returns:
+        bool: True si se pueden tratar como la misma pregunta
+    """
+    if len(tokens) != len(other):
+        return False
+    different = [(a, b) for a, b in zip(tokens, other) if a != b]
+    if not different:
+        return True
+    if len(different) > 1:
+        return False
+    a, b = different[0]
+    if min(len(a), len(b)) < MIN_TYPO_TOKEN_LENGTH or _DIGITS_RE.search(a) or _DIGITS_RE.search(b):
+        return False
+    return _one_edit_apart(a, b)
+
+
+class NearDuplicateCache:
+    """
+    Respuestas de las últimas preguntas respondidas, comparadas palabra por palabra
+    (la más antigua se descarta al llenarse).
+    """
+
+    def __init__(self, size: int = 1024):
+        """
+        Args:
+            size (int): Número de preguntas recientes que se recuerdan
+        """
+        self._entries: "deque[tuple]" = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def lookup(self, message: str, workspace: str = "default") -> Optional[str]:
+        """
+        Busca la respuesta de una pregunta reciente casi idéntica.
+
+        Args:
+            message (str): Pregunta actual
+            workspace (str): Espacio de nombres de la caché
+
+        Returns:
+            Optional[str]: Respuesta guardada, o None si ninguna pregunta reciente coincide
+        """
+        text = normalize_question(message)
+        if not text:
+            return None
+        tokens = tuple(text.split(' '))
+        with self._lock:
+            for entry_workspace, entry_tokens, response in reversed(self._entries):
+                if entry_workspace == workspace and same_question(entry_tokens, tokens):
+                    return response
+        return None
+
+    def store(self, message: str, response: str, workspace: str = "default") -> None:
+        """
+        Guarda la respuesta de una pregunta.
+
+        Args:
+            message (str): Pregunta original
+            response (str): Respuesta entregada al usuario
+            workspace (str): Espacio de nombres de la caché
+        """
+        text = normalize_question(message)
+        if text:
+            with self._lock:
+                self._entries.append((workspace, tuple(text.split(' ')), response))
@@ -0,0 +1,213 @@
+"""
+Caché semántica persistente de respuestas del chatbot.
+
+Cada respuesta se guarda junto con el embedding de la pregunta que la originó; una
+pregunta nueva cuyo embedding sea suficientemente parecido (similitud coseno) a uno
+guardado reutiliza esa respuesta sin llamar al LLM.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+# Margen bajo el umbral dentro del cual la similitud aproximada (int8) se confirma con el vector exacto
+INT8_MARGIN = 0.02
+
+
+def _grow(array: np.ndarray, size: int, capacity: int) -> np.ndarray:
+    """
+    Copia las primeras 'size' filas de un arreglo a uno nuevo con 'capacity' filas.
+    """
+    grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:size] = array[:size]
+    return grown
+
+
+class _WorkspaceMatrix:
+    """
+    Copia en memoria de los embeddings de un workspace como una sola matriz int8 contigua
+    (una fila por respuesta) con una escala float32 por fila, que crece duplicando su capacidad.
+    Cada fila ocupa la cuarta parte que en float32.
+    """
+
+    def __init__(self):
+        self.matrix: Optional[np.ndarray] = None
+        self.scales = np.empty(0, dtype=np.float32)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.created = np.empty(0, dtype=np.float64)
+        self.responses: List[str] = []
+        self.size = 0
+        self.last_id = 0
+
+    def append(self, rows: List[tuple]) -> None:
+        """
+        Añade filas (id, embedding, respuesta, created_at) leídas de SQLite, cuantizando
+        cada embedding como v ≈ escala * v_int8 con escala = max|v| / 127.
+
+        Args:
+            rows (List[tuple]): Filas nuevas ordenadas por id
+        """
+        if not rows:
+            return
+        self.last_id = rows[-1][0]
+        if self.matrix is None:
+            dimension = len(rows[0][1]) // 4
+            self.matrix = np.empty((0, dimension), dtype=np.int8)
+        rows = [row for row in rows if len(row[1]) == 4 * self.matrix.shape[1]]
+        needed = self.size + len(rows)
+        if needed > self.matrix.shape[0]:
+            capacity = max(needed, 2 * self.matrix.shape[0], 64)
+            self.matrix = _grow(self.matrix, self.size, capacity)
+            self.scales = _grow(self.scales, self.size, capacity)
+            self.ids = _grow(self.ids, self.size, capacity)
+            self.created = _grow(self.created, self.size, capacity)
+        if rows:
+            block = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+            scales = np.abs(block).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self.matrix[self.size:needed] = np.round(block / scales[:, None]).astype(np.int8)
+            self.scales[self.size:needed] = scales
+            self.ids[self.size:needed] = [row[0] for row in rows]
+            self.created[self.size:needed] = [row[3] for row in rows]
+            self.responses.extend(row[2] for row in rows)
+            self.size = needed
+
+    def similarities(self, query: np.ndarray) -> np.ndarray:
+        """
+        Similitud aproximada de la consulta normalizada con cada fila, calculada con
+        productos enteros (acumulados en int32) y reescalada a coseno.
+
+        Args:
+            query (np.ndarray): Consulta normalizada (float32)
+
+        Returns:
+            np.ndarray: Similitud coseno aproximada por fila
+        """
+        query_scale = np.abs(query).max() / 127.0
+        query_int = np.round(query / query_scale).astype(np.int32)
+        products = np.einsum('ij,j->i', self.matrix[:self.size], query_int)
+        return products * (self.scales[:self.size] * query_scale)
+
+
+class ResponseCache:
+    """
+    Almacén en SQLite de pares (pregunta, embedding, respuesta) separados por workspace.
+
+    Los embeddings se guardan normalizados como bytes float32, de modo que la similitud
+    coseno con una consulta normalizada es un producto punto. Cada workspace se mantiene
+    además en memoria como una matriz cuantizada a int8; en cada búsqueda solo se leen de
+    SQLite las filas nuevas (incluidas las que guarden otros procesos).
+    """
+
+    def __init__(self, path: str, ttl_seconds: Optional[int] = None, threshold: float = 0.92):
+        """
+        Args:
+            path (str): Ruta al archivo SQLite de la caché
+            ttl_seconds (Optional[int]): Antigüedad máxima de una respuesta; None para no expirar
+            threshold (float): Similitud coseno mínima para reutilizar una respuesta
+        """
+        directory = os.path.dirname(str(path))
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = str(path)
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "id INTEGER PRIMARY KEY, workspace TEXT NOT NULL, query TEXT NOT NULL, "
+            "embedding BLOB NOT NULL, response TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_response_cache_workspace ON response_cache (workspace, created_at)"
+        )
+        self._conn.commit()
+        self._matrices: Dict[str, _WorkspaceMatrix] = {}
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> Optional[np.ndarray]:
+        """
+        Convierte un embedding a un vector float32 de norma 1.
+
+        Args:
+            embedding (Sequence[float]): Vector de la pregunta
+
+        Returns:
+            Optional[np.ndarray]: Vector normalizado, o None si está vacío o su norma es cero
+        """
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        if vector.size == 0 or norm == 0:
+            return None
+        return vector / norm
+
+    def lookup(self, embedding: Sequence[float], workspace: str = "default") -> Optional[str]:
+        """
+        Busca la respuesta de la pregunta guardada más parecida a la consulta.
+
+        Args:
+            embedding (Sequence[float]): Embedding de la pregunta actual
+            workspace (str): Espacio de nombres de la caché
+
+        Returns:
+            Optional[str]: Respuesta guardada si su similitud alcanza el umbral, o None
+        """
+        query = self._normalize(embedding)
+        if query is None:
+            return None
+        with self._lock:
+            cached = self._matrices.get(workspace)
+            if cached is None:
+                cached = self._matrices[workspace] = _WorkspaceMatrix()
+            rows = self._conn.execute(
+                "SELECT id, embedding, response, created_at FROM response_cache "
+                "WHERE workspace = ? AND id > ? ORDER BY id",
+                (workspace, cached.last_id)
+            ).fetchall()
+            cached.append(rows)
+            if cached.size == 0 or cached.matrix.shape[1] != query.shape[0]:
+                return None
+            similarities = cached.similarities(query)
+            if self.ttl_seconds:
+                similarities[cached.created[:cached.size] < time.time() - self.ttl_seconds] = -np.inf
+            best = int(similarities.argmax())
+            if similarities[best] < self.threshold - INT8_MARGIN:
+                return None
+            if similarities[best] < self.threshold + INT8_MARGIN:
+                # Cerca del umbral el error de cuantización importa: confirmar con el vector float32
+                row = self._conn.execute(
+                    "SELECT embedding FROM response_cache WHERE id = ?", (int(cached.ids[best]),)
+                ).fetchone()
+                if row is None or float(np.frombuffer(row[0], dtype=np.float32) @ query) < self.threshold:
+                    return None
+            return cached.responses[best]
+
+    def store(self, query: str, embedding: Sequence[float], response: str, workspace: str = "default") -> None:
+        """
+        Guarda una respuesta junto con el embedding de su pregunta.
+
+        Args:
+            query (str): Pregunta original
+            embedding (Sequence[float]): Embedding de la pregunta
+            response (str): Respuesta entregada al usuario
+            workspace (str): Espacio de nombres de la caché
+        """
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO response_cache (workspace, query, embedding, response, created_at) VALUES (?, ?, ?, ?, ?)",
+                (workspace, query, vector.tobytes(), response, time.time())
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Cierra la conexión a la base de datos de la caché."""
+        with self._lock:
+            self._conn.close()
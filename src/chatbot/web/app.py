@@ -2,13 +2,31 @@
 Aplicación web para el chatbot MAC-GPT.
 """
 import os
+import logging
+import multiprocessing
 import threading
+import time
 from flask import Flask, render_template, request, jsonify
-from src.chatbot import ask_mac_gpt, configure_google_api
-from pipeline.extract import extract_data
-from pipeline.transform import transform_data
+from config import settings
+from src.chatbot import (
+    NearDuplicateCache, ResponseCache, ask_mac_gpt, buscar_respuesta_en_cache, configure_google_api,
+    es_pregunta_sin_contenido, es_respuesta_del_llm, get_embedding_google, guardar_respuesta_en_cache, version_conocimiento
+)
+from pipeline.runner import run_pipeline
 from dotenv import load_dotenv
 
+# fcntl solo existe en POSIX; sin él el pipeline se serializa únicamente dentro de este proceso
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# waitress es opcional; sin él se usa el servidor de desarrollo de Flask
+try:
+    from waitress import serve
+except ImportError:
+    serve = None
+
 # Cargar variables de entorno
 load_dotenv()
 
@@ -22,6 +40,41 @@ api_configured = False
 if api_key:
     api_configured = configure_google_api(api_key)
 
+# Caché semántica de respuestas: preguntas parecidas a una ya respondida no llaman al LLM.
+# Esta caché y la de casi duplicados se consultan con el workspace y la versión de los archivos
+# de conocimiento (ver chat()), así que tras ejecutar el pipeline no sirven respuestas anteriores
+response_cache = ResponseCache(
+    settings.RESPONSE_CACHE_PATH,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL,
+    threshold=settings.RESPONSE_CACHE_THRESHOLD
+)
+
+# Caché de casi duplicados: preguntas que solo difieren en acentos, signos o una errata
+# ("¿qué es MAC?" / "que es mac") se detectan sin pedir el embedding
+near_cache = NearDuplicateCache(settings.NEAR_DUPLICATE_CACHE_SIZE)
+
+# Resultado de la última comprobación de datos procesados, reutilizado durante settings.DATA_STATUS_TTL
+_data_exists_cache = {'ts': float('-inf'), 'val': False}
+_data_exists_lock = threading.Lock()
+
+def data_exists() -> bool:
+    """
+    Indica si hay archivos de conocimiento (.pkl) en la carpeta de pickles. El resultado se
+    reutiliza durante unos segundos para que los health checks no recorran el disco en cada llamada.
+    """
+    now = time.monotonic()
+    with _data_exists_lock:
+        if now - _data_exists_cache['ts'] <= settings.DATA_STATUS_TTL:
+            return _data_exists_cache['val']
+    try:
+        with os.scandir(settings.PICKLES_DIR) as entries:
+            exists = any(entry.name.endswith('.pkl') for entry in entries)
+    except OSError:
+        exists = False
+    with _data_exists_lock:
+        _data_exists_cache.update(ts=now, val=exists)
+    return exists
+
 @app.route('/')
 def index():
     """
@@ -33,6 +86,8 @@ def index():
 def chat():
     """
     Endpoint para procesar mensajes del chat.
+    Acepta 'no_cache' para forzar una respuesta nueva del LLM y 'workspace'
+    para separar las respuestas en caché.
     """
     if not api_configured:
         return jsonify({
@@ -49,12 +104,57 @@ def chat():
             'message': 'No se proporcionó ninguna pregunta.'
         }), 400
 
+    # Mensajes sin contenido ("?", "ok") se responden sin consultar cachés ni pedir el embedding
+    if es_pregunta_sin_contenido(message):
+        return jsonify({
+            'success': True,
+            'message': ask_mac_gpt(message),
+            'cached': False
+        })
+
+    use_cache = not data.get('no_cache', False)
+    workspace = str(data.get('workspace') or 'default')
+    # Espacio de nombres de las cachés del chat web: las respuestas guardadas con otros datos no se reutilizan
+    cache_namespace = f"{workspace}@{version_conocimiento()}"
+
     try:
+        # Primero la caché exacta de ask_mac_gpt y la de casi duplicados (sin llamadas a la API),
+        # luego la semántica y por último el LLM
+        if use_cache:
+            cached_response = buscar_respuesta_en_cache(message, workspace)
+            if cached_response is None:
+                cached_response = near_cache.lookup(message, cache_namespace)
+            if cached_response is not None:
+                return jsonify({
+                    'success': True,
+                    'message': cached_response,
+                    'cached': True
+                })
+
+        # Buscar una pregunta parecida ya respondida (el embedding queda en la caché de embeddings,
+        # así que ask_mac_gpt no vuelve a pedirlo a la API)
+        query_embedding = get_embedding_google(message, task_type="RETRIEVAL_QUERY") if use_cache else None
+        if query_embedding is not None:
+            cached_response = response_cache.lookup(query_embedding, cache_namespace)
+            if cached_response is not None:
+                guardar_respuesta_en_cache(message, cached_response, workspace)
+                near_cache.store(message, cached_response, cache_namespace)
+                return jsonify({
+                    'success': True,
+                    'message': cached_response,
+                    'cached': True
+                })
+
         # Obtener respuesta del chatbot
-        response = ask_mac_gpt(message)
+        response = ask_mac_gpt(message, use_cache=use_cache, workspace=workspace)
+        if use_cache and es_respuesta_del_llm(response):
+            near_cache.store(message, response, cache_namespace)
+            if query_embedding is not None:
+                response_cache.store(message, query_embedding, response, cache_namespace)
         return jsonify({
             'success': True,
-            'message': response
+            'message': response,
+            'cached': False
         })
     except Exception as e:
         return jsonify({
@@ -67,17 +167,115 @@ def status():
     """
     Endpoint para verificar el estado de la API.
     """
-    import glob
-    data_exists = len(glob.glob('data/pickles/*.pkl')) > 0
+    exists = data_exists()
     
     return jsonify({
         'api_configured': api_configured,
-        'data_exists': data_exists,
-        'status': 'ready' if (api_configured and data_exists) else 'not_configured'
+        'data_exists': exists,
+        'status': 'ready' if (api_configured and exists) else 'not_configured'
     })
 
-# Variable global para tracking del pipeline
-pipeline_running = False
+# Se mantiene tomado mientras el pipeline se ejecuta; adquirirlo sin bloquear hace atómica la
+# comprobación y el arranque aunque el servidor atienda varias peticiones en paralelo. Entre procesos
+# (varios workers del servidor) se usa además un flock sobre settings.PIPELINE_LOCK_PATH.
+pipeline_lock = threading.Lock()
+_pipeline_lock_file = None
+
+def _acquire_pipeline_lock() -> bool:
+    """
+    Intenta tomar el candado del pipeline sin bloquear.
+    
+    Returns:
+        bool: True si se tomó el candado, False si el pipeline ya se está ejecutando
+    """
+    global _pipeline_lock_file
+    if not pipeline_lock.acquire(blocking=False):
+        return False
+    if fcntl is None:
+        return True
+    os.makedirs(os.path.dirname(settings.PIPELINE_LOCK_PATH), exist_ok=True)
+    lock_file = open(settings.PIPELINE_LOCK_PATH, 'a+')
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        pipeline_lock.release()
+        return False
+    _pipeline_lock_file = lock_file
+    return True
+
+def _release_pipeline_lock() -> None:
+    """
+    Libera el candado del pipeline tomado con _acquire_pipeline_lock.
+    """
+    global _pipeline_lock_file
+    if _pipeline_lock_file is not None:
+        _pipeline_lock_file.seek(0)
+        _pipeline_lock_file.truncate()
+        fcntl.flock(_pipeline_lock_file.fileno(), fcntl.LOCK_UN)
+        _pipeline_lock_file.close()
+        _pipeline_lock_file = None
+    pipeline_lock.release()
+
+def pipeline_is_running() -> bool:
+    """
+    Indica si el pipeline se está ejecutando en este o en otro worker del servidor.
+    """
+    if pipeline_lock.locked():
+        return True
+    if fcntl is None or not os.path.exists(settings.PIPELINE_LOCK_PATH):
+        return False
+    with open(settings.PIPELINE_LOCK_PATH, 'a+') as lock_file:
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except OSError:
+            return True
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    return False
+
+def _wait_for_pipeline(process: multiprocessing.Process) -> None:
+    """
+    Espera a que termine el proceso del pipeline y libera el candado.
+    """
+    try:
+        process.join()
+        if process.exitcode:
+            print(f"❌ El proceso del pipeline terminó con código {process.exitcode}")
+    finally:
+        _release_pipeline_lock()
+        # Volver a comprobar en disco si hay datos en la siguiente llamada a /api/status
+        with _data_exists_lock:
+            _data_exists_cache['ts'] = float('-inf')
+
+def start_pipeline() -> bool:
+    """
+    Ejecuta el pipeline ETL en un proceso separado si no se está ejecutando ya en este
+    o en otro worker, y espera su fin desde un hilo para no bloquear al llamador.
+    
+    Returns:
+        bool: True si se inició el pipeline, False si ya se estaba ejecutando
+    """
+    if not _acquire_pipeline_lock():
+        return False
+    
+    # Proceso no daemon: la extracción usa su propio pool de procesos. Se usa 'spawn' y no 'fork'
+    # (el predeterminado en Linux): este proceso tiene varios hilos, conexiones SQLite y candados,
+    # y un hijo creado con fork podría heredar un candado tomado y bloquearse
+    try:
+        process = multiprocessing.get_context("spawn").Process(target=run_pipeline, name="mac-gpt-pipeline")
+        process.start()
+    except Exception:
+        _release_pipeline_lock()
+        raise
+    if _pipeline_lock_file is not None:
+        _pipeline_lock_file.seek(0)
+        _pipeline_lock_file.truncate()
+        _pipeline_lock_file.write(str(process.pid))
+        _pipeline_lock_file.flush()
+    waiter = threading.Thread(target=_wait_for_pipeline, args=(process,))
+    waiter.daemon = True
+    waiter.start()
+    return True
 
 @app.route('/api/admin/update-data', methods=['POST'])
 def update_data():
@@ -85,9 +283,7 @@ def update_data():
     Endpoint para ejecutar el pipeline ETL manualmente.
     Solo para administradores - requiere clave especial.
     """
-    global pipeline_running
-    
-    if pipeline_running:
+    if pipeline_is_running():
         return jsonify({
             'success': False,
             'message': 'El pipeline ya está ejecutándose. Por favor espera.'
@@ -103,38 +299,11 @@ def update_data():
             'message': 'Clave de administrador incorrecta.'
         }), 403
     
-    def run_pipeline():
-        global pipeline_running
-        try:
-            pipeline_running = True
-            print("🚀 Iniciando pipeline ETL...")
-            
-            # Ejecutar extracción
-            extract_results = extract_data(
-                download_pdfs=True,
-                extract_pdf_content=True,
-                output_filename="plan_estudios_mac"
-            )
-            
-            # Ejecutar transformación si hay datos
-            if extract_results.get("saved_files") and extract_results["saved_files"].get("pickle"):
-                transform_data(
-                    input_file=extract_results["saved_files"]["pickle"],
-                    add_embeddings=True,
-                    output_filename="plan_estudios_mac_processed"
-                )
-            
-            print("✅ Pipeline ETL completado exitosamente")
-            
-        except Exception as e:
-            print(f"❌ Error en pipeline ETL: {e}")
-        finally:
-            pipeline_running = False
-    
-    # Ejecutar en hilo separado para no bloquear la respuesta
-    thread = threading.Thread(target=run_pipeline)
-    thread.daemon = True
-    thread.start()
+    if not start_pipeline():
+        return jsonify({
+            'success': False,
+            'message': 'El pipeline ya está ejecutándose. Por favor espera.'
+        }), 409
     
     return jsonify({
         'success': True,
@@ -147,51 +316,46 @@ def pipeline_status():
     Verificar si el pipeline está ejecutándose.
     """
     return jsonify({
-        'running': pipeline_running
+        'running': pipeline_is_running()
     })
 
 # Auto-inicialización de datos (opcional)
 def auto_initialize_data():
     """
     Ejecuta el pipeline automáticamente si no hay datos.
-    Solo en producción.
+    Solo en producción. Usa el mismo proceso y candado que /api/admin/update-data,
+    así que no se ejecuta si otro worker ya inició el pipeline.
     """
-    import glob
-    
     # Solo en producción y si no hay datos
     if os.getenv('FLASK_ENV') == 'production':
-        data_exists = len(glob.glob('data/pickles/*.pkl')) > 0
-        
-        if not data_exists:
+        if not data_exists():
             print("🔄 Auto-inicializando datos...")
-            def run_initial_pipeline():
-                try:
-                    extract_results = extract_data(
-                        download_pdfs=True,
-                        extract_pdf_content=True,
-                        output_filename="plan_estudios_mac"
-                    )
-                    
-                    if extract_results.get("saved_files") and extract_results["saved_files"].get("pickle"):
-                        transform_data(
-                            input_file=extract_results["saved_files"]["pickle"],
-                            add_embeddings=True,
-                            output_filename="plan_estudios_mac_processed"
-                        )
-                    
-                    print("✅ Auto-inicialización completada")
-                except Exception as e:
-                    print(f"❌ Error en auto-inicialización: {e}")
-            
-            # Ejecutar en hilo separado
-            thread = threading.Thread(target=run_initial_pipeline)
-            thread.daemon = True
-            thread.start()
+            if not start_pipeline():
+                print("ℹ️ El pipeline ya se está ejecutando; se omite la auto-inicialización")
+
+def run_server(port: int = 5000, debug: bool = False) -> None:
+    """
+    Inicia el servidor web. Fuera del modo de depuración usa waitress (si está instalado)
+    con settings.WEB_THREADS hilos, de modo que varias preguntas esperan al LLM en paralelo.
+    
+    Args:
+        port (int): Puerto en el que escucha el servidor
+        debug (bool): Modo de depuración (servidor de desarrollo de Flask con recarga)
+    """
+    if debug or serve is None:
+        if not debug:
+            print("waitress no está instalado; se usa el servidor de desarrollo de Flask. Instálalo con: pip install waitress")
+        app.run(host='0.0.0.0', port=port, debug=debug, threaded=True)
+        return
+    serve(app, host='0.0.0.0', port=port, threads=settings.WEB_THREADS)
 
 if __name__ == '__main__':
+    # Mostrar el progreso del ETL ejecutado en segundo plano
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
     # Auto-inicializar datos si es necesario
     auto_initialize_data()
     
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('FLASK_ENV') == 'development'
-    app.run(host='0.0.0.0', port=port, debug=debug) 
\ No newline at end of file
+    run_server(port=port, debug=debug) 
\ No newline at end of file
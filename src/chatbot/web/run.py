@@ -1,12 +1,14 @@
 """
 Script para ejecutar la aplicación web del chatbot MAC-GPT.
 """
+import logging
 import os
 import sys
+from pathlib import Path
 
-# Asegurarnos de que podemos importar desde la raíz del proyecto
-root_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-sys.path.append(root_path)
+# Asegurarnos de que podemos importar desde la raíz del proyecto al ejecutarlo como script
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parents[3]))
 
 from dotenv import load_dotenv
 from src.chatbot.web.app import app
@@ -15,6 +17,9 @@ from src.chatbot.web.app import app
 load_dotenv()
 
 if __name__ == '__main__':
+    # Mostrar el progreso del ETL cuando se ejecuta desde la interfaz de administración
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('FLASK_ENV') == 'development'
     
@@ -0,0 +1,132 @@
+"""
+Módulo para descargar archivos de forma concurrente con asyncio y aiohttp
+"""
+import asyncio
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# aiohttp es opcional; sin él web_scraper descarga los archivos de forma secuencial
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from config import settings
+
+AIOHTTP_AVAILABLE = aiohttp is not None
+
+
+def preallocate_file(f, size: Optional[int]) -> None:
+    """
+    Reserva en disco el tamaño anunciado por Content-Length antes de escribir el archivo,
+    de modo que el sistema de archivos asigna bloques contiguos de una vez en lugar de
+    extender el archivo en cada escritura. Solo tiene efecto donde existe posix_fallocate
+    (Linux); el archivo debe truncarse al tamaño real al terminar.
+
+    Args:
+        f: Archivo abierto en modo binario de escritura
+        size (Optional[int]): Tamaño esperado en bytes, o None si no se conoce
+    """
+    if not size or not hasattr(os, "posix_fallocate"):
+        return
+    try:
+        os.posix_fallocate(f.fileno(), 0, size)
+    except OSError:
+        # Sistemas de archivos sin soporte (p. ej. algunos montajes de red)
+        pass
+
+
+async def _download_one(
+    session: "aiohttp.ClientSession",
+    semaphore: asyncio.Semaphore,
+    url: str,
+    destino: str,
+    chunk_size: int = 1 << 16
+) -> Optional[Dict[str, str]]:
+    """
+    Descarga un archivo escribiéndolo a disco por bloques.
+
+    Args:
+        session (aiohttp.ClientSession): Sesión compartida (conexiones reutilizadas)
+        semaphore (asyncio.Semaphore): Limita el número de descargas simultáneas
+        url (str): URL del archivo
+        destino (str): Ruta donde guardar el archivo
+        chunk_size (int): Tamaño de cada bloque escrito a disco
+
+    Returns:
+        Optional[Dict[str, str]]: Información del archivo descargado, o None si falló
+    """
+    nombre_archivo = os.path.basename(destino)
+    # Se descarga a un archivo temporal que solo se renombra a 'destino' si la descarga termina,
+    # para no dejar un PDF incompleto (o con la cola en ceros por la preasignación)
+    temporal = destino + ".part"
+    async with semaphore:
+        try:
+            async with session.get(url) as response:
+                response.raise_for_status()
+                with open(temporal, "wb") as f:
+                    preallocate_file(f, response.content_length)
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        f.write(chunk)
+                    f.truncate()
+            os.replace(temporal, destino)
+            print(f"    ✅ Guardado: {destino}")
+            return {
+                "filename": nombre_archivo,
+                "path": destino,
+                "url": url
+            }
+        except Exception as e:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            print(f"    ❌ Error al descargar {nombre_archivo}: {e}")
+            return None
+
+
+async def download_many(
+    jobs: Iterable[Tuple[str, str]],
+    concurrency: Optional[int] = None
+) -> List[Optional[Dict[str, str]]]:
+    """
+    Descarga concurrentemente una lista de pares (url, destino) usando una sola
+    sesión HTTP, de modo que las conexiones TCP/TLS se reutilizan entre archivos.
+
+    Args:
+        jobs (Iterable[Tuple[str, str]]): Pares (url, ruta de destino)
+        concurrency (Optional[int]): Descargas simultáneas, si es None se usa settings.DOWNLOAD_CONCURRENCY
+
+    Returns:
+        List[Optional[Dict[str, str]]]: Resultado de cada descarga en el orden de 'jobs' (None si falló)
+    """
+    if aiohttp is None:
+        raise ImportError("aiohttp no está instalado. Instálalo con: pip install aiohttp")
+    if concurrency is None:
+        concurrency = settings.DOWNLOAD_CONCURRENCY
+
+    semaphore = asyncio.Semaphore(concurrency)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=settings.BROWSER_TIMEOUT, sock_read=60)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        return await asyncio.gather(
+            *(_download_one(session, semaphore, url, destino) for url, destino in jobs)
+        )
+
+
+async def download_all(
+    urls: Iterable[str],
+    save_dir: str,
+    concurrency: Optional[int] = None
+) -> List[Optional[Dict[str, str]]]:
+    """
+    Descarga concurrentemente una lista de URLs en un directorio.
+
+    Args:
+        urls (Iterable[str]): URLs de los archivos a descargar
+        save_dir (str): Directorio donde guardar los archivos
+        concurrency (Optional[int]): Descargas simultáneas, si es None se usa settings.DOWNLOAD_CONCURRENCY
+
+    Returns:
+        List[Optional[Dict[str, str]]]: Resultado de cada descarga en el orden de 'urls' (None si falló)
+    """
+    os.makedirs(save_dir, exist_ok=True)
+    jobs = [(url, os.path.join(save_dir, url.split("/")[-1])) for url in urls]
+    return await download_many(jobs, concurrency=concurrency)
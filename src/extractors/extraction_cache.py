@@ -0,0 +1,95 @@
+"""
+Caché persistente de extracciones de temarios direccionada por contenido.
+
+Cada respuesta del modelo se almacena bajo el hash del texto del PDF, del modelo y de
+la versión del prompt que la generaron, de modo que al volver a ejecutar el ETL solo
+se envían a la API los PDFs que cambiaron.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Sequence
+
+
+class ExtractionCache:
+    """
+    Almacén clave-valor en SQLite para los objetos JSON devueltos por el modelo.
+
+    La clave es el SHA-256 de (namespace, texto), donde el namespace identifica el modelo
+    y la versión del prompt.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Ruta al archivo SQLite de la caché
+        """
+        directory = os.path.dirname(str(path))
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extractions (key BLOB PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(text: str, namespace: str) -> bytes:
+        """
+        Calcula la clave de caché para el texto de un PDF dentro de un namespace.
+
+        Args:
+            text (str): Texto del PDF (ya sanitizado) enviado al modelo
+            namespace (str): Identificador del modelo y de la versión del prompt
+
+        Returns:
+            bytes: Digest que identifica al par (namespace, texto)
+        """
+        return hashlib.sha256((namespace + "\x00" + text).encode("utf-8")).digest()
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, Dict[str, Any]]:
+        """
+        Recupera las extracciones almacenadas para las claves dadas.
+
+        Args:
+            keys (Sequence[bytes]): Claves a buscar
+
+        Returns:
+            Dict[bytes, Dict[str, Any]]: Extracciones encontradas (las claves ausentes se omiten)
+        """
+        found: Dict[bytes, Dict[str, Any]] = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            # SQLite limita el número de parámetros por consulta
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM extractions WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, value in rows:
+                    found[key] = json.loads(value)
+        return found
+
+    def put_many(self, items: Dict[bytes, Dict[str, Any]]) -> None:
+        """
+        Guarda (o reemplaza) extracciones en la caché.
+
+        Args:
+            items (Dict[bytes, Dict[str, Any]]): Objeto JSON devuelto por el modelo, por clave
+        """
+        rows = [(key, json.dumps(value, ensure_ascii=False)) for key, value in items.items()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO extractions (key, value) VALUES (?, ?)", rows
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Cierra la conexión a la base de datos de la caché."""
+        with self._lock:
+            self._conn.close()
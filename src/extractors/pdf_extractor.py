@@ -1,19 +1,172 @@
 """
 Módulo para extraer texto y datos estructurados de archivos PDF
 """
+import collections
+import functools
+import itertools
+import mmap
 import os
+import random
 import re
 import json
-from typing import Dict, Any, List, Optional, Union
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
 import PyPDF2
 import google.generativeai as genai
 
+# google.api_core se instala con google-generativeai; si no está, solo los timeouts se tratan como transitorios
+try:
+    from google.api_core import exceptions as google_exceptions
+    _TRANSIENT_ERRORS = (
+        google_exceptions.ResourceExhausted, google_exceptions.ServiceUnavailable,
+        google_exceptions.DeadlineExceeded, google_exceptions.InternalServerError, TimeoutError
+    )
+except ImportError:
+    _TRANSIENT_ERRORS = (TimeoutError,)
+
+# PyMuPDF es opcional; sin él los PDFs se leen con PyPDF2
+try:
+    import fitz
+except ImportError:
+    fitz = None
+
+# hyperscan es opcional (pip install hyperscan); sin él los campos se pre-extraen con re, un patrón a la vez
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
 from config import settings
+from src.extractors.extraction_cache import ExtractionCache
+
+# Versión de los prompts de extracción; incrementarla invalida las extracciones en caché
+EXTRACTION_PROMPT_VERSION = 2
+
+_WS_RE = re.compile(r'\s+')
+# Bloques ```json ... ``` en la respuesta del modelo, según el JSON buscado (objeto o arreglo)
+_JSON_FENCE_RES = {
+    "{": re.compile(r"```json\s*(\{.*?\})\s*```", re.DOTALL),
+    "[": re.compile(r"```json\s*(\[.*?\])\s*```", re.DOTALL),
+}
+_PRINTABLE_SET = frozenset('\t\n\r')
+
+# Campos numéricos con un rótulo fijo en los temarios (ej. "Créditos: 8"), aplicados sobre el texto sanitizado.
+# Las vocales acentuadas se listan en ambos casos porque Hyperscan solo ignora mayúsculas en ASCII
+_PREFILL_PATTERNS = {
+    "horas_al_semestre": re.compile(r"\bhoras\s+al\s+semestre\s*:?\s*(\d{1,3})\b", re.IGNORECASE),
+    "horas_semana": re.compile(r"\bhoras\s+(?:a\s+la\s+|por\s+)?semana\s*:?\s*(\d{1,2})\b", re.IGNORECASE),
+    "horas_teoricas": re.compile(r"\bhoras\s+te[óÓo]ricas\s*:?\s*(\d{1,2})\b", re.IGNORECASE),
+    "horas_practicas": re.compile(r"\bhoras\s+pr[áÁa]cticas\s*:?\s*(\d{1,2})\b", re.IGNORECASE),
+    "creditos": re.compile(r"\bcr[éÉe]ditos\s*:?\s*(\d{1,2})\b", re.IGNORECASE),
+}
+
+
+def _compile_prefill_database():
+    """
+    Compila todos los patrones de _PREFILL_PATTERNS en una sola base de datos de Hyperscan,
+    de modo que el texto de cada PDF se recorre una sola vez para todos los campos.
+    
+    Returns:
+        Optional[hyperscan.Database]: La base de datos (el id de cada patrón es su posición en
+                                      _PREFILL_PATTERNS), o None si Hyperscan no está disponible
+    """
+    if hyperscan is None:
+        return None
+    flags = hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_SOM_LEFTMOST
+    try:
+        database = hyperscan.Database()
+        database.compile(
+            expressions=[pattern.pattern.encode("utf-8") for pattern in _PREFILL_PATTERNS.values()],
+            ids=list(range(len(_PREFILL_PATTERNS))),
+            elements=len(_PREFILL_PATTERNS),
+            flags=[flags] * len(_PREFILL_PATTERNS)
+        )
+    except Exception as e:
+        print(f"No se pudieron compilar los patrones con Hyperscan, se usará re: {e}")
+        return None
+    return database
+
+
+_PREFILL_DATABASE = _compile_prefill_database()
+# Línea de un campo en la lista de campos a extraer del prompt
+_CAMPO_PROMPT_RE = re.compile(r'^\s*- `"(\w+)"`')
+
+
+class _NonPrintableTable(dict):
+    """
+    Tabla para str.translate que elimina los caracteres no imprimibles (excepto tab,
+    newline y carriage return). Se llena bajo demanda con los caracteres que aparecen,
+    en lugar de precalcular todos los code points de Unicode.
+    """
+
+    def __missing__(self, codepoint: int) -> Optional[int]:
+        char = chr(codepoint)
+        value = codepoint if char.isprintable() or char in _PRINTABLE_SET else None
+        self[codepoint] = value
+        return value
+
+
+_NON_PRINTABLE_TABLE = _NonPrintableTable()
+# Precalcular Latin-1 (controles C0/C1, NUL y letras acentuadas del español), que cubre casi todo el
+# texto de los temarios, para que str.translate no tenga que pasar por __missing__
+for _codepoint in range(0x100):
+    _NON_PRINTABLE_TABLE[_codepoint]
+del _codepoint
 
 
 def read_pdf_content(pdf_path: str) -> str:
     """
-    Lee el contenido de texto de un archivo PDF.
+    Lee el contenido de texto de un archivo PDF con el backend configurado en
+    settings.PDF_BACKEND ("pymupdf" o "pypdf2"). Si PyMuPDF no está instalado se usa PyPDF2.
+    
+    Args:
+        pdf_path (str): Ruta al archivo PDF
+        
+    Returns:
+        str: Contenido del PDF como texto, o cadena vacía si hay error
+    """
+    if settings.PDF_BACKEND == "pymupdf" and fitz is not None:
+        return _read_pdf_content_pymupdf(pdf_path)
+    return _read_pdf_content_pypdf2(pdf_path)
+
+
+def _read_pdf_content_pymupdf(pdf_path: str) -> str:
+    """
+    Lee el contenido de texto de un archivo PDF con PyMuPDF (MuPDF, en código nativo).
+    
+    Args:
+        pdf_path (str): Ruta al archivo PDF
+        
+    Returns:
+        str: Contenido del PDF como texto, o cadena vacía si hay error
+    """
+    try:
+        parts = []
+        with fitz.open(pdf_path) as doc:
+            if doc.needs_pass and not doc.authenticate(""):
+                print(f"No se pudo desencriptar {pdf_path}. Intentando leer de todas formas.")
+
+            for page_num, page in enumerate(doc):
+                try:
+                    page_text = page.get_text("text")
+                    if page_text:
+                        parts.append(page_text + "\n") # Añadir un salto entre páginas
+                except Exception as e:
+                    print(f"Error al extraer texto de la página {page_num} de {pdf_path}: {e}")
+                    continue # Continuar con la siguiente página
+        # Unir al final evita copiar todo el texto acumulado en cada página
+        return "".join(parts)
+    except Exception as e:
+        print(f"Error general al leer el archivo PDF {pdf_path}: {e}")
+        return ""
+
+
+def _read_pdf_content_pypdf2(pdf_path: str) -> str:
+    """
+    Lee el contenido de texto de un archivo PDF con PyPDF2. El archivo se mapea en memoria,
+    de modo que el parser lee directamente de la caché de páginas del sistema operativo en
+    lugar de copiar el PDF a memoria del proceso.
     
     Args:
         pdf_path (str): Ruta al archivo PDF
@@ -22,9 +175,9 @@ def read_pdf_content(pdf_path: str) -> str:
         str: Contenido del PDF como texto, o cadena vacía si hay error
     """
     try:
-        content = ""
-        with open(pdf_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
+        parts = []
+        with open(pdf_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            reader = PyPDF2.PdfReader(mapped)
             if reader.is_encrypted:
                 try:
                     reader.decrypt('')
@@ -35,11 +188,12 @@ def read_pdf_content(pdf_path: str) -> str:
                 try:
                     page_text = reader.pages[page_num].extract_text()
                     if page_text:
-                        content += page_text + "\n" # Añadir un salto entre páginas
+                        parts.append(page_text + "\n") # Añadir un salto entre páginas
                 except Exception as e:
                     print(f"Error al extraer texto de la página {page_num} de {pdf_path}: {e}")
                     continue # Continuar con la siguiente página
-        return content
+        # Unir al final evita copiar todo el texto acumulado en cada página
+        return "".join(parts)
     except Exception as e:
         print(f"Error general al leer el archivo PDF {pdf_path}: {e}")
         return ""
@@ -60,15 +214,99 @@ def sanitize_text_for_prompt(text: str) -> str:
         return ""
         
     # Reemplazar múltiples espacios/saltos de línea con uno solo
-    text = re.sub(r'\s+', ' ', text)
+    text = _WS_RE.sub(' ', text)
+    
+    # Eliminar caracteres de control (incluidos los NUL) excepto tab, newline, carriage return
+    return text.translate(_NON_PRINTABLE_TABLE)
+
+
+# Reglas y campos comunes a los prompts de extracción (individual y por lotes)
+_REGLAS_EXTRACCION = """    Reglas:
+    - Ignora diferencias entre **mayúsculas y minúsculas**, así como entre palabras con o sin **acentos ortográficos**. Por ejemplo, trata "CLAVE", "clave", "Clavé" y "clavé" como equivalentes.
+    - **No infieras ni crees campos adicionales** fuera de los enumerados.
+    - **Sanitiza el texto extraído**: Antes de incluir texto en los valores del JSON, escapa adecuadamente caracteres especiales (saltos de línea, tabulaciones, comillas) o reemplaza caracteres de control no imprimibles para asegurar que el JSON resultante sea válido. Si un campo contiene listas (ej. indice_tematico, referencias), asegúrate que sean listas JSON válidas de strings.
+    - Devuelve la información como un objeto JSON **válido** con exactamente las siguientes claves:
+
+"""
+
+_CAMPOS_A_EXTRAER = """    Campos a extraer:
+    - `"nombre_materia"`: Nombre de la materia, generalmente al inicio del documento.
+    - `"clave"`: ({clave_valor})
+    - `"semestre_num"`: Número del semestre (ej. 8, 1). Debe ser un número o `null`.
+    - `"semestre_txt"`: Nombre textual del semestre (ej. OCTAVO).
+    - `"modalidad"`: Modalidad de la materia (ej. Curso, Seminario).
+    - `"caracter"`: Carácter (ej. Obligatoria, Optativa).
+    - `"tipo"`: Tipo (ej. Teórica, Teórico-Práctica).
+    - `"horas_al_semestre"`: Número total de horas al semestre. Debe ser un número o `null`.
+    - `"horas_semana"`: Número de horas a la semana. Debe ser un número o `null`.
+    - `"horas_teoricas"`: Número de horas teóricas. Debe ser un número o `null`.
+    - `"horas_practicas"`: Número de horas prácticas. Debe ser un número o `null`.
+    - `"creditos"`: Número de créditos. Debe ser un número o `null`.
+    - `"etapa_formacion"`
+    - `"campo_conocimiento"`
+    - `"antecedente"`: Materias antecedentes, o "Ninguna" si así se especifica o no se encuentra.
+    - `"subsecuente"`: Materias subsecuentes, o "Ninguna" si así se especifica o no se encuentra.
+    - `"objetivo_general"`
+    - `"indice_tematico"`: Lista de strings tipo `["1- Tema Alfa", "2- Tema Beta"]` extraída de la sección "Índice Temático" o similar. Si no se encuentra, `null`.
+    - `"contenido"`: Contenido completo de la sección "CONTENIDO" o "Temario detallado". Puede ser un string largo. Si no se encuentra, `null`.
+    - `"referencias_basicas"`: Lista de strings con referencias básicas. Busca la sección "Referencias básicas" o similar. Si no se encuentra, `null`.
+    - `"referencias_complementarias"`: Lista de strings con referencias complementarias. Busca la sección "Referencias complementarias" o similar. Si no se encuentra, `null`.
+    - `"sugerencias_didacticas"`: Texto extraído de la sección 'Sugerencias didácticas' o un encabezado muy similar. Si no se encuentra, `null`.
+    - `"sugerencias_evaluacion"`: Texto extraído de la sección 'Sugerencias de evaluación del aprendizaje', 'Sugerencias de evaluación' o un encabezado muy similar. Si no se encuentra, `null`.
+    - `"archivo_origen"`: ({archivo_valor})
+
+"""
+
+
+@functools.lru_cache(maxsize=1)
+def _get_extraction_cache() -> Optional[ExtractionCache]:
+    """
+    Abre (una sola vez por proceso) la caché persistente de extracciones.
     
-    # Eliminar caracteres de control comunes excepto tab, newline, carriage return
-    text = "".join(char for char in text if char.isprintable() or char in ('\t', '\n', '\r'))
+    Returns:
+        Optional[ExtractionCache]: La caché, o None si no se pudo abrir
+    """
+    try:
+        return ExtractionCache(settings.EXTRACTION_CACHE_PATH)
+    except Exception as e:
+        print(f"Advertencia: No se pudo abrir la caché de extracciones {settings.EXTRACTION_CACHE_PATH}: {e}")
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def _get_generative_model(model_name: str) -> "genai.GenerativeModel":
+    """
+    Crea (una sola vez por proceso y modelo) la instancia de genai.GenerativeModel que
+    comparten todas las extracciones, incluidas las de distintos hilos.
     
-    # Específicamente, los caracteres NUL pueden ser muy problemáticos.
-    text = text.replace('\x00', '') # Eliminar NUL bytes
+    Args:
+        model_name (str): Nombre del modelo de Gemini
+        
+    Returns:
+        genai.GenerativeModel: Instancia del modelo
+    """
+    return genai.GenerativeModel(model_name=model_name)
+
+
+def _extraction_cache_key(pdf_content_sanitized: str, omitted) -> bytes:
+    """
+    Clave de la caché de extracciones para el texto sanitizado de un PDF; incluye el modelo,
+    la versión del prompt, PREFILL_NUMERIC_FIELDS y los campos omitidos del prompt, para que un
+    cambio en cualquiera invalide las entradas anteriores (una respuesta generada sin pedir
+    ciertos campos no sirve cuando ya no se obtienen con prefill_fields).
     
-    return text
+    Args:
+        pdf_content_sanitized (str): Contenido del PDF ya sanitizado
+        omitted: Nombres de los campos que prefill_fields obtuvo para este PDF
+        
+    Returns:
+        bytes: Clave de la caché
+    """
+    namespace = (
+        f"{settings.GEN_AI_MODEL}|v{EXTRACTION_PROMPT_VERSION}"
+        f"|prefill={int(bool(settings.PREFILL_NUMERIC_FIELDS))}|omit={','.join(sorted(omitted))}"
+    )
+    return ExtractionCache.make_key(pdf_content_sanitized, namespace)
 
 
 def configure_gemini_api() -> bool:
@@ -79,6 +317,7 @@ def configure_gemini_api() -> bool:
         bool: True si la configuración fue exitosa, False en caso contrario
     """
     try:
+        settings.load_env()
         api_key = os.environ.get("GEMINI_API_KEY")
         if not api_key:
             print("Error: La variable de entorno GEMINI_API_KEY no está configurada.")
@@ -95,6 +334,7 @@ def configure_gemini_api() -> bool:
 def extract_syllabus_info(pdf_content_raw: str, filename_full_path: str) -> Dict[str, Any]:
     """
     Extrae información estructurada del contenido de un temario usando el modelo Gemini.
+    Si el mismo contenido ya se extrajo antes (con el mismo modelo y prompt), se usa la caché.
     
     Args:
         pdf_content_raw (str): Contenido del PDF como texto
@@ -103,18 +343,28 @@ def extract_syllabus_info(pdf_content_raw: str, filename_full_path: str) -> Dict
     Returns:
         Dict[str, Any]: Diccionario con la información extraída del temario
     """
-    model = genai.GenerativeModel(
-        model_name=settings.GEN_AI_MODEL
-    )
-
     # Extraer el nombre base del archivo y la clave
     base_filename = os.path.basename(filename_full_path)
     clave_from_filename, _ = os.path.splitext(base_filename)
 
     # Sanitizar el contenido del PDF antes de pasarlo al prompt
     pdf_content_sanitized = sanitize_text_for_prompt(pdf_content_raw)
+    prefilled = prefill_fields(pdf_content_sanitized)
+
+    extraction_cache = _get_extraction_cache()
+    cache_key = _extraction_cache_key(pdf_content_sanitized, prefilled)
+    if extraction_cache is not None:
+        cached = extraction_cache.get_many([cache_key]).get(cache_key)
+        if cached is not None:
+            print(f"Extracción de {base_filename} tomada de la caché.")
+            return _postprocess_extraction(cached, clave_from_filename, base_filename, None, prefilled)
+
+    model = _get_generative_model(settings.GEN_AI_MODEL)
 
     # Usar el nombre de archivo base (sin ruta) en el prompt para 'archivo_origen' y 'clave'
+    campos = _omit_campos(_CAMPOS_A_EXTRAER.format(
+        clave_valor=f"Siempre `{clave_from_filename}`", archivo_valor=f"Siempre `{base_filename}`"
+    ), prefilled)
     prompt = f"""
     Analiza el siguiente contenido de un temario de materia extraído de un PDF.
 
@@ -122,44 +372,12 @@ def extract_syllabus_info(pdf_content_raw: str, filename_full_path: str) -> Dict
 
     El temario sigue una estructura donde se presentan datos generales al inicio (nombre de la materia, semestre, etc.), seguido de tablas con detalles como horas, créditos. Usualmente sigue un índice temático, el contenido detallado por unidad y referencias y/o sugerencias al final.
 
-    Reglas:
-    - Ignora diferencias entre **mayúsculas y minúsculas**, así como entre palabras con o sin **acentos ortográficos**. Por ejemplo, trata "CLAVE", "clave", "Clavé" y "clavé" como equivalentes.
-    - **No infieras ni crees campos adicionales** fuera de los enumerados.
-    - **Sanitiza el texto extraído**: Antes de incluir texto en los valores del JSON, escapa adecuadamente caracteres especiales (saltos de línea, tabulaciones, comillas) o reemplaza caracteres de control no imprimibles para asegurar que el JSON resultante sea válido. Si un campo contiene listas (ej. indice_tematico, referencias), asegúrate que sean listas JSON válidas de strings.
-    - Devuelve la información como un objeto JSON **válido** con exactamente las siguientes claves:
-
-    Lógica especial:
+{_REGLAS_EXTRACCION}    Lógica especial:
     - La clave `"clave"` **siempre** debe ser: `{clave_from_filename}`.
     - La clave `"archivo_origen"` **siempre** debe ser: `{base_filename}`.
     - Si algún otro campo o sección no se encuentra de forma clara y explícita en el PDF, utiliza el valor JSON `null` para esa clave. No omitas la clave.
 
-    Campos a extraer:
-    - `"nombre_materia"`: Nombre de la materia, generalmente al inicio del documento.
-    - `"clave"`: (Siempre `{clave_from_filename}`)
-    - `"semestre_num"`: Número del semestre (ej. 8, 1). Debe ser un número o `null`.
-    - `"semestre_txt"`: Nombre textual del semestre (ej. OCTAVO).
-    - `"modalidad"`: Modalidad de la materia (ej. Curso, Seminario).
-    - `"caracter"`: Carácter (ej. Obligatoria, Optativa).
-    - `"tipo"`: Tipo (ej. Teórica, Teórico-Práctica).
-    - `"horas_al_semestre"`: Número total de horas al semestre. Debe ser un número o `null`.
-    - `"horas_semana"`: Número de horas a la semana. Debe ser un número o `null`.
-    - `"horas_teoricas"`: Número de horas teóricas. Debe ser un número o `null`.
-    - `"horas_practicas"`: Número de horas prácticas. Debe ser un número o `null`.
-    - `"creditos"`: Número de créditos. Debe ser un número o `null`.
-    - `"etapa_formacion"`
-    - `"campo_conocimiento"`
-    - `"antecedente"`: Materias antecedentes, o "Ninguna" si así se especifica o no se encuentra.
-    - `"subsecuente"`: Materias subsecuentes, o "Ninguna" si así se especifica o no se encuentra.
-    - `"objetivo_general"`
-    - `"indice_tematico"`: Lista de strings tipo `["1- Tema Alfa", "2- Tema Beta"]` extraída de la sección "Índice Temático" o similar. Si no se encuentra, `null`.
-    - `"contenido"`: Contenido completo de la sección "CONTENIDO" o "Temario detallado". Puede ser un string largo. Si no se encuentra, `null`.
-    - `"referencias_basicas"`: Lista de strings con referencias básicas. Busca la sección "Referencias básicas" o similar. Si no se encuentra, `null`.
-    - `"referencias_complementarias"`: Lista de strings con referencias complementarias. Busca la sección "Referencias complementarias" o similar. Si no se encuentra, `null`.
-    - `"sugerencias_didacticas"`: Texto extraído de la sección 'Sugerencias didácticas' o un encabezado muy similar. Si no se encuentra, `null`.
-    - `"sugerencias_evaluacion"`: Texto extraído de la sección 'Sugerencias de evaluación del aprendizaje', 'Sugerencias de evaluación' o un encabezado muy similar. Si no se encuentra, `null`.
-    - `"archivo_origen"`: (Siempre `{base_filename}`)
-
-    Contenido del PDF a analizar:
+{campos}    Contenido del PDF a analizar:
     ```text
     {pdf_content_sanitized}
     ```
@@ -172,24 +390,9 @@ def extract_syllabus_info(pdf_content_raw: str, filename_full_path: str) -> Dict
 
     while retry_count <= max_retries:
         try:
-            response = model.generate_content(prompt)
-            json_string = response.text.strip()
-            
-            # Intentar encontrar el JSON dentro del texto, puede estar envuelto en ```json ... ```
-            match = re.search(r"```json\s*(\{.*?\})\s*```", json_string, re.DOTALL)
-            if match:
-                json_string_cleaned = match.group(1)
-            elif json_string.startswith('{') and json_string.endswith('}'):
-                json_string_cleaned = json_string
-            else:
-                start_index = json_string.find('{')
-                end_index = json_string.rfind('}')
-                if start_index != -1 and end_index != -1 and start_index < end_index:
-                    json_string_cleaned = json_string[start_index : end_index + 1]
-                else:
-                    raise ValueError("La respuesta del modelo no contiene un objeto JSON válido reconocible.")
-            
-            extracted_data = json.loads(json_string_cleaned)
+            extracted_data = _generate_json(model, prompt, '{', '}')
+            if extraction_cache is not None and isinstance(extracted_data, dict):
+                extraction_cache.put_many({cache_key: extracted_data})
             break # Éxito, salir del bucle de reintentos
 
         except Exception as e:
@@ -198,16 +401,324 @@ def extract_syllabus_info(pdf_content_raw: str, filename_full_path: str) -> Dict
             retry_count += 1
             if retry_count > max_retries:
                 print(f"Todos los intentos fallaron para {base_filename}.")
+            else:
+                _wait_before_retry(e, retry_count)
     
-    # Definir todos los campos esperados para asegurar que el diccionario de retorno los tenga
-    expected_fields = [
-        "nombre_materia", "clave", "semestre_num", "semestre_txt", "modalidad",
-        "caracter", "tipo", "horas_al_semestre", "horas_semana", "horas_teoricas",
-        "horas_practicas", "creditos", "etapa_formacion", "campo_conocimiento",
-        "antecedente", "subsecuente", "objetivo_general", "indice_tematico",
-        "contenido", "referencias_basicas", "referencias_complementarias",
-        "sugerencias_didacticas", "sugerencias_evaluacion", "archivo_origen", "error"
+    return _postprocess_extraction(extracted_data, clave_from_filename, base_filename, last_error, prefilled)
+
+
+def _wait_before_retry(error: Exception, attempt: int) -> None:
+    """
+    Si el error es transitorio (límite de solicitudes, servicio no disponible, timeout), espera
+    antes del siguiente intento con backoff exponencial y jitter completo, para que los hilos que
+    chocaron con el límite no reintenten todos a la vez. Los demás errores se reintentan de inmediato.
+    
+    Args:
+        error (Exception): Error del intento fallido
+        attempt (int): Número de intentos fallidos hasta ahora (empezando en 1)
+    """
+    if isinstance(error, _TRANSIENT_ERRORS):
+        time.sleep(random.uniform(0, min(settings.RETRY_BACKOFF_MAX, settings.RETRY_BACKOFF_BASE * 2 ** (attempt - 1))))
+
+
+def prefill_fields(pdf_content_sanitized: str) -> Dict[str, int]:
+    """
+    Extrae con expresiones regulares los campos numéricos que aparecen rotulados en el temario
+    (horas y créditos), para no pedírselos al modelo. Un campo solo se toma si todas sus
+    apariciones coinciden en el valor; si no, se deja al modelo.
+    
+    Args:
+        pdf_content_sanitized (str): Contenido del PDF ya sanitizado
+        
+    Returns:
+        Dict[str, int]: Valor de cada campo encontrado sin ambigüedad
+    """
+    if not settings.PREFILL_NUMERIC_FIELDS:
+        return {}
+    if _PREFILL_DATABASE is not None:
+        found = _scan_prefill_fields(pdf_content_sanitized)
+    else:
+        found = {field: set(pattern.findall(pdf_content_sanitized)) for field, pattern in _PREFILL_PATTERNS.items()}
+    prefilled = {}
+    for field, values in found.items():
+        if len(values) == 1:
+            prefilled[field] = int(values.pop())
+    return prefilled
+
+
+def _scan_prefill_fields(pdf_content_sanitized: str) -> Dict[str, set]:
+    """
+    Recorre el texto una sola vez con la base de datos de Hyperscan. Hyperscan no devuelve
+    grupos, así que el número se obtiene aplicando el patrón de re solo al fragmento encontrado.
+    
+    Args:
+        pdf_content_sanitized (str): Contenido del PDF ya sanitizado
+        
+    Returns:
+        Dict[str, set]: Valores (como texto) encontrados para cada campo
+    """
+    data = pdf_content_sanitized.encode("utf-8")
+    fields = list(_PREFILL_PATTERNS)
+    found = {field: set() for field in fields}
+
+    def on_match(pattern_id: int, start: int, end: int, flags: int, context: Any) -> None:
+        field = fields[pattern_id]
+        match = _PREFILL_PATTERNS[field].fullmatch(data[start:end].decode("utf-8", errors="ignore"))
+        if match:
+            found[field].add(match.group(1))
+
+    _PREFILL_DATABASE.scan(data, match_event_handler=on_match)
+    return found
+
+
+def _omit_campos(campos: str, omitted) -> str:
+    """
+    Quita de la lista de campos a extraer del prompt los que ya se obtuvieron sin el modelo.
+    
+    Args:
+        campos (str): Lista de campos (_CAMPOS_A_EXTRAER ya formateada)
+        omitted: Nombres de los campos a quitar
+        
+    Returns:
+        str: Lista de campos sin los omitidos
+    """
+    if not omitted:
+        return campos
+    lines = []
+    for line in campos.split("\n"):
+        match = _CAMPO_PROMPT_RE.match(line)
+        if match is None or match.group(1) not in omitted:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def _find_json_text(json_string: str, opening: str, closing: str) -> str:
+    """
+    Localiza el JSON (objeto o arreglo) dentro de la respuesta del modelo, que puede venir
+    envuelto en ```json ... ``` o rodeado de texto.
+    
+    Args:
+        json_string (str): Texto de la respuesta del modelo
+        opening (str): Carácter de apertura del JSON buscado ('{' o '[')
+        closing (str): Carácter de cierre del JSON buscado ('}' o ']')
+        
+    Returns:
+        str: Texto JSON a decodificar
+    """
+    match = _JSON_FENCE_RES[opening].search(json_string)
+    if match:
+        return match.group(1)
+    if json_string.startswith(opening) and json_string.endswith(closing):
+        return json_string
+    start_index = json_string.find(opening)
+    end_index = json_string.rfind(closing)
+    if start_index != -1 and end_index != -1 and start_index < end_index:
+        return json_string[start_index : end_index + 1]
+    raise ValueError("La respuesta del modelo no contiene un JSON válido reconocible.")
+
+
+def _chunk_text(chunk: Any) -> str:
+    """
+    Texto de un fragmento de la respuesta en streaming. chunk.text lanza ValueError en los
+    fragmentos sin partes (fin por seguridad o recitación, o el último fragmento con solo
+    metadatos); esos fragmentos no aportan texto.
+    
+    Args:
+        chunk (Any): Fragmento de la respuesta de genai
+        
+    Returns:
+        str: Texto del fragmento, o cadena vacía si no tiene
+    """
+    try:
+        return chunk.text
+    except ValueError:
+        return ""
+
+
+def _generate_json(model: Any, prompt: str, opening: str, closing: str) -> Any:
+    """
+    Pide la respuesta al modelo en streaming y la decodifica en cuanto se cierra el JSON
+    (objeto o arreglo) de nivel superior, sin esperar el resto de la respuesta. Las aperturas
+    y cierres se cuentan fuera de las cadenas, respetando los escapes. Al salir, el resto de
+    la respuesta se consume con resolve() para no dejar el stream abierto.
+    
+    Args:
+        model (Any): Instancia de genai.GenerativeModel
+        prompt (str): Prompt a enviar
+        opening (str): Carácter de apertura del JSON esperado ('{' o '[')
+        closing (str): Carácter de cierre del JSON esperado ('}' o ']')
+        
+    Returns:
+        Any: El JSON decodificado
+    """
+    response = model.generate_content(prompt, stream=True)
+    try:
+        parts = []
+        json_chars = [] # Texto desde la apertura del JSON de nivel superior
+        depth = 0
+        in_string = False
+        escaped = False
+        for chunk in response:
+            chunk_text = _chunk_text(chunk)
+            parts.append(chunk_text)
+            for char in chunk_text:
+                if depth == 0:
+                    if char != opening:
+                        continue
+                elif in_string:
+                    if escaped:
+                        escaped = False
+                    elif char == '\\':
+                        escaped = True
+                    elif char == '"':
+                        in_string = False
+                elif char == '"':
+                    in_string = True
+                json_chars.append(char)
+                if in_string:
+                    continue
+                if char == opening:
+                    depth += 1
+                elif char == closing:
+                    depth -= 1
+                    if depth == 0:
+                        try:
+                            return json.loads("".join(json_chars))
+                        except ValueError:
+                            json_chars = [] # JSON mal formado; se intentará con la respuesta completa
+    finally:
+        resolve = getattr(response, "resolve", None)
+        if resolve is not None:
+            try:
+                resolve()
+            except Exception:
+                pass # El JSON ya se obtuvo (o se reportará el error original); el resto no importa
+        
+    # El JSON no se cerró o no se pudo decodificar: localizarlo en la respuesta completa
+    text = "".join(parts)
+    return json.loads(_find_json_text(text.strip(), opening, closing))
+
+
+def _as_int_field(value: Any, field: str, base_filename: str) -> Optional[int]:
+    """
+    Convierte un campo numérico de la respuesta del modelo a entero.
+    
+    Args:
+        value (Any): Valor devuelto por el modelo
+        field (str): Nombre del campo (para la advertencia)
+        base_filename (str): Nombre del archivo PDF (para la advertencia)
+        
+    Returns:
+        Optional[int]: El valor como entero, o None si falta o no es un número válido
+    """
+    if value is None:
+        return None
+    try:
+        return int(value) # O float(val) si pueden tener decimales
+    except (ValueError, TypeError):
+        print(f"Advertencia: El campo '{field}' para '{base_filename}' no es un número válido ('{value}'). Se establecerá a None.")
+        return None
+
+
+def _as_str_list_field(value: Any, field: str, base_filename: str) -> Optional[List[str]]:
+    """
+    Convierte un campo de lista de la respuesta del modelo a una lista de strings.
+    
+    Args:
+        value (Any): Valor devuelto por el modelo
+        field (str): Nombre del campo (para la advertencia)
+        base_filename (str): Nombre del archivo PDF (para la advertencia)
+        
+    Returns:
+        Optional[List[str]]: La lista con sus elementos como strings, o None si falta o no es una lista
+    """
+    if value is None:
+        return None
+    if not isinstance(value, list):
+        print(f"Advertencia: El campo '{field}' para '{base_filename}' no es una lista válida ('{value}'). Se establecerá a None.")
+        return None
+    return [str(item) if item is not None else "" for item in value]
+
+
+def _build_postprocess_function(
+    fields: Tuple[str, ...],
+    numeric_fields: Tuple[str, ...],
+    list_fields: Tuple[str, ...]
+):
+    """
+    Genera, a partir del esquema de los temarios, una función de post-procesamiento sin ciclos:
+    una línea por campo, en lugar de recorrer las listas de campos y comprobar su tipo en cada PDF.
+    
+    Args:
+        fields (Tuple[str, ...]): Campos esperados, en el orden del resultado
+        numeric_fields (Tuple[str, ...]): Campos que deben ser enteros
+        list_fields (Tuple[str, ...]): Campos que deben ser listas de strings
+        
+    Returns:
+        Callable: Función (extracted_data, clave, archivo, last_error) -> Dict[str, Any]
+    """
+    lines = [
+        "def _postprocess_fields(extracted_data, clave_from_filename, base_filename, last_error):",
+        "    get = extracted_data.get",
+        "    nombre_materia = get('nombre_materia')",
+        "    final_result = {",
+        "        'clave': clave_from_filename,",
+        "        'archivo_origen': base_filename,",
+        "        'nombre_materia': nombre_materia.strip() if nombre_materia and isinstance(nombre_materia, str) else None,",
     ]
+    for field in fields:
+        if field in ("clave", "archivo_origen", "nombre_materia"):
+            continue
+        if field == "error":
+            value = "f'Extracción parcial, error final: {last_error}' if last_error else None"
+        elif field in numeric_fields:
+            value = f"_as_int_field(get({field!r}), {field!r}, base_filename)"
+        elif field in list_fields:
+            value = f"_as_str_list_field(get({field!r}), {field!r}, base_filename)"
+        else:
+            value = f"get({field!r})"
+        lines.append(f"        {field!r}: {value},")
+    lines.append("    }")
+    if "error" not in fields:
+        lines.append("    final_result['error'] = f'Extracción parcial, error final: {last_error}' if last_error else None")
+    lines.append("    return final_result")
+
+    namespace = {"_as_int_field": _as_int_field, "_as_str_list_field": _as_str_list_field}
+    exec("\n".join(lines), namespace)
+    return namespace["_postprocess_fields"]
+
+
+_postprocess_fields = _build_postprocess_function(
+    tuple(settings.SYLLABUS_FIELDS),
+    tuple(settings.SYLLABUS_NUMERIC_FIELDS),
+    tuple(settings.SYLLABUS_LIST_FIELDS)
+)
+
+
+def _postprocess_extraction(
+    extracted_data: Optional[Dict[str, Any]],
+    clave_from_filename: str,
+    base_filename: str,
+    last_error: Optional[Exception],
+    prefilled: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Normaliza la respuesta del modelo para un temario: fuerza 'clave' y 'archivo_origen',
+    añade los campos obtenidos sin el modelo, convierte los campos numéricos y de lista,
+    y asegura que estén todos los campos esperados.
+    
+    Args:
+        extracted_data (Optional[Dict[str, Any]]): Objeto JSON devuelto por el modelo, o None si falló
+        clave_from_filename (str): Clave de la materia (nombre del archivo sin extensión)
+        base_filename (str): Nombre del archivo PDF
+        last_error (Optional[Exception]): Último error de los intentos de extracción
+        prefilled (Optional[Dict[str, Any]]): Campos extraídos con prefill_fields, que prevalecen sobre el modelo
+        
+    Returns:
+        Dict[str, Any]: Diccionario con la información extraída del temario
+    """
+    # Definir todos los campos esperados para asegurar que el diccionario de retorno los tenga
+    expected_fields = settings.SYLLABUS_FIELDS
 
     if extracted_data is None:
         # Falló la extracción con IA, devolver un diccionario con valores por defecto y el error
@@ -218,137 +729,383 @@ def extract_syllabus_info(pdf_content_raw: str, filename_full_path: str) -> Dict
         result["error"] = str(last_error)
         return result
 
-    # Post-procesamiento y asegurar que todos los campos estén presentes
-    final_result = {}
-    # Forzar 'clave' y 'archivo_origen' según lo definido
-    final_result["clave"] = clave_from_filename
-    final_result["archivo_origen"] = base_filename
+    if prefilled:
+        extracted_data = {**extracted_data, **prefilled}
+    return _postprocess_fields(extracted_data, clave_from_filename, base_filename, last_error)
 
-    # Procesar 'nombre_materia'
-    nombre_materia_extraido = extracted_data.get("nombre_materia")
-    if nombre_materia_extraido and isinstance(nombre_materia_extraido, str):
-        final_result["nombre_materia"] = nombre_materia_extraido.strip()
-    else:
-        final_result["nombre_materia"] = None 
-
-    # Asignar los demás campos extraídos o None si faltan
-    for field in expected_fields:
-        if field not in final_result: # No sobrescribir campos ya procesados
-            final_result[field] = extracted_data.get(field) # Usa .get() para evitar KeyError
-
-    # Asegurar que los campos numéricos sean números o None
-    numeric_fields = ["semestre_num", "horas_al_semestre", "horas_semana", "horas_teoricas", "horas_practicas", "creditos"]
-    for nf in numeric_fields:
-        val = final_result.get(nf)
-        if val is not None:
-            try:
-                final_result[nf] = int(val) # O float(val) si pueden tener decimales
-            except (ValueError, TypeError):
-                print(f"Advertencia: El campo '{nf}' para '{base_filename}' no es un número válido ('{val}'). Se establecerá a None.")
-                final_result[nf] = None
-    
-    # Asegurar que los campos de lista sean listas o None
-    list_fields = ["indice_tematico", "referencias_basicas", "referencias_complementarias"]
-    for lf in list_fields:
-        val = final_result.get(lf)
-        if val is not None and not isinstance(val, list):
-            print(f"Advertencia: El campo '{lf}' para '{base_filename}' no es una lista válida ('{val}'). Se establecerá a None.")
-            final_result[lf] = None
-        elif isinstance(val, list): # Asegurar que los elementos de la lista sean strings
-            final_result[lf] = [str(item) if item is not None else "" for item in val]
-
-    if last_error: # Si hubo un error en el último intento pero se recuperó algo
-        final_result["error"] = f"Extracción parcial, error final: {str(last_error)}"
+
+def extract_syllabus_info_batch(items: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """
+    Extrae información estructurada de varios temarios con una sola llamada al modelo Gemini,
+    pidiendo un arreglo JSON con un objeto por PDF en el mismo orden. Los temarios ya extraídos
+    antes se toman de la caché y no se envían al modelo.
+    
+    Args:
+        items (List[Tuple[str, str]]): Pares (contenido del PDF como texto, ruta completa al PDF)
+        
+    Returns:
+        List[Dict[str, Any]]: Información extraída de cada temario, en el orden de 'items'
+    """
+    if len(items) == 1:
+        return [extract_syllabus_info(*items[0])]
+
+    sanitized_items = [(sanitize_text_for_prompt(content), path) for content, path in items]
+    prefilled = [prefill_fields(content) for content, _ in sanitized_items]
+    # La clave usa los campos de cada PDF: el lote omite solo su intersección, así que la respuesta
+    # guardada trae al menos los campos que pediría la extracción individual
+    cache_keys = [_extraction_cache_key(content, fields) for (content, _), fields in zip(sanitized_items, prefilled)]
+    extraction_cache = _get_extraction_cache()
+    cached = extraction_cache.get_many(cache_keys) if extraction_cache is not None else {}
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    pending = []
+    for i, ((_, path), key) in enumerate(zip(sanitized_items, cache_keys)):
+        if key in cached:
+            base_filename = os.path.basename(path)
+            print(f"Extracción de {base_filename} tomada de la caché.")
+            results[i] = _postprocess_extraction(
+                cached[key], os.path.splitext(base_filename)[0], base_filename, None, prefilled[i]
+            )
+        else:
+            pending.append(i)
+
+    if len(pending) == 1:
+        results[pending[0]] = extract_syllabus_info(*sanitized_items[pending[0]])
+    elif pending:
+        extracted = _request_batch_extraction(
+            [sanitized_items[i] for i in pending], [cache_keys[i] for i in pending], extraction_cache,
+            [prefilled[i] for i in pending]
+        )
+        for i, extracted_info in zip(pending, extracted):
+            results[i] = extracted_info
+    return results
+
+
+def _request_batch_extraction(
+    items: List[Tuple[str, str]],
+    cache_keys: List[bytes],
+    extraction_cache: Optional[ExtractionCache],
+    prefilled: List[Dict[str, int]]
+) -> List[Dict[str, Any]]:
+    """
+    Envía un lote de temarios al modelo Gemini en una sola solicitud y guarda las respuestas en caché.
+    Si la respuesta no se puede interpretar tras los reintentos, cada temario se extrae por separado.
+    
+    Args:
+        items (List[Tuple[str, str]]): Pares (contenido sanitizado del PDF, ruta completa al PDF)
+        cache_keys (List[bytes]): Clave de caché de cada temario
+        extraction_cache (Optional[ExtractionCache]): Caché donde guardar las respuestas
+        prefilled (List[Dict[str, int]]): Campos de cada temario extraídos con prefill_fields
+        
+    Returns:
+        List[Dict[str, Any]]: Información extraída de cada temario, en el orden de 'items'
+    """
+    model = _get_generative_model(settings.GEN_AI_MODEL)
+
+    base_filenames = [os.path.basename(path) for _, path in items]
+    claves = [os.path.splitext(base)[0] for base in base_filenames]
+    secciones = "".join(
+        f"""
+    ===PDF {i}=== (clave: `{clave}`, archivo_origen: `{base}`)
+    ```text
+    {content}
+    ```
+"""
+        for i, ((content, _), clave, base) in enumerate(zip(items, claves, base_filenames), start=1)
+    )
+    # Solo se omiten del prompt los campos que se obtuvieron sin el modelo en todos los PDFs del lote
+    omitted = set.intersection(*(set(fields) for fields in prefilled))
+    campos = _omit_campos(_CAMPOS_A_EXTRAER.format(
+        clave_valor="Siempre la clave indicada en el encabezado de su PDF",
+        archivo_valor="Siempre el archivo_origen indicado en el encabezado de su PDF"
+    ), omitted)
+    prompt = f"""
+    Analiza los siguientes {len(items)} contenidos de temarios de materias extraídos de PDFs. Cada uno comienza con un encabezado `===PDF n===`.
+
+    Tu objetivo es extraer, para cada PDF, únicamente la información clave como un objeto JSON **estrictamente limitado** a los campos especificados más abajo. **No incluyas claves adicionales bajo ninguna circunstancia.** Devuelve un arreglo JSON con exactamente {len(items)} objetos, uno por PDF y en el mismo orden.
+
+    Cada temario sigue una estructura donde se presentan datos generales al inicio (nombre de la materia, semestre, etc.), seguido de tablas con detalles como horas, créditos. Usualmente sigue un índice temático, el contenido detallado por unidad y referencias y/o sugerencias al final.
+
+{_REGLAS_EXTRACCION}    Lógica especial:
+    - Las claves `"clave"` y `"archivo_origen"` de cada objeto **siempre** deben ser las indicadas en el encabezado de su PDF.
+    - Si algún otro campo o sección no se encuentra de forma clara y explícita en el PDF, utiliza el valor JSON `null` para esa clave. No omitas la clave.
+
+{campos}    PDFs a analizar:
+{secciones}"""
+
+    retry_count = 0
+    max_retries = settings.MAX_RETRIES
+    extracted_list = None
+    last_error = None
+    batch_name = ", ".join(base_filenames)
+
+    while retry_count <= max_retries:
+        try:
+            extracted_list = _generate_json(model, prompt, '[', ']')
+            if not isinstance(extracted_list, list) or len(extracted_list) != len(items):
+                raise ValueError(f"Se esperaba un arreglo JSON de {len(items)} objetos.")
+            break # Éxito, salir del bucle de reintentos
+
+        except Exception as e:
+            extracted_list = None
+            last_error = e
+            print(f"Intento {retry_count + 1}/{max_retries + 1} fallido para el lote {batch_name}: {e}")
+            retry_count += 1
+            if retry_count <= max_retries:
+                _wait_before_retry(e, retry_count)
+
+    if extracted_list is None:
+        print(f"Todos los intentos fallaron para el lote {batch_name}. Extrayendo cada PDF por separado.")
+        return [extract_syllabus_info(content, path) for content, path in items]
+
+    if extraction_cache is not None:
+        extraction_cache.put_many({key: data for key, data in zip(cache_keys, extracted_list) if isinstance(data, dict)})
+    return [
+        _postprocess_extraction(data if isinstance(data, dict) else {}, clave, base, last_error, fields)
+        for data, clave, base, fields in zip(extracted_list, claves, base_filenames, prefilled)
+    ]
+
+
+def _read_error_record(pdf_file_path: str) -> Dict[str, Any]:
+    """
+    Registro que se guarda para un PDF del que no se pudo leer contenido.
+    
+    Args:
+        pdf_file_path (str): Ruta al archivo PDF
+        
+    Returns:
+        Dict[str, Any]: Registro con todos los campos y el error de lectura
+    """
+    base_filename_for_print = os.path.basename(pdf_file_path)
+    clave_error_lectura, _ = os.path.splitext(base_filename_for_print)
+    return {
+        "clave": clave_error_lectura, 
+        "nombre_materia": f"Error de lectura - {base_filename_for_print}",
+        "semestre_num": None, 
+        "semestre_txt": None,
+        "modalidad": None, 
+        "caracter": None, 
+        "tipo": None, 
+        "horas_al_semestre": None,
+        "horas_semana": None, 
+        "horas_teoricas": None, 
+        "horas_practicas": None, 
+        "creditos": None,
+        "etapa_formacion": None, 
+        "campo_conocimiento": None, 
+        "antecedente": "Error de lectura",
+        "subsecuente": "Error de lectura", 
+        "objetivo_general": "Error de lectura",
+        "indice_tematico": None, 
+        "contenido": "Error de lectura",
+        "referencias_basicas": None, 
+        "referencias_complementarias": None,
+        "sugerencias_didacticas": "Error de lectura", 
+        "sugerencias_evaluacion": "Error de lectura",
+        "archivo_origen": base_filename_for_print, 
+        "error": "No se pudo leer contenido válido del PDF"
+    }
+
+
+def _report_extraction(base_filename: str, extracted_info: Dict[str, Any]) -> None:
+    """
+    Imprime el resultado de la extracción de un PDF.
+    
+    Args:
+        base_filename (str): Nombre del archivo PDF
+        extracted_info (Dict[str, Any]): Información extraída del PDF
+    """
+    if extracted_info.get("error") and "Error al extraer de" not in str(extracted_info.get("nombre_materia", "")):
+        print(f"Extracción completada para {base_filename} con advertencias/errores: {extracted_info.get('error')}")
+    elif "Error al extraer de" in str(extracted_info.get("nombre_materia", "")):
+        print(f"Extracción fallida para {base_filename}: {extracted_info.get('error')}")
     else:
-        final_result["error"] = None # Sin error
+        print(f"Extracción completada exitosamente para {base_filename}")
 
-    # Verificar que todos los campos esperados estén, aunque sea con valor None
-    for ef in expected_fields:
-        if ef not in final_result:
-            final_result[ef] = None
-            
-    return final_result
+
+def _extract_batch(pdf_file_paths: List[str], contents: List[str]) -> List[Dict[str, Any]]:
+    """
+    Extrae la información de un lote de PDFs ya leídos con una sola llamada al modelo.
+    Los PDFs sin contenido no se envían al modelo y reciben un registro de error.
+    
+    Args:
+        pdf_file_paths (List[str]): Rutas a los archivos PDF
+        contents (List[str]): Contenido de cada PDF como texto
+        
+    Returns:
+        List[Dict[str, Any]]: Información extraída de cada PDF, en el orden de 'pdf_file_paths'
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(pdf_file_paths)
+    pending = []
+    for i, (path, raw_content) in enumerate(zip(pdf_file_paths, contents)):
+        if raw_content and raw_content.strip():
+            pending.append(i)
+        else:
+            print(f"No se pudo leer contenido válido de {os.path.basename(path)} o el archivo está vacío.")
+            results[i] = _read_error_record(path)
+
+    if pending:
+        extracted = extract_syllabus_info_batch([(contents[i], pdf_file_paths[i]) for i in pending])
+        for i, extracted_info in zip(pending, extracted):
+            _report_extraction(os.path.basename(pdf_file_paths[i]), extracted_info)
+            results[i] = extracted_info
+    return results
 
 
-def process_all_pdfs(pdf_dir: str = None) -> List[Dict[str, Any]]:
+def _extract_batch_after_read(pdf_file_paths: List[str], read_futures: List["Future[str]"]) -> List[Dict[str, Any]]:
     """
-    Procesa todos los PDFs en una carpeta y extrae su información
+    Espera la lectura de un lote de PDFs (hecha en procesos trabajadores) y extrae su información.
+    
+    Args:
+        pdf_file_paths (List[str]): Rutas a los archivos PDF
+        read_futures (List[Future[str]]): Lecturas pendientes del contenido de cada PDF
+        
+    Returns:
+        List[Dict[str, Any]]: Información extraída de cada PDF, en el orden de 'pdf_file_paths'
+    """
+    return _extract_batch(pdf_file_paths, [future.result() for future in read_futures])
+
+
+def _iter_pdfs(root: str) -> Iterator[str]:
+    """
+    Recorre una carpeta y sus subcarpetas generando las rutas de los PDFs conforme se
+    encuentran. Usa os.scandir, que obtiene el tipo de cada entrada sin llamar a stat.
+    
+    Args:
+        root (str): Carpeta a recorrer
+        
+    Yields:
+        str: Ruta de cada archivo PDF
+    """
+    subdirs = []
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.name.lower().endswith(".pdf"):
+                    yield entry.path
+    except OSError as e:
+        print(f"No se pudo leer la carpeta {root}: {e}")
+        return
+    for subdir in subdirs:
+        yield from _iter_pdfs(subdir)
+
+
+def _iter_batches(paths: Iterator[str], batch_size: int) -> Iterator[List[str]]:
+    """
+    Agrupa un iterador de rutas en lotes de tamaño fijo (el último puede ser menor).
+    
+    Args:
+        paths (Iterator[str]): Rutas a agrupar
+        batch_size (int): Número de rutas por lote
+        
+    Yields:
+        List[str]: Cada lote de rutas
+    """
+    batch = []
+    for path in paths:
+        batch.append(path)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def yield_records(pdf_dir: str = None, n_workers: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Procesa todos los PDFs en una carpeta y genera la información de cada uno a medida
+    que se extrae, sin acumular todos los registros en memoria.
     
     Args:
         pdf_dir (str): Carpeta que contiene los PDFs o subcarpetas con PDFs.
                        Si es None, usa la carpeta de PDFs configurada en settings.
+        n_workers (Optional[int]): Número de procesos para leer PDFs en paralelo.
+                                   Si es None, usa settings.PDF_WORKERS.
     
-    Returns:
-        List[Dict[str, Any]]: Lista con la información extraída de cada PDF
+    Yields:
+        Dict[str, Any]: La información extraída de cada PDF
     """
     if pdf_dir is None:
         pdf_dir = settings.PDF_DIR
+    if n_workers is None:
+        n_workers = settings.PDF_WORKERS
         
     if not os.path.isdir(pdf_dir):
         print(f"Error: La carpeta de PDFs '{pdf_dir}' no existe.")
-        return []
+        return
         
     # Configurar API de Gemini
     api_configured = configure_gemini_api()
     if not api_configured:
         print("No se pudo configurar la API de Gemini. Abortando extracción.")
-        return []
-    
-    # Encontrar todos los archivos PDF
-    subject_files_paths = []
-    for root, _, files in os.walk(pdf_dir):
-        for f in files:
-            if f.lower().endswith(".pdf"):
-                subject_files_paths.append(os.path.join(root, f))
-                
-    # Extraer información de cada PDF
-    all_extracted_data = []
-    
-    for pdf_file_path in subject_files_paths:
-        base_filename_for_print = os.path.basename(pdf_file_path)
-        print(f"Procesando {base_filename_for_print}...")
-        raw_content = read_pdf_content(pdf_file_path)
-        
-        if raw_content and raw_content.strip():
-            extracted_info = extract_syllabus_info(raw_content, pdf_file_path)
-            all_extracted_data.append(extracted_info)
-            
-            if extracted_info.get("error") and "Error al extraer de" not in str(extracted_info.get("nombre_materia", "")):
-                print(f"Extracción completada para {base_filename_for_print} con advertencias/errores: {extracted_info.get('error')}")
-            elif "Error al extraer de" in str(extracted_info.get("nombre_materia", "")):
-                print(f"Extracción fallida para {base_filename_for_print}: {extracted_info.get('error')}")
-            else:
-                print(f"Extracción completada exitosamente para {base_filename_for_print}")
-        else:
-            print(f"No se pudo leer contenido válido de {base_filename_for_print} o el archivo está vacío.")
-            # Añadir un registro con error si no se pudo leer el archivo
-            clave_error_lectura, _ = os.path.splitext(base_filename_for_print)
-            all_extracted_data.append({
-                "clave": clave_error_lectura, 
-                "nombre_materia": f"Error de lectura - {base_filename_for_print}",
-                "semestre_num": None, 
-                "semestre_txt": None,
-                "modalidad": None, 
-                "caracter": None, 
-                "tipo": None, 
-                "horas_al_semestre": None,
-                "horas_semana": None, 
-                "horas_teoricas": None, 
-                "horas_practicas": None, 
-                "creditos": None,
-                "etapa_formacion": None, 
-                "campo_conocimiento": None, 
-                "antecedente": "Error de lectura",
-                "subsecuente": "Error de lectura", 
-                "objetivo_general": "Error de lectura",
-                "indice_tematico": None, 
-                "contenido": "Error de lectura",
-                "referencias_basicas": None, 
-                "referencias_complementarias": None,
-                "sugerencias_didacticas": "Error de lectura", 
-                "sugerencias_evaluacion": "Error de lectura",
-                "archivo_origen": base_filename_for_print, 
-                "error": "No se pudo leer contenido válido del PDF"
-            })
-    
-    return all_extracted_data 
\ No newline at end of file
+        return
+    
+    # Los PDFs se envían a Gemini en lotes de settings.GEMINI_BATCH_SIZE por solicitud. Los lotes
+    # se arman conforme se recorre la carpeta, de modo que el trabajo empieza con el primer PDF encontrado
+    batches = _iter_batches(_iter_pdfs(pdf_dir), max(1, settings.GEMINI_BATCH_SIZE))
+    first_batch = next(batches, None)
+    if first_batch is None:
+        return
+    batches = itertools.chain([first_batch], batches)
+    
+    # Extraer información de cada PDF. La lectura de PDFs es CPU-bound, por lo que se
+    # reparte entre procesos; las llamadas a Gemini esperan la red, por lo que se hacen
+    # desde hilos de este proceso.
+    n_workers = max(1, n_workers)
+    if n_workers == 1:
+        for batch in batches:
+            contents = []
+            for path in batch:
+                print(f"Procesando {os.path.basename(path)}...")
+                contents.append(read_pdf_content(path))
+            yield from _extract_batch(batch, contents)
+        return
+    
+    n_threads = max(1, settings.GEMINI_WORKERS)
+    # Lotes en vuelo (leyéndose, esperando a Gemini o terminados sin entregar): dos por hilo bastan
+    # para que lectores y llamadas a Gemini no se queden sin trabajo, y acotan la memoria usada
+    max_in_flight = 2 * n_threads
+    with ProcessPoolExecutor(max_workers=n_workers) as readers, ThreadPoolExecutor(max_workers=n_threads) as extractors:
+        try:
+            # Cada hilo espera la lectura de su lote de PDFs y luego llama a Gemini; como las lecturas se
+            # encolan en el mismo orden, los hilos nunca esperan a un PDF que aún no se empieza a leer
+            extract_futures = collections.deque()
+            for batch in batches:
+                # Con el máximo de lotes en vuelo, esperar y entregar el más antiguo antes de encolar otro
+                while len(extract_futures) >= max_in_flight:
+                    yield from extract_futures.popleft().result()
+                read_futures = []
+                for path in batch:
+                    print(f"Procesando {os.path.basename(path)}...")
+                    read_futures.append(readers.submit(read_pdf_content, path))
+                extract_futures.append(extractors.submit(_extract_batch_after_read, batch, read_futures))
+                # Mientras se sigue recorriendo la carpeta, entregar los lotes que ya terminaron
+                while extract_futures and extract_futures[0].done():
+                    yield from extract_futures.popleft().result()
+            # Los resultados se entregan en el orden de los archivos conforme van terminando
+            while extract_futures:
+                yield from extract_futures.popleft().result()
+        except BaseException:
+            # Interrupción, error o generador cerrado antes de terminar (GeneratorExit): cancelar las
+            # lecturas y llamadas a Gemini pendientes para que la salida del 'with' no las espere
+            readers.shutdown(wait=False, cancel_futures=True)
+            extractors.shutdown(wait=False, cancel_futures=True)
+            raise
+
+
+def process_all_pdfs(pdf_dir: str = None, n_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Procesa todos los PDFs en una carpeta y extrae su información
+    
+    Args:
+        pdf_dir (str): Carpeta que contiene los PDFs o subcarpetas con PDFs.
+                       Si es None, usa la carpeta de PDFs configurada en settings.
+        n_workers (Optional[int]): Número de procesos para leer PDFs en paralelo.
+                                   Si es None, usa settings.PDF_WORKERS.
+    
+    Returns:
+        List[Dict[str, Any]]: Lista con la información extraída de cada PDF
+    """
+    return list(yield_records(pdf_dir=pdf_dir, n_workers=n_workers))
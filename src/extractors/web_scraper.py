@@ -2,10 +2,19 @@
 Módulo para extraer datos de páginas web utilizando Beautiful Soup y Selenium
 """
 from bs4 import BeautifulSoup
+import atexit
+import functools
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
-import time
+import shutil
 import random
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
@@ -16,15 +25,57 @@ from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.service import Service
 
 from config import settings
+from src.extractors.async_downloader import AIOHTTP_AVAILABLE, download_many, preallocate_file
 
+# lxml es opcional; sin él BeautifulSoup usa el parser de la biblioteca estándar (más lento)
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
 
-def get_driver() -> webdriver.Chrome:
+# Selectores de la página de temarios, compartidos por la enumeración estática y la de Selenium
+_SEL_SEMESTRE = "a.semestre"
+_SEL_RESULT_PDFS = "#result a[href$='.pdf']"
+# Enlace de semestre por su texto (@class puede tener otras clases además de 'semestre')
+_XPATH_SEM_BY_NAME = "//a[contains(concat(' ', normalize-space(@class), ' '), ' semestre ') and normalize-space(.) = {lit}]"
+
+# Driver compartido por el proceso (get_driver(reuse=True)); se cierra al salir
+_DRIVER: Optional[webdriver.Chrome] = None
+_driver_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_driver_path() -> str:
+    """
+    Install (or locate) ChromeDriver once per process, avoiding the version check
+    request that ChromeDriverManager makes on every call
+    
+    Returns:
+        str: Path to the ChromeDriver executable
+    """
+    return ChromeDriverManager().install()
+
+
+def get_driver(reuse: bool = False) -> webdriver.Chrome:
     """
     Initialize and return a Chrome WebDriver instance with options
     
+    Args:
+        reuse (bool): If True, return the process-wide driver (created on first use and
+                      closed at exit) instead of a new one that the caller must quit
+    
     Returns:
         WebDriver: Chrome WebDriver instance
     """
+    global _DRIVER
+    if reuse:
+        with _driver_lock:
+            if _DRIVER is None:
+                _DRIVER = get_driver()
+                atexit.register(shutdown_driver)
+            return _DRIVER
+
     chrome_options = Options()
     if settings.HEADLESS_MODE:
         chrome_options.add_argument('--headless')
@@ -32,26 +83,60 @@ def get_driver() -> webdriver.Chrome:
     chrome_options.add_argument('--disable-dev-shm-usage')
     
     try:
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+        driver = webdriver.Chrome(service=Service(_get_driver_path()), options=chrome_options)
         return driver
     except Exception as e:
         print(f"Error al inicializar el WebDriver: {e}")
         raise
 
 
-def get_soup(url: str) -> BeautifulSoup:
+def shutdown_driver() -> None:
+    """
+    Quit the process-wide driver created by get_driver(reuse=True), if any
+    """
+    global _DRIVER
+    with _driver_lock:
+        if _DRIVER is not None:
+            try:
+                _DRIVER.quit()
+            except Exception as e:
+                print(f"Error al cerrar el WebDriver: {e}")
+            _DRIVER = None
+
+
+def create_session() -> requests.Session:
+    """
+    Crea una sesión HTTP que mantiene las conexiones abiertas (keep-alive) entre solicitudes
+    al mismo host y reintenta los errores transitorios con backoff.
+    
+    Returns:
+        requests.Session: Sesión configurada
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=settings.DOWNLOAD_CONCURRENCY,
+        max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_soup(url: str, session: Optional[requests.Session] = None) -> BeautifulSoup:
     """
     Load a URL and return BeautifulSoup object with the page content
     
     Args:
         url (str): URL to load
+        session (Optional[requests.Session]): Session to reuse connections, if None a plain request is made
         
     Returns:
         BeautifulSoup: BeautifulSoup object with the page content
     """
-    response = requests.get(url)
+    response = (session or requests).get(url, timeout=settings.BROWSER_TIMEOUT)
     response.raise_for_status()  # Raise an exception for bad status codes
-    return BeautifulSoup(response.text, 'html.parser')
+    return BeautifulSoup(response.text, HTML_PARSER)
 
 
 def get_soup_by_driver(driver: webdriver.Chrome) -> BeautifulSoup:
@@ -64,7 +149,7 @@ def get_soup_by_driver(driver: webdriver.Chrome) -> BeautifulSoup:
     Returns:
         BeautifulSoup: BeautifulSoup object with the page content
     """
-    soup = BeautifulSoup(driver.page_source, 'html.parser')
+    soup = BeautifulSoup(driver.page_source, HTML_PARSER)
     return soup
 
 
@@ -128,6 +213,220 @@ def click_element_by_xpath(driver: webdriver.Chrome, xpath: str, timeout: int =
         raise
 
 
+def enumerate_pdf_links_static(base_url: Optional[str] = None) -> Dict[str, List[str]]:
+    """
+    Enumera los enlaces a PDFs por semestre sin abrir un navegador, leyendo el HTML
+    estático de la página de temarios y de la página de cada semestre.
+
+    Args:
+        base_url (Optional[str]): URL de la página de temarios, si es None se usa settings.BASE_URL
+
+    Returns:
+        Dict[str, List[str]]: URLs absolutas de los PDFs por nombre de semestre
+                              (vacío si la página requiere JavaScript)
+    """
+    if base_url is None:
+        base_url = settings.BASE_URL
+
+    links: Dict[str, List[str]] = {}
+    with create_session() as session:
+        for nombre, semester_url in _list_semester_urls(session, base_url):
+            urls = _list_pdfs_for_semester(session, semester_url)
+            if urls:
+                links[nombre] = urls
+
+    return links
+
+
+def _list_semester_urls(session: requests.Session, base_url: str) -> List[Tuple[str, str]]:
+    """
+    Lee la página de temarios una sola vez y obtiene la URL de la página de cada semestre.
+
+    Args:
+        session (requests.Session): Sesión HTTP compartida
+        base_url (str): URL de la página de temarios
+
+    Returns:
+        List[Tuple[str, str]]: Pares (nombre del semestre, URL absoluta de su página)
+    """
+    soup = get_soup(base_url, session=session)
+    semester_urls = []
+    for semestre in soup.select(_SEL_SEMESTRE):
+        nombre = semestre.get_text(strip=True)
+        href = semestre.get("href")
+        # Los semestres que se cargan con JavaScript no tienen una URL propia
+        if not nombre or not href or href.startswith(("#", "javascript:")):
+            continue
+        semester_urls.append((nombre, urljoin(base_url, href)))
+    return semester_urls
+
+
+def _list_pdfs_for_semester(session: requests.Session, semester_url: str) -> List[str]:
+    """
+    Obtiene las URLs de los PDFs enlazados desde la página de un semestre.
+
+    Args:
+        session (requests.Session): Sesión HTTP compartida
+        semester_url (str): URL de la página del semestre
+
+    Returns:
+        List[str]: URLs absolutas de los PDFs, sin repetidos y en el orden de la página
+    """
+    response = session.get(semester_url, timeout=settings.BROWSER_TIMEOUT)
+    response.raise_for_status()
+    page = BeautifulSoup(response.text, HTML_PARSER)
+    return list(dict.fromkeys(urljoin(response.url, a["href"]) for a in page.select("a[href$='.pdf']")))
+
+
+def enumerate_pdf_links_selenium(base_url: Optional[str] = None) -> Dict[str, List[str]]:
+    """
+    Enumera los enlaces a PDFs por semestre usando Selenium, haciendo clic en cada semestre
+    para que la página cargue sus temarios.
+
+    Args:
+        base_url (Optional[str]): URL de la página de temarios, si es None se usa settings.BASE_URL
+
+    Returns:
+        Dict[str, List[str]]: URLs de los PDFs por nombre de semestre
+    """
+    if base_url is None:
+        base_url = settings.BASE_URL
+
+    # Usar el driver compartido y acceder a la URL una sola vez: cada clic solo reemplaza el contenido de #result
+    driver = get_driver(reuse=True)
+    try:
+        driver.get(base_url)
+        # Esperas explícitas en lugar de implicitly_wait, que retrasaría cada find_element del recorrido
+        driver.implicitly_wait(0)
+        WebDriverWait(driver, settings.BROWSER_TIMEOUT).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, _SEL_SEMESTRE))
+        )
+        
+        # Obtener nombres de semestres
+        semestres_text = [s.text.strip() for s in driver.find_elements(By.CSS_SELECTOR, _SEL_SEMESTRE)]
+        
+        links: Dict[str, List[str]] = {}
+        
+        # Recorrer por nombre (no por referencia directa al elemento)
+        for nombre in semestres_text:
+            previous_result = _result_html(driver)
+
+            # Buscar el semestre actual por texto con una sola consulta XPath
+            semestres_actuales = driver.find_elements(
+                By.XPATH, _XPATH_SEM_BY_NAME.format(lit=_xpath_literal(nombre))
+            )
+            if not semestres_actuales:
+                print(f"⚠️  No se encontró el semestre {nombre}.")
+                continue
+            semestres_actuales[0].click()
+
+            # Esperar a que #result cambie y muestre los PDFs del semestre en lugar de una pausa fija
+            try:
+                WebDriverWait(driver, settings.BROWSER_TIMEOUT).until(
+                    lambda d: _result_html(d) != previous_result
+                    and d.find_elements(By.CSS_SELECTOR, _SEL_RESULT_PDFS)
+                )
+            except TimeoutException:
+                print(f"⚠️  No aparecieron PDFs de {nombre} tras {settings.BROWSER_TIMEOUT} segundos.")
+
+            # Obtener enlaces PDF con una sola llamada al navegador
+            links[nombre] = extract_hrefs(driver, _SEL_RESULT_PDFS)
+    except Exception:
+        # El driver puede haber quedado en un estado inválido; cerrarlo para que el siguiente uso cree otro
+        shutdown_driver()
+        raise
+
+    return links
+
+
+def extract_hrefs(driver: webdriver.Chrome, css: str) -> List[str]:
+    """
+    Devuelve el href (URL absoluta) de los elementos que coinciden con un selector CSS,
+    seleccionándolos dentro del navegador: solo la lista de URLs cruza el protocolo de
+    WebDriver, en lugar de una llamada a get_attribute por elemento.
+
+    Args:
+        driver (webdriver.Chrome): Driver con la página cargada
+        css (str): Selector CSS de los enlaces
+
+    Returns:
+        List[str]: URLs de los enlaces en el orden del documento
+    """
+    return driver.execute_script(
+        "return Array.from(document.querySelectorAll(arguments[0]), a => a.href);", css
+    ) or []
+
+
+def _xpath_literal(text: str) -> str:
+    """
+    Escribe un texto como literal de XPath 1.0, que no admite escapes: si contiene ambos
+    tipos de comillas se arma con concat().
+
+    Args:
+        text (str): Texto a escribir
+
+    Returns:
+        str: Literal XPath equivalente
+    """
+    if "'" not in text:
+        return f"'{text}'"
+    if '"' not in text:
+        return f'"{text}"'
+    return "concat(" + ", \"'\", ".join(f"'{part}'" for part in text.split("'")) + ")"
+
+
+def _result_html(driver: webdriver.Chrome) -> Optional[str]:
+    """
+    Devuelve el HTML del contenedor #result de la página de temarios.
+
+    Args:
+        driver (webdriver.Chrome): Selenium WebDriver instance
+
+    Returns:
+        Optional[str]: HTML de #result, o None si todavía no existe
+    """
+    elements = driver.find_elements(By.ID, "result")
+    return elements[0].get_attribute("innerHTML") if elements else None
+
+
+def _download_one_sync(session: requests.Session, url: str, destino: str) -> Optional[Dict[str, str]]:
+    """
+    Descarga un archivo con una sesión compartida, escribiéndolo a disco sin cargarlo completo en memoria.
+
+    Args:
+        session (requests.Session): Sesión HTTP compartida entre descargas
+        url (str): URL del archivo
+        destino (str): Ruta donde guardar el archivo
+
+    Returns:
+        Optional[Dict[str, str]]: Información del archivo descargado, o None si falló
+    """
+    # Archivo temporal que solo se renombra a 'destino' si la descarga termina (ver async_downloader)
+    temporal = destino + ".part"
+    try:
+        with session.get(url, stream=True, timeout=(settings.BROWSER_TIMEOUT, 60)) as r:
+            r.raise_for_status()
+            r.raw.decode_content = True
+            with open(temporal, "wb") as f:
+                content_length = r.headers.get("Content-Length")
+                preallocate_file(f, int(content_length) if content_length and content_length.isdigit() else None)
+                # Bloques de 1 MiB: memoria acotada y pocas llamadas a write
+                shutil.copyfileobj(r.raw, f, length=1 << 20)
+                f.truncate()
+        os.replace(temporal, destino)
+        print(f"    ✅ Guardado: {destino}")
+        return {
+            "filename": os.path.basename(destino),
+            "path": destino,
+            "url": url
+        }
+    except Exception as e:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        print(f"    ❌ Error al descargar {os.path.basename(destino)}: {e}")
+        return None
+
+
 def download_pdfs_by_semester(save_dir: str = None) -> dict:
     """
     Descarga los PDFs de temarios organizados por semestres
@@ -142,68 +441,63 @@ def download_pdfs_by_semester(save_dir: str = None) -> dict:
     if save_dir is None:
         save_dir = settings.PDF_DIR
     
-    # Inicializar el driver y acceder a la URL
-    driver = get_driver()
-    driver.get(settings.BASE_URL)
-    driver.implicitly_wait(settings.BROWSER_TIMEOUT)
-    
-    # Obtener nombres de semestres
-    semestres_text = [s.text.strip() for s in driver.find_elements(By.CSS_SELECTOR, "a.semestre")]
+    # Intentar primero sin navegador; Selenium solo se usa si la página requiere JavaScript
+    try:
+        links_by_semester = enumerate_pdf_links_static()
+    except Exception as e:
+        print(f"⚠️  No se pudo leer la página sin navegador: {e}")
+        links_by_semester = {}
+
+    if not any(links_by_semester.values()):
+        print("Usando Selenium para enumerar los PDFs...")
+        links_by_semester = enumerate_pdf_links_selenium()
     
     # Estructura para almacenar la información de archivos descargados
     downloaded_files = {}
+    # Descargas pendientes (semestre, url, destino)
+    pending_downloads = []
+    join = os.path.join
     
-    # Recorrer por nombre (no por referencia directa al elemento)
-    for nombre in semestres_text:
+    for nombre, urls in links_by_semester.items():
         print(f"\n📘 Semestre: {nombre}")
         downloaded_files[nombre] = []
 
-        # Volver a cargar la página para que el DOM esté fresco
-        driver.get(settings.BASE_URL)
-        driver.implicitly_wait(settings.BROWSER_TIMEOUT)
-
-        # Buscar el semestre actual por texto
-        semestres_actuales = driver.find_elements(By.CSS_SELECTOR, "a.semestre")
-        for s in semestres_actuales:
-            if s.text.strip() == nombre:
-                s.click()
-                break
-
-        time.sleep(2)  # Esperar que cargue
-
-        # Obtener enlaces PDF
-        enlaces_pdf = driver.find_elements(By.CSS_SELECTOR, "#result a[href$='.pdf']")
-        if not enlaces_pdf:
+        if not urls:
             print("⚠️  No se encontraron PDFs.")
             continue
 
         # Carpeta para este semestre
-        semestre_path = os.path.join(save_dir, nombre)
+        semestre_path = join(save_dir, nombre)
         os.makedirs(semestre_path, exist_ok=True)
 
-        # Descargar PDFs
-        for enlace in enlaces_pdf:
-            url = enlace.get_attribute("href")
-            nombre_pdf = url.split("/")[-1]
-            destino = os.path.join(semestre_path, nombre_pdf)
+        for url in urls:
+            nombre_pdf = url.rsplit("/", 1)[-1]
+            destino = join(semestre_path, nombre_pdf)
             print(f"  📥 {nombre_pdf}")
-            try:
-                r = requests.get(url)
-                with open(destino, "wb") as f:
-                    f.write(r.content)
-                print(f"    ✅ Guardado: {destino}")
-                
-                # Guardar información del archivo descargado
-                downloaded_files[nombre].append({
-                    "filename": nombre_pdf,
-                    "path": destino,
-                    "url": url
-                })
-            except Exception as e:
-                print(f"    ❌ Error al descargar: {e}")
+            pending_downloads.append((nombre, url, destino))
+
+    # Descargar PDFs de forma concurrente con una sola sesión HTTP
+    if AIOHTTP_AVAILABLE:
+        print(f"\n⏬ Descargando {len(pending_downloads)} PDFs...")
+        results = asyncio.run(download_many([(url, destino) for _, url, destino in pending_downloads]))
+        for (nombre, _, _), file_info in zip(pending_downloads, results):
+            if file_info is not None:
+                downloaded_files[nombre].append(file_info)
+    elif pending_downloads:
+        # Sin aiohttp, las descargas se reparten entre hilos que comparten una sola sesión HTTP,
+        # de modo que se reutilizan las conexiones TCP/TLS con el servidor
+        print(f"\n⏬ Descargando {len(pending_downloads)} PDFs...")
+        with create_session() as session, ThreadPoolExecutor(max_workers=settings.DOWNLOAD_CONCURRENCY) as executor:
+            futures = {
+                executor.submit(_download_one_sync, session, url, destino): nombre
+                for nombre, url, destino in pending_downloads
+            }
+            # Solo este hilo modifica downloaded_files
+            for future in as_completed(futures):
+                file_info = future.result()
+                if file_info is not None:
+                    downloaded_files[futures[future]].append(file_info)
 
-    # Cerrar navegador
-    driver.quit()
     print("\n✅ Todos los semestres descargados.")
     
-    return downloaded_files 
\ No newline at end of file
+    return downloaded_files
\ No newline at end of file
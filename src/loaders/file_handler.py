@@ -4,11 +4,61 @@ Módulo para manejo de archivos y persistencia de datos
 import os
 import json
 import pickle
-from typing import Dict, List, Any, Optional, Union
+import threading
+from typing import Dict, Iterable, List, Any, Optional, Tuple, Union
+import numpy as np
 import pandas as pd
 
 from config import settings
 
+# pyarrow es opcional: sin él se mantiene el formato pickle como respaldo
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from pyarrow import feather
+except ImportError:
+    pa = None
+    pq = None
+    feather = None
+
+# orjson es opcional: sin él se usa el módulo json de la biblioteca estándar
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ARROW_AVAILABLE = pa is not None
+
+FEATHER_EXTENSIONS = ('.feather', '.arrow')
+
+# Directorios ya creados en este proceso, para no repetir os.makedirs en cada guardado
+_ensured_dirs = set()
+_ensured_dirs_lock = threading.Lock()
+
+
+def _ensure_dir(directory: str) -> None:
+    """
+    Crea un directorio (y sus padres) la primera vez que se pide en este proceso.
+    
+    Args:
+        directory (str): Directorio a crear si no existe
+    """
+    if directory in _ensured_dirs:
+        return
+    os.makedirs(directory, exist_ok=True)
+    with _ensured_dirs_lock:
+        _ensured_dirs.add(directory)
+
+
+def _json_default(obj: Any) -> Any:
+    """
+    Convierte a tipos JSON los objetos de NumPy que el codificador no serializa por sí mismo
+    (todos con json estándar; con orjson, los dtypes que OPT_SERIALIZE_NUMPY no admite, p. ej. float16).
+    """
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    raise TypeError(f"Tipo no serializable a JSON: {type(obj).__name__}")
+
 
 def save_dataframe_to_pickle(df: pd.DataFrame, filename: str, directory: Optional[str] = None) -> str:
     """
@@ -26,7 +76,7 @@ def save_dataframe_to_pickle(df: pd.DataFrame, filename: str, directory: Optiona
         directory = settings.PICKLES_DIR
     
     # Crear directorio si no existe
-    os.makedirs(directory, exist_ok=True)
+    _ensure_dir(directory)
     
     # Asegurar que el nombre del archivo tiene extensión .pkl
     if not filename.lower().endswith('.pkl'):
@@ -63,6 +113,301 @@ def load_dataframe_from_pickle(filepath: str) -> pd.DataFrame:
         raise
 
 
+def _embeddings_to_arrow(values: pd.Series) -> "pa.Array":
+    """
+    Convierte una columna de embeddings (listas o arrays por fila) en un arreglo
+    Arrow de float32, para que pueda leerse con memory mapping sin pasar por el
+    pickle de cada np.ndarray. Si todos los vectores tienen la misma dimensión se usa
+    fixed_size_list<float32>[D], que guarda un único buffer contiguo sin offsets.
+    
+    Args:
+        values (pd.Series): Columna con un vector (o None) por fila
+        
+    Returns:
+        pa.Array: Arreglo Arrow con los embeddings en float32
+    """
+    vectors = list(values)
+    dims = {len(v) for v in vectors if v is not None}
+    if len(dims) != 1:
+        return pa.array(
+            [None if v is None else list(v) for v in vectors],
+            type=pa.list_(pa.float32())
+        )
+    
+    dim = dims.pop()
+    if all(v is not None for v in vectors):
+        flat = np.asarray(vectors, dtype=np.float32).reshape(-1)
+        return pa.FixedSizeListArray.from_arrays(pa.array(flat), dim)
+    return pa.array(
+        [None if v is None else list(v) for v in vectors],
+        type=pa.list_(pa.float32(), dim)
+    )
+
+
+def _dataframe_to_arrow_table(df: pd.DataFrame) -> "pa.Table":
+    """
+    Convierte un DataFrame a una tabla Arrow guardando la columna 'embeddings' (si existe)
+    como vectores float32 en lugar de listas de float64.
+    
+    Args:
+        df (pd.DataFrame): DataFrame a convertir
+        
+    Returns:
+        pa.Table: Tabla Arrow equivalente
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if 'embeddings' in table.column_names:
+        position = table.column_names.index('embeddings')
+        table = table.set_column(position, 'embeddings', _embeddings_to_arrow(df['embeddings']))
+    return table
+
+
+def save_dataframe_to_feather(df: pd.DataFrame, filename: str, directory: Optional[str] = None) -> str:
+    """
+    Guarda un DataFrame en formato Arrow IPC (Feather v2) comprimido con zstd
+    
+    Args:
+        df (pd.DataFrame): DataFrame a guardar
+        filename (str): Nombre del archivo (sin extensión)
+        directory (Optional[str]): Directorio donde guardar, si es None se usa settings.PICKLES_DIR
+        
+    Returns:
+        str: Ruta completa al archivo guardado
+    """
+    if not ARROW_AVAILABLE:
+        raise ImportError("pyarrow no está instalado. Instálalo con: pip install pyarrow")
+    
+    if directory is None:
+        directory = settings.PICKLES_DIR
+    
+    # Crear directorio si no existe
+    _ensure_dir(directory)
+    
+    # Asegurar que el nombre del archivo tiene extensión .feather
+    if not filename.lower().endswith(FEATHER_EXTENSIONS):
+        filename += '.feather'
+        
+    # Ruta completa al archivo
+    full_path = os.path.join(directory, filename)
+    
+    try:
+        table = _dataframe_to_arrow_table(df)
+        feather.write_feather(table, full_path, compression="zstd", compression_level=3)
+        print(f"DataFrame guardado exitosamente en {full_path}")
+        return full_path
+    except Exception as e:
+        print(f"Error al guardar DataFrame como Feather: {e}")
+        raise
+
+
+def load_dataframe_from_feather(filepath: str) -> pd.DataFrame:
+    """
+    Carga un DataFrame desde un archivo Arrow IPC (Feather) usando memory mapping
+    
+    Args:
+        filepath (str): Ruta completa al archivo Feather
+        
+    Returns:
+        pd.DataFrame: DataFrame cargado desde el archivo
+    """
+    if not ARROW_AVAILABLE:
+        raise ImportError("pyarrow no está instalado. Instálalo con: pip install pyarrow")
+    
+    try:
+        table = feather.read_table(filepath, memory_map=True)
+        df = table.to_pandas(zero_copy_only=False, self_destruct=True)
+        print(f"DataFrame cargado exitosamente desde {filepath}")
+        return df
+    except Exception as e:
+        print(f"Error al cargar DataFrame desde Feather {filepath}: {e}")
+        raise
+
+
+def save_dataframe_to_parquet(df: pd.DataFrame, filename: str, directory: Optional[str] = None) -> str:
+    """
+    Guarda un DataFrame en formato Parquet comprimido con zstd. La columna 'embeddings'
+    se guarda como fixed_size_list<float32> (ver _embeddings_to_arrow).
+    
+    Args:
+        df (pd.DataFrame): DataFrame a guardar
+        filename (str): Nombre del archivo (sin extensión)
+        directory (Optional[str]): Directorio donde guardar, si es None se usa settings.PICKLES_DIR
+        
+    Returns:
+        str: Ruta completa al archivo guardado
+    """
+    if not ARROW_AVAILABLE:
+        raise ImportError("pyarrow no está instalado. Instálalo con: pip install pyarrow")
+    
+    if directory is None:
+        directory = settings.PICKLES_DIR
+    
+    # Crear directorio si no existe
+    _ensure_dir(directory)
+    
+    # Asegurar que el nombre del archivo tiene extensión .parquet
+    if not filename.lower().endswith('.parquet'):
+        filename += '.parquet'
+        
+    # Ruta completa al archivo
+    full_path = os.path.join(directory, filename)
+    
+    try:
+        pq.write_table(
+            _dataframe_to_arrow_table(df),
+            full_path,
+            compression="zstd",
+            compression_level=3,
+            row_group_size=10000
+        )
+        print(f"DataFrame guardado exitosamente en {full_path}")
+        return full_path
+    except Exception as e:
+        print(f"Error al guardar DataFrame como Parquet: {e}")
+        raise
+
+
+def load_dataframe_from_parquet(filepath: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Carga un DataFrame desde un archivo Parquet
+    
+    Args:
+        filepath (str): Ruta completa al archivo Parquet
+        columns (Optional[List[str]]): Columnas a leer; si es None se leen todas.
+                                       Al ser un formato columnar, las demás no se leen del disco.
+        
+    Returns:
+        pd.DataFrame: DataFrame cargado desde el archivo
+    """
+    try:
+        df = pd.read_parquet(filepath, engine="pyarrow", columns=columns)
+        print(f"DataFrame cargado exitosamente desde {filepath}")
+        return df
+    except Exception as e:
+        print(f"Error al cargar DataFrame desde Parquet {filepath}: {e}")
+        raise
+
+
+def get_parquet_columns(filepath: str) -> List[str]:
+    """
+    Obtiene los nombres de columna de un archivo Parquet leyendo solo su esquema
+    
+    Args:
+        filepath (str): Ruta completa al archivo Parquet
+        
+    Returns:
+        List[str]: Nombres de las columnas
+    """
+    return pq.read_schema(filepath).names
+
+
+def get_parquet_num_rows(filepath: str) -> int:
+    """
+    Obtiene el número de filas de un archivo Parquet leyendo solo sus metadatos
+    
+    Args:
+        filepath (str): Ruta completa al archivo Parquet
+        
+    Returns:
+        int: Número de filas
+    """
+    return pq.ParquetFile(filepath).metadata.num_rows
+
+
+def newest_mtime(directory: str, extension: str) -> Optional[float]:
+    """
+    Obtiene la fecha de modificación más reciente de los archivos con una extensión
+    dentro de un directorio (incluyendo subdirectorios)
+    
+    Args:
+        directory (str): Directorio a recorrer
+        extension (str): Extensión de los archivos a considerar (ej. '.pdf')
+        
+    Returns:
+        Optional[float]: mtime más reciente, o None si no hay archivos con esa extensión
+    """
+    newest = None
+    for root, _, files in os.walk(directory):
+        for f in files:
+            if f.lower().endswith(extension):
+                mtime = os.path.getmtime(os.path.join(root, f))
+                if newest is None or mtime > newest:
+                    newest = mtime
+    return newest
+
+
+def outputs_up_to_date(output_paths: List[str], source_mtime: Optional[float]) -> bool:
+    """
+    Indica si todos los archivos de salida existen y no son más antiguos que sus
+    entradas, al estilo de Make
+    
+    Args:
+        output_paths (List[str]): Rutas de los archivos de salida
+        source_mtime (Optional[float]): mtime más reciente de las entradas
+        
+    Returns:
+        bool: True si no hace falta regenerar las salidas
+    """
+    if source_mtime is None or not output_paths:
+        return False
+    try:
+        return all(os.path.getmtime(path) >= source_mtime for path in output_paths)
+    except OSError:
+        return False
+
+
+def save_embeddings_to_npy(matrix: np.ndarray, filename: str, directory: Optional[str] = None) -> str:
+    """
+    Guarda una matriz de embeddings (N, D) float32 en formato .npy
+    
+    Args:
+        matrix (np.ndarray): Matriz de embeddings, una fila por registro
+        filename (str): Nombre del archivo (sin extensión)
+        directory (Optional[str]): Directorio donde guardar, si es None se usa settings.PICKLES_DIR
+        
+    Returns:
+        str: Ruta completa al archivo guardado
+    """
+    if directory is None:
+        directory = settings.PICKLES_DIR
+    
+    # Crear directorio si no existe
+    _ensure_dir(directory)
+    
+    # Asegurar que el nombre del archivo tiene extensión .npy
+    if not filename.lower().endswith('.npy'):
+        filename += '.npy'
+        
+    # Ruta completa al archivo
+    full_path = os.path.join(directory, filename)
+    
+    try:
+        np.save(full_path, np.ascontiguousarray(matrix, dtype=np.float32))
+        print(f"Embeddings guardados exitosamente en {full_path}")
+        return full_path
+    except Exception as e:
+        print(f"Error al guardar embeddings como .npy: {e}")
+        raise
+
+
+def load_embeddings_from_npy(filepath: str, mmap: bool = True) -> np.ndarray:
+    """
+    Carga una matriz de embeddings desde un archivo .npy
+    
+    Args:
+        filepath (str): Ruta completa al archivo .npy
+        mmap (bool): Si es True, mapea el archivo en memoria (solo lectura) en lugar de copiarlo
+        
+    Returns:
+        np.ndarray: Matriz de embeddings (N, D)
+    """
+    try:
+        return np.load(filepath, mmap_mode="r" if mmap else None)
+    except Exception as e:
+        print(f"Error al cargar embeddings desde {filepath}: {e}")
+        raise
+
+
 def save_to_json(data: Union[Dict, List], filename: str, directory: Optional[str] = None) -> str:
     """
     Guarda datos en formato JSON
@@ -79,7 +424,7 @@ def save_to_json(data: Union[Dict, List], filename: str, directory: Optional[str
         directory = settings.OUTPUT_DIR
     
     # Crear directorio si no existe
-    os.makedirs(directory, exist_ok=True)
+    _ensure_dir(directory)
     
     # Asegurar que el nombre del archivo tiene extensión .json
     if not filename.lower().endswith('.json'):
@@ -89,8 +434,13 @@ def save_to_json(data: Union[Dict, List], filename: str, directory: Optional[str
     full_path = os.path.join(directory, filename)
     
     try:
-        with open(full_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        if orjson is not None:
+            options = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+            with open(full_path, 'wb') as f:
+                f.write(orjson.dumps(data, option=options, default=_json_default))
+        else:
+            with open(full_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2, default=_json_default)
         print(f"Datos guardados exitosamente en {full_path}")
         return full_path
     except Exception as e:
@@ -109,8 +459,12 @@ def load_from_json(filepath: str) -> Union[Dict, List]:
         Union[Dict, List]: Datos cargados desde el archivo
     """
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        if orjson is not None:
+            with open(filepath, 'rb') as f:
+                data = orjson.loads(f.read())
+        else:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
         print(f"Datos cargados exitosamente desde {filepath}")
         return data
     except Exception as e:
@@ -135,7 +489,7 @@ def save_dataframe_to_csv(df: pd.DataFrame, filename: str, directory: Optional[s
         directory = settings.OUTPUT_DIR
     
     # Crear directorio si no existe
-    os.makedirs(directory, exist_ok=True)
+    _ensure_dir(directory)
     
     # Asegurar que el nombre del archivo tiene extensión .csv
     if not filename.lower().endswith('.csv'):
@@ -192,35 +546,209 @@ def load_dataframe_from_csv(filepath: str, **kwargs) -> pd.DataFrame:
         raise
 
 
-def save_extracted_data(data: List[Dict[str, Any]], base_filename: str = "resultados_extraccion") -> Dict[str, str]:
+def _extraction_schema() -> "pa.Schema":
+    """
+    Esquema Arrow explícito de los registros extraídos, para que todos los lotes
+    escritos en streaming compartan los mismos tipos.
+    
+    Returns:
+        pa.Schema: Esquema con un campo por cada campo de settings.SYLLABUS_FIELDS
+    """
+    fields = []
+    for name in settings.SYLLABUS_FIELDS:
+        if name in settings.SYLLABUS_NUMERIC_FIELDS:
+            fields.append(pa.field(name, pa.int64()))
+        elif name in settings.SYLLABUS_LIST_FIELDS:
+            fields.append(pa.field(name, pa.list_(pa.string())))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+def _normalize_record_for_arrow(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Ajusta un registro al esquema de _extraction_schema: los campos de texto que el
+    modelo devolvió con otro tipo (listas, diccionarios, números) se guardan como texto.
+    
+    Args:
+        record (Dict[str, Any]): Registro extraído
+        
+    Returns:
+        Dict[str, Any]: Registro con los campos de texto convertidos a str
+    """
+    normalized = {}
+    for name in settings.SYLLABUS_FIELDS:
+        value = record.get(name)
+        if (value is not None and not isinstance(value, str)
+                and name not in settings.SYLLABUS_NUMERIC_FIELDS
+                and name not in settings.SYLLABUS_LIST_FIELDS):
+            value = json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else str(value)
+        normalized[name] = value
+    return normalized
+
+
+def save_extracted_data_stream(
+    records: Iterable[Dict[str, Any]],
+    base_filename: str = "resultados_extraccion",
+    batch_size: Optional[int] = None
+) -> Tuple[Dict[str, str], int]:
+    """
+    Guarda los registros extraídos en JSON, CSV y Parquet a medida que llegan, por lotes,
+    de modo que la memoria usada depende del tamaño del lote y no del total de registros.
+    Si pyarrow no está disponible, los registros se acumulan y se guardan en Pickle al final.
+    
+    Args:
+        records (Iterable[Dict[str, Any]]): Registros extraídos (p. ej. un generador)
+        base_filename (str): Nombre base para los archivos (sin extensión)
+        batch_size (Optional[int]): Registros por lote, si es None se usa settings.EXTRACTION_BATCH_SIZE
+        
+    Returns:
+        Tuple[Dict[str, str], int]: Rutas a los archivos guardados por formato y número de registros
+    """
+    if batch_size is None:
+        batch_size = settings.EXTRACTION_BATCH_SIZE
+    
+    _ensure_dir(settings.OUTPUT_DIR)
+    _ensure_dir(settings.PICKLES_DIR)
+    json_path = os.path.join(settings.OUTPUT_DIR, f"{base_filename}.json")
+    csv_path = os.path.join(settings.OUTPUT_DIR, f"{base_filename}.csv")
+    parquet_path = os.path.join(settings.PICKLES_DIR, f"{base_filename}.parquet")
+    
+    schema = _extraction_schema() if ARROW_AVAILABLE else None
+    writer = None
+    pending_for_pickle: List[Dict[str, Any]] = []
+    total = 0
+    # Columnas del CSV, fijadas con el primer lote: cada lote se escribe en este orden aunque
+    # sus registros tengan las claves en otro (p. ej. los registros de error de lectura)
+    csv_columns: List[str] = []
+    
+    def flush(batch: List[Dict[str, Any]], first: bool) -> None:
+        nonlocal writer
+        if first:
+            csv_columns[:] = list(settings.SYLLABUS_FIELDS)
+            for record in batch:
+                csv_columns.extend(key for key in record if key not in csv_columns)
+        pd.DataFrame(batch, columns=csv_columns).to_csv(
+            csv_path, mode='w' if first else 'a', header=first, index=False, encoding='utf-8'
+        )
+        if schema is not None:
+            if writer is None:
+                writer = pq.ParquetWriter(parquet_path, schema, compression="zstd", compression_level=3)
+            table = pa.Table.from_pylist([_normalize_record_for_arrow(r) for r in batch], schema=schema)
+            writer.write_table(table)
+        else:
+            pending_for_pickle.extend(batch)
+    
+    try:
+        with open(json_path, 'wb') as json_file:
+            json_file.write(b"[")
+            batch: List[Dict[str, Any]] = []
+            for record in records:
+                # Mismo formato que save_to_json (indentación de 2 espacios dentro de la lista)
+                if orjson is not None:
+                    encoded = orjson.dumps(
+                        record,
+                        option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+                        default=_json_default
+                    )
+                else:
+                    encoded = json.dumps(record, ensure_ascii=False, indent=2, default=_json_default).encode('utf-8')
+                json_file.write(b",\n  " if total else b"\n  ")
+                json_file.write(encoded.replace(b"\n", b"\n  "))
+                total += 1
+                
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    flush(batch, first=total == len(batch))
+                    batch = []
+            if batch:
+                flush(batch, first=total == len(batch))
+            json_file.write(b"\n]" if total else b"]")
+    except Exception as e:
+        print(f"Error al guardar datos extraídos: {e}")
+        raise
+    finally:
+        if writer is not None:
+            writer.close()
+    
+    saved_paths = {'json': json_path}
+    if total:
+        saved_paths['csv'] = csv_path
+        if writer is not None:
+            saved_paths['parquet'] = parquet_path
+        else:
+            saved_paths['pickle'] = save_dataframe_to_pickle(pd.DataFrame(pending_for_pickle), base_filename)
+    
+    print(f"\n--- Guardando Resultados ({total} registros) ---")
+    for fmt, path in saved_paths.items():
+        print(f"Resultados guardados en {path}")
+    
+    return saved_paths, total
+
+
+def get_binary_output(saved_files: Dict[str, str]) -> Optional[str]:
+    """
+    Devuelve la ruta del archivo binario (Parquet o, como respaldo, Pickle)
+    entre los archivos generados por save_extracted_data
+    
+    Args:
+        saved_files (Dict[str, str]): Rutas de los archivos guardados por formato
+        
+    Returns:
+        Optional[str]: Ruta al archivo Parquet o Pickle, o None si no existe ninguno
+    """
+    return saved_files.get('parquet') or saved_files.get('pickle')
+
+
+def save_extracted_data(
+    data: List[Dict[str, Any]],
+    base_filename: str = "resultados_extraccion",
+    formats: Iterable[str] = ('json', 'csv', 'parquet')
+) -> Dict[str, str]:
     """
-    Guarda los datos extraídos en varios formatos (JSON, CSV y Pickle)
+    Guarda los datos extraídos en varios formatos (JSON, CSV y Parquet).
+    Parquet es el formato binario canónico; se usa Pickle solo si pyarrow no está
+    disponible o si los datos contienen objetos que Parquet no puede representar.
+    El DataFrame solo se construye si se pide CSV o un formato binario.
     
     Args:
         data (List[Dict[str, Any]]): Datos extraídos a guardar
         base_filename (str): Nombre base para los archivos (sin extensión)
+        formats (Iterable[str]): Formatos a generar: 'json', 'csv', 'parquet' y/o 'pickle'
+                                 ('pickle' fuerza Pickle como formato binario)
         
     Returns:
         Dict[str, str]: Diccionario con las rutas a los archivos guardados por formato
     """
+    formats = set(formats)
     try:
-        # Convertir a DataFrame
-        df = pd.DataFrame(data)
-        
         # Resultados de las operaciones de guardado
         saved_paths = {}
         
-        # Guardar como JSON
-        json_path = save_to_json(data, base_filename)
-        saved_paths['json'] = json_path
+        # Convertir a DataFrame solo si algún formato lo necesita
+        df = pd.DataFrame(data) if formats & {'csv', 'parquet', 'pickle'} else None
+        
+        # Guardar como JSON desde los registros originales: en el DataFrame los enteros con
+        # valores nulos pasan a float64 y se escribirían como 8.0 en lugar de 8
+        if 'json' in formats:
+            saved_paths['json'] = save_to_json(data, base_filename)
         
         # Guardar como CSV
-        csv_path = save_dataframe_to_csv(df, base_filename)
-        saved_paths['csv'] = csv_path
+        if df is not None and 'csv' in formats:
+            saved_paths['csv'] = save_dataframe_to_csv(df, base_filename)
+        
+        # Guardar como Parquet, con Pickle como respaldo
+        parquet_path = None
+        if df is not None and 'parquet' in formats and ARROW_AVAILABLE:
+            try:
+                parquet_path = save_dataframe_to_parquet(df, base_filename)
+                saved_paths['parquet'] = parquet_path
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+                print(f"Los datos no son representables en Parquet ({e}). Se usará Pickle.")
         
-        # Guardar como Pickle
-        pickle_path = save_dataframe_to_pickle(df, base_filename)
-        saved_paths['pickle'] = pickle_path
+        if df is not None and parquet_path is None and formats & {'parquet', 'pickle'}:
+            pickle_path = save_dataframe_to_pickle(df, base_filename)
+            saved_paths['pickle'] = pickle_path
         
         print(f"\n--- Guardando Resultados ({len(data)} registros) ---")
         for fmt, path in saved_paths.items():
@@ -0,0 +1,159 @@
+"""
+Caché persistente de embeddings direccionada por contenido.
+
+Cada embedding se almacena bajo el hash del texto y del modelo que lo generó,
+de modo que al volver a ejecutar el ETL solo se envían a la API los textos
+que cambiaron.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# blake3 es opcional; si no está instalado se usa blake2b de la biblioteca estándar
+try:
+    from blake3 import blake3 as _hash_function
+except ImportError:
+    _hash_function = hashlib.blake2b
+
+
+class EmbedCache:
+    """
+    Almacén clave-valor en SQLite para vectores de embeddings.
+
+    La clave es el hash de (namespace, texto), donde el namespace identifica el modelo
+    y sus parámetros. Los vectores se guardan como bytes float32.
+    """
+
+    def __init__(self, path: str, ttl_seconds: Optional[int] = None):
+        """
+        Args:
+            path (str): Ruta al archivo SQLite de la caché
+            ttl_seconds (Optional[int]): Antigüedad máxima de una entrada; None para no expirar
+        """
+        directory = os.path.dirname(str(path))
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = str(path)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key BLOB PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(text: str, namespace: str) -> bytes:
+        """
+        Calcula la clave de caché para un texto dentro de un namespace (modelo).
+
+        Args:
+            text (str): Texto embebido
+            namespace (str): Identificador del modelo y parámetros usados
+
+        Returns:
+            bytes: Digest que identifica al par (namespace, texto)
+        """
+        return _hash_function((namespace + "\x00" + text).encode("utf-8")).digest()
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        """
+        Recupera los vectores almacenados para las claves dadas.
+
+        Args:
+            keys (Sequence[bytes]): Claves a buscar
+
+        Returns:
+            Dict[bytes, np.ndarray]: Vectores encontrados (las claves ausentes o expiradas se omiten)
+        """
+        found: Dict[bytes, np.ndarray] = {}
+        min_created = time.time() - self.ttl_seconds if self.ttl_seconds else 0
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            # SQLite limita el número de parámetros por consulta
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders}) AND created_at >= ?",
+                    (*chunk, min_created)
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32)
+        return found
+
+    def put_many(self, items: Dict[bytes, Sequence[float]]) -> None:
+        """
+        Guarda (o reemplaza) vectores en la caché.
+
+        Args:
+            items (Dict[bytes, Sequence[float]]): Vectores por clave
+        """
+        now = time.time()
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for key, vector in items.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def get_or_compute_many(
+        self,
+        texts: Sequence[str],
+        namespace: str,
+        compute_fn: Callable[[List[str]], List[Optional[Sequence[float]]]]
+    ) -> List[Optional[List[float]]]:
+        """
+        Devuelve los embeddings de 'texts', calculando con 'compute_fn' solo los que no
+        están en caché. Los textos repetidos se calculan una sola vez.
+
+        Args:
+            texts (Sequence[str]): Textos a embeber
+            namespace (str): Identificador del modelo y parámetros usados
+            compute_fn (Callable): Función que recibe la lista de textos faltantes y devuelve
+                                   sus embeddings (None para los que fallaron), en el mismo orden
+
+        Returns:
+            List[Optional[List[float]]]: Un embedding (o None) por texto, en el orden de entrada
+        """
+        keys = [self.make_key(text, namespace) for text in texts]
+        cached = self.get_many(keys)
+
+        missing: Dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        if missing:
+            print(f"Caché de embeddings: {len(missing)} de {len(texts)} textos requieren llamada a la API.")
+            computed = compute_fn(list(missing.values()))
+            new_items = {
+                key: vector for key, vector in zip(missing.keys(), computed) if vector is not None
+            }
+            if new_items:
+                self.put_many(new_items)
+            cached.update({key: np.asarray(vector, dtype=np.float32) for key, vector in new_items.items()})
+        else:
+            print(f"Caché de embeddings: los {len(texts)} textos estaban en caché.")
+
+        return [cached[key].tolist() if key in cached else None for key in keys]
+
+    def close(self) -> None:
+        """Cierra la conexión a la base de datos de la caché."""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "EmbedCache":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
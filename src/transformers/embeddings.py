@@ -1,17 +1,39 @@
 """
 Módulo para la generación de embeddings utilizando modelos de Google Generative AI
 """
+import functools
+import hashlib
 import os
-from typing import List, Dict, Any, Optional, Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable, Sequence, Literal, Tuple
+import numpy as np
 import pandas as pd
 import google.generativeai as genai
 
 from config import settings
+from src.transformers.embed_cache import EmbedCache
 
 
 # Variables globales para seguimiento del estado de la API
 API_KEY_CONFIGURED = False
-EMBEDDING_MODEL_NAME_CACHE = None
+# Modelos cuya disponibilidad ya se verificó con la API key actual (evita repetir genai.get_model)
+_MODEL_AVAILABILITY: Dict[str, bool] = {}
+# Hash de la API key configurada; si cambia, se descarta _MODEL_AVAILABILITY
+_API_KEY_HASH: Optional[bytes] = None
+
+
+@functools.lru_cache(maxsize=1)
+def _configure_genai(api_key: str) -> None:
+    """
+    Configura el SDK de Google Generative AI con una API key. Se cachea por clave para
+    no reconfigurar el cliente en llamadas repetidas; si falla lanza la excepción,
+    por lo que los fallos no quedan en caché.
+
+    Args:
+        api_key (str): La API key para Google Generative AI.
+    """
+    genai.configure(api_key=api_key)
+    print("API de Google Generative AI configurada exitosamente.")
 
 
 def configure_gemini_api(api_key: Optional[str] = None) -> bool:
@@ -25,22 +47,26 @@ def configure_gemini_api(api_key: Optional[str] = None) -> bool:
     Returns:
         bool: True si la API fue configurada exitosamente o ya estaba configurada, False en caso contrario.
     """
-    global API_KEY_CONFIGURED
+    global API_KEY_CONFIGURED, _API_KEY_HASH
     
-    if API_KEY_CONFIGURED:
+    if API_KEY_CONFIGURED and not api_key:
         return True
 
     effective_api_key = api_key
     if not effective_api_key:
+        settings.load_env()
         effective_api_key = os.getenv("GEMINI_API_KEY")
         if not effective_api_key:
             print("Error: API Key no proporcionada y no se encontró en variables de entorno.")
             return False
 
     try:
-        genai.configure(api_key=effective_api_key)
+        _configure_genai(effective_api_key)
         API_KEY_CONFIGURED = True
-        print("API de Google Generative AI configurada exitosamente.")
+        key_hash = hashlib.sha256(effective_api_key.encode("utf-8")).digest()
+        if key_hash != _API_KEY_HASH:
+            _MODEL_AVAILABILITY.clear()
+            _API_KEY_HASH = key_hash
         return True
     except Exception as e:
         print(f"Error configurando la API de Google Generative AI: {e}")
@@ -50,7 +76,8 @@ def configure_gemini_api(api_key: Optional[str] = None) -> bool:
 
 def _is_model_available(model_name: str = None) -> bool:
     """
-    Verifica si el modelo de embeddings especificado está disponible.
+    Verifica si el modelo de embeddings especificado está disponible. Solo se consulta
+    la API la primera vez por modelo; los fallos no se guardan, ya que pueden ser transitorios.
     
     Args:
         model_name (str): Nombre del modelo a verificar
@@ -65,10 +92,12 @@ def _is_model_available(model_name: str = None) -> bool:
         print("No se puede verificar disponibilidad del modelo: API no configurada.")
         return False
         
+    if model_name in _MODEL_AVAILABILITY:
+        return _MODEL_AVAILABILITY[model_name]
+        
     try:
         genai.get_model(model_name)
-        global EMBEDDING_MODEL_NAME_CACHE
-        EMBEDDING_MODEL_NAME_CACHE = model_name
+        _MODEL_AVAILABILITY[model_name] = True
         return True
     except Exception as e:
         print(f"Error al acceder al modelo de embeddings '{model_name}': {e}")
@@ -92,26 +121,57 @@ def default_row_dict_to_string_formatter(row_dict: Dict[str, Any]) -> str:
     )
 
 
+def _format_column(values: pd.Series, prefix: str) -> List[Optional[str]]:
+    """
+    Formatea una columna como "prefijo + str(valor)" por fila (None si el valor es None),
+    igual que default_row_dict_to_string_formatter. En columnas enteras, booleanas o
+    categóricas cada valor distinto se convierte a texto una sola vez.
+
+    Args:
+        values (pd.Series): Columna a formatear
+        prefix (str): Prefijo "columna: " de cada valor
+
+    Returns:
+        List[Optional[str]]: Texto formateado por fila
+    """
+    if values.dtype.kind in "biu" or isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        labels = np.array([prefix + str(value) for value in uniques.tolist()], dtype=object)
+        return labels[codes].tolist()
+    return [None if value is None else prefix + str(value) for value in values.tolist()]
+
+
 def get_embeddings_batch(
     texts: List[str],
     model_name: str = None,
     task_type: str = "RETRIEVAL_DOCUMENT",
-    dimensionality: Optional[int] = None
+    dimensionality: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    max_workers: Optional[int] = None
 ) -> List[Optional[List[float]]]:
     """
     Genera embeddings para un lote de textos.
     
+    Los textos se dividen en sub-lotes de 'batch_size' (límite por solicitud de la API)
+    que se envían en paralelo; el resultado conserva el orden de entrada.
+    
     Args:
         texts (List[str]): Lista de textos para generar embeddings
         model_name (str): Nombre del modelo a utilizar
         task_type (str): Tipo de tarea para el modelo de embeddings
         dimensionality (Optional[int]): Dimensionalidad deseada para modelos compatibles
+        batch_size (Optional[int]): Textos por solicitud, si es None se usa settings.EMBEDDING_BATCH_SIZE
+        max_workers (Optional[int]): Solicitudes simultáneas, si es None se usa settings.EMBEDDING_MAX_WORKERS
         
     Returns:
         List[Optional[List[float]]]: Lista de embeddings generados
     """
     if model_name is None:
         model_name = settings.DEFAULT_EMBEDDING_MODEL
+    if batch_size is None:
+        batch_size = settings.EMBEDDING_BATCH_SIZE
+    if max_workers is None:
+        max_workers = settings.EMBEDDING_MAX_WORKERS
         
     if not API_KEY_CONFIGURED:
         print("Error: API de Google Generative AI no configurada para get_embeddings_batch.")
@@ -120,22 +180,99 @@ def get_embeddings_batch(
     if not texts:
         return []
         
-    try:
-        request_args = {
-            "model": model_name,
-            "content": texts,
-            "task_type": task_type
-        }
+    request_args = {
+        "model": model_name,
+        "task_type": task_type
+    }
+    
+    # Los modelos text-embedding-004 y más recientes soportan output_dimensionality
+    if dimensionality is not None and ("embedding-004" in model_name or "embedding-gecko" in model_name):
+        request_args["output_dimensionality"] = dimensionality
+
+    def embed_chunk(chunk: List[str]) -> List[Optional[List[float]]]:
+        try:
+            response = genai.embed_content(content=chunk, **request_args)
+            return response['embedding']
+        except Exception as e:
+            print(f"Error generando embeddings por lotes: {e}")
+            return [None] * len(chunk)
+
+    chunks = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    if len(chunks) == 1:
+        # Una sola solicitud: no hace falta crear un pool de hilos
+        return embed_chunk(chunks[0])
+    # Las llamadas a la API están limitadas por red, por lo que los hilos se solapan sin competir por el GIL
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        results = executor.map(embed_chunk, chunks)
+        return [embedding for chunk_result in results for embedding in chunk_result]
+
+
+def embeddings_to_matrix(embeddings: Sequence[Optional[Sequence[float]]]) -> Optional[np.ndarray]:
+    """
+    Apila una secuencia de embeddings (uno por fila) en una matriz contigua float32.
+    
+    Args:
+        embeddings (Sequence[Optional[Sequence[float]]]): Un vector o None por fila
         
-        # Los modelos text-embedding-004 y más recientes soportan output_dimensionality
-        if dimensionality is not None and ("embedding-004" in model_name or "embedding-gecko" in model_name):
-            request_args["output_dimensionality"] = dimensionality
+    Returns:
+        Optional[np.ndarray]: Matriz de forma (N, D); las filas sin embedding quedan en NaN.
+                              None si ninguna fila tiene embedding.
+    """
+    dimension = next((len(emb) for emb in embeddings if emb is not None), None)
+    if dimension is None:
+        return None
+    
+    matrix = np.full((len(embeddings), dimension), np.nan, dtype=np.float32)
+    for row, emb in enumerate(embeddings):
+        if emb is not None:
+            matrix[row] = emb
+    return matrix
 
-        response = genai.embed_content(**request_args)
-        return response['embedding']
-    except Exception as e:
-        print(f"Error generando embeddings por lotes: {e}")
-        return [None] * len(texts)
+
+def quantize_embeddings(
+    embeddings: Sequence[Optional[Sequence[float]]]
+) -> Tuple[List[Optional[np.ndarray]], List[Optional[float]]]:
+    """
+    Cuantiza embeddings a int8 con una escala por vector: v ≈ escala * q, con
+    escala = max|v| / 127 (cuantización simétrica, punto cero en 0).
+    
+    Args:
+        embeddings (Sequence[Optional[Sequence[float]]]): Un vector o None por fila
+        
+    Returns:
+        Tuple[List[Optional[np.ndarray]], List[Optional[float]]]: Vectores int8 y escalas por fila; None en las filas sin embedding
+    """
+    matrix = embeddings_to_matrix(embeddings)
+    if matrix is None:
+        return [None] * len(embeddings), [None] * len(embeddings)
+    present = ~np.isnan(matrix).any(axis=1)
+    scales = np.ones(len(matrix), dtype=np.float32)
+    scales[present] = np.abs(matrix[present]).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.zeros(matrix.shape, dtype=np.int8)
+    quantized[present] = np.round(matrix[present] / scales[present, None]).astype(np.int8)
+    return (
+        [row if ok else None for row, ok in zip(quantized, present)],
+        [float(scale) if ok else None for scale, ok in zip(scales, present)]
+    )
+
+
+def dequantize(q: np.ndarray, scale) -> np.ndarray:
+    """
+    Reconstruye embeddings float32 a partir de su versión int8 y su escala.
+    
+    Args:
+        q (np.ndarray): Vector (D,) o matriz (N, D) int8
+        scale: Escala del vector, o arreglo (N,) con la escala de cada fila de la matriz
+        
+    Returns:
+        np.ndarray: Embeddings aproximados en float32, con la misma forma que 'q'
+    """
+    q = np.asarray(q, dtype=np.float32)
+    scale = np.asarray(scale, dtype=np.float32)
+    if q.ndim == 2:
+        scale = scale.reshape(-1, 1)
+    return q * scale
 
 
 def add_embeddings_from_dict_rows(
@@ -145,7 +282,11 @@ def add_embeddings_from_dict_rows(
     embedding_model_name: str = None,
     task_type: str = "RETRIEVAL_DOCUMENT",
     output_dimensionality: Optional[int] = None,
-    row_formatter: Callable[[Dict[str, Any]], str] = default_row_dict_to_string_formatter
+    row_formatter: Callable[[Dict[str, Any]], str] = default_row_dict_to_string_formatter,
+    batch_size: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    embed_cache: Optional[EmbedCache] = None,
+    quantize: Literal["fp32", "fp16", "int8"] = "fp32"
 ) -> pd.DataFrame:
     """
     Agrega una nueva columna con embeddings de texto a un DataFrame de pandas.
@@ -168,6 +309,14 @@ def add_embeddings_from_dict_rows(
                                                Si es None, se usa el valor por defecto del modelo.
         row_formatter (Callable[[Dict[str, Any]], str]): Función que toma un diccionario
             (representando una fila) y devuelve un string a ser embebido.
+        batch_size (Optional[int]): Textos por solicitud a la API de embeddings.
+        max_workers (Optional[int]): Número de solicitudes de embeddings simultáneas.
+        embed_cache (Optional[EmbedCache]): Caché persistente de embeddings. Si se proporciona,
+            solo los textos que no estén en caché se envían a la API.
+        quantize (Literal["fp32", "fp16", "int8"]): Precisión con la que se guardan los embeddings.
+            "fp16" guarda vectores float16 en la columna; "int8" reemplaza la columna por
+            '<columna>_q8' (vectores int8) y '<columna>_scale' (escala por vector), que se
+            reconstruyen con dequantize().
 
     Returns:
         pd.DataFrame: El DataFrame con una columna adicional conteniendo los embeddings.
@@ -209,12 +358,19 @@ def add_embeddings_from_dict_rows(
             return df
         actual_columns_for_dict = columns_for_dict
 
-    # Preparar los textos para embedding
-    texts_for_embedding: List[str] = []
-    for _, row in df.iterrows():
-        row_dict_content = row[actual_columns_for_dict].to_dict()
-        formatted_string = row_formatter(row_dict_content)
-        texts_for_embedding.append(formatted_string)
+    # Preparar los textos para embedding sin crear una Series por fila como hace iterrows
+    texts_for_embedding: List[str]
+    if row_formatter is default_row_dict_to_string_formatter:
+        # Formatear columna por columna ("clave: valor" o None) y unir las partes de cada fila
+        formatted_columns = [_format_column(df[col], f"{col}: ") for col in actual_columns_for_dict]
+        texts_for_embedding = [
+            "; ".join([part for part in parts if part is not None])
+            for parts in zip(*formatted_columns)
+        ]
+    else:
+        # Recorrer las columnas como listas evita copiar el DataFrame a una matriz de objetos
+        rows = zip(*[df[col].tolist() for col in actual_columns_for_dict])
+        texts_for_embedding = [row_formatter(dict(zip(actual_columns_for_dict, row))) for row in rows]
 
     if not texts_for_embedding:
         print("No hay datos de texto para generar embeddings después de formatear las filas.")
@@ -223,15 +379,33 @@ def add_embeddings_from_dict_rows(
 
     # Generar embeddings
     print(f"Generando embeddings para {len(texts_for_embedding)} filas formateadas usando {embedding_model_name}...")
-    embeddings_list = get_embeddings_batch(
-        texts_for_embedding,
-        model_name=embedding_model_name,
-        task_type=task_type,
-        dimensionality=output_dimensionality
-    )
+    def embed_batch(texts: List[str]) -> List[Optional[List[float]]]:
+        return get_embeddings_batch(
+            texts,
+            model_name=embedding_model_name,
+            task_type=task_type,
+            dimensionality=output_dimensionality,
+            batch_size=batch_size,
+            max_workers=max_workers
+        )
+
+    if embed_cache is not None:
+        namespace = f"{embedding_model_name}|{task_type}|{output_dimensionality}"
+        embeddings_list = embed_cache.get_or_compute_many(texts_for_embedding, namespace, embed_batch)
+    else:
+        embeddings_list = embed_batch(texts_for_embedding)
     
-    # Asignar embeddings al DataFrame
-    df[new_embedding_column_name] = embeddings_list
+    # Asignar embeddings al DataFrame en la precisión solicitada
+    if quantize == "int8":
+        quantized, scales = quantize_embeddings(embeddings_list)
+        df[f"{new_embedding_column_name}_q8"] = quantized
+        df[f"{new_embedding_column_name}_scale"] = scales
+    elif quantize == "fp16":
+        df[new_embedding_column_name] = [
+            None if emb is None else np.asarray(emb, dtype=np.float16) for emb in embeddings_list
+        ]
+    else:
+        df[new_embedding_column_name] = embeddings_list
 
     # Reportar resultados
     successful_embeddings = sum(1 for emb in embeddings_list if emb is not None)
@@ -0,0 +1,57 @@
+"""
+Pruebas de la caché de preguntas casi duplicadas del chat web.
+"""
+import unittest
+
+from src.chatbot.near_duplicate_cache import NearDuplicateCache, normalize_question
+
+
+class NearDuplicateCacheTest(unittest.TestCase):
+
+    def assert_hit(self, stored: str, asked: str) -> None:
+        cache = NearDuplicateCache()
+        cache.store(stored, "respuesta")
+        self.assertEqual(cache.lookup(asked), "respuesta", f"{stored!r} / {asked!r}")
+
+    def assert_miss(self, stored: str, asked: str) -> None:
+        cache = NearDuplicateCache()
+        cache.store(stored, "respuesta")
+        self.assertIsNone(cache.lookup(asked), f"{stored!r} / {asked!r}")
+
+    def test_case_accents_and_punctuation(self):
+        self.assert_hit("¿Qué es MAC?", "que es mac")
+        self.assert_hit("¿Cuáles son las materias optativas?", "cuales son las materias optativas")
+
+    def test_single_typo(self):
+        self.assert_hit("¿Cuáles son las materias optativas?", "cuales son las materias optaivas")
+        self.assert_hit("¿Cuáles son las materias optativas?", "cuales son las materias otpativas")
+
+    def test_different_questions(self):
+        pairs = [
+            ("¿Cuál es el objetivo general de la materia de bases de datos?",
+             "¿Cuál es el objetivo general de la materia de redes de datos?"),
+            ("¿Cuáles son los requisitos de titulación por tesis?",
+             "¿Cuáles son los requisitos de titulación por tesina?"),
+            ("¿Cuáles son las materias optativas?", "¿Cuáles son las materias obligatorias?"),
+        ]
+        for stored, asked in pairs:
+            self.assert_miss(stored, asked)
+
+    def test_numbers_must_match(self):
+        self.assert_miss("materias del semestre 1", "materias del semestre 2")
+        self.assert_miss("materias del semestre 10", "materias del semestre 1")
+
+    def test_short_words_are_not_typos(self):
+        self.assert_miss("¿Qué es MAC?", "¿Qué es MAT?")
+
+    def test_workspaces_are_separate(self):
+        cache = NearDuplicateCache()
+        cache.store("¿Qué es MAC?", "respuesta", workspace="a")
+        self.assertIsNone(cache.lookup("que es mac", workspace="b"))
+
+    def test_normalize_question(self):
+        self.assertEqual(normalize_question("  ¿Qué   es MAC? "), "que es mac")
+
+
+if __name__ == "__main__":
+    unittest.main()